@@ -0,0 +1,205 @@
+"""
+Incremental re-analysis of an alignment against the csv file of a
+previous run.
+
+Between releases of a network most alignments are unchanged, or changed
+at a few vertices only.  The row of a vertex depends on nothing but the
+vertex and its two neighbors, so every row whose triplet is unchanged
+can be copied from the previous csv file, and only the rows of changed
+vertices and of their neighbors need compute_arc_parameters.
+
+Vertices are compared as they are written to the csv file (X, Y and, for
+alignments with Z, Z formatted as in ExtendedPoint.csvRow), so the
+previous file is all that is needed.  The vertices of the two versions
+are matched with rolling hashes over windows of consecutive vertices, as
+rsync matches blocks: the hash of every window of the previous version
+goes in a dict, and the new version is scanned for windows found in it.
+A window found is checked vertex by vertex and the match is then grown
+for as long as the vertices agree.  Both versions are passed over once,
+so the diff is linear in the number of vertices.
+"""
+
+import collections
+from ExtendedPoint import ExtendedPoint, compute_arc_parameters, any_point_has_z
+from CompressedIO import atomicOutput, openForRead, openForWrite
+
+SpliceResult = collections.namedtuple('SpliceResult',
+                                      'vertexCount reusedCount changedRanges')
+
+DEFAULT_WINDOW = 8
+
+_base = 1000003
+_modulus = (1 << 61) - 1
+_zColumn = 11
+
+
+def pointKeys(pointList, vertical):
+    """
+    :param vertical: whether the csv file has the vertical columns
+    :return: the key of each point, as its coordinates are written to csv
+    """
+    if vertical:
+        return ['{0},{1},{2}'.format(point.X, point.Y,
+                                     '' if point.Z is None else point.Z)
+                for point in pointList]
+    return ['{0},{1}'.format(point.X, point.Y) for point in pointList]
+
+
+def rowKeys(rows, vertical):
+    """
+    :param rows: data rows of a csv file written by writeToCSV
+    :return: the key of each row, comparable to pointKeys
+    """
+    keys = []
+    for row in rows:
+        fields = row.split(',')
+        if vertical:
+            keys.append(','.join((fields[0], fields[1], fields[_zColumn])))
+        else:
+            keys.append(','.join(fields[:2]))
+    return keys
+
+
+def _windowHashes(keys, window):
+    """
+    :return: the rolling hash of every window of window consecutive keys
+    """
+    values = [hash(key) % _modulus for key in keys]
+    if len(values) < window:
+        return []
+    leading = pow(_base, window - 1, _modulus)
+    current = 0
+    for value in values[:window]:
+        current = (current * _base + value) % _modulus
+    hashes = [current]
+    for position in range(window, len(values)):
+        current = ((current - values[position - window] * leading) * _base +
+                   values[position]) % _modulus
+        hashes.append(current)
+    return hashes
+
+
+def matchVertices(newKeys, oldKeys, window=DEFAULT_WINDOW):
+    """
+    Match the vertices of the new version to those of the old.
+    :param window: Number of consecutive vertices a match must start with.
+    :return: for each new vertex, the index of the old vertex it matches,
+            or -1
+    :rtype: list of int
+    """
+    newCount = len(newKeys)
+    oldCount = len(oldKeys)
+    window = max(1, min(window, newCount, oldCount))
+    match = [-1] * newCount
+    if newCount == 0 or oldCount == 0:
+        return match
+    oldWindows = {}
+    for position, windowHash in enumerate(_windowHashes(oldKeys, window)):
+        oldWindows.setdefault(windowHash, position)
+    newWindows = _windowHashes(newKeys, window)
+
+    position = 0
+    while position < len(newWindows):
+        oldPosition = oldWindows.get(newWindows[position])
+        if oldPosition is None or \
+                newKeys[position:position + window] != oldKeys[oldPosition:oldPosition + window]:
+            position += 1
+            continue
+        while position < newCount and oldPosition < oldCount and \
+                newKeys[position] == oldKeys[oldPosition]:
+            match[position] = oldPosition
+            position += 1
+            oldPosition += 1
+
+    # Runs of the same vertices at the start and at the end shorter than
+    # a window.
+    offset = 0
+    while offset < min(newCount, oldCount) and match[offset] == -1 and \
+            newKeys[offset] == oldKeys[offset]:
+        match[offset] = offset
+        offset += 1
+    offset = 1
+    while offset <= min(newCount, oldCount) and match[-offset] == -1 and \
+            newKeys[-offset] == oldKeys[-offset]:
+        match[-offset] = oldCount - offset
+        offset += 1
+    return match
+
+
+def reusableVertices(match, oldCount):
+    """
+    A vertex's previous row can be reused when the vertex and both of its
+    neighbors (or the lack of one, at an end) are the same as before.
+    :return: for each new vertex, whether its previous row can be reused
+    :rtype: list of bool
+    """
+    newCount = len(match)
+    reusable = []
+    for position, oldPosition in enumerate(match):
+        if oldPosition < 0:
+            reusable.append(False)
+            continue
+        if position == 0:
+            backSame = oldPosition == 0
+        else:
+            backSame = oldPosition > 0 and match[position - 1] == oldPosition - 1
+        if position == newCount - 1:
+            aheadSame = oldPosition == oldCount - 1
+        else:
+            aheadSame = oldPosition < oldCount - 1 and match[position + 1] == oldPosition + 1
+        reusable.append(backSame and aheadSame)
+    return reusable
+
+
+def changedRanges(reusable):
+    """
+    :return: list of (first, last) index of each run of vertices that
+            cannot be reused
+    """
+    ranges = []
+    for position, canReuse in enumerate(reusable):
+        if canReuse:
+            continue
+        if ranges and ranges[-1][1] == position - 1:
+            ranges[-1] = (ranges[-1][0], position)
+        else:
+            ranges.append((position, position))
+    return ranges
+
+
+def spliceAnalysis(pointList, previousCsv, outputCsv, window=DEFAULT_WINDOW):
+    """
+    Write the analysis of pointList to outputCsv, copying the rows of
+    unchanged vertices from previousCsv and computing the arc parameters of
+    the rest. outputCsv may be previousCsv.
+    :param pointList: the new version of the alignment, not yet analyzed
+    :param previousCsv: csv file of the previous version, as written by
+            writeToCSV
+    :return: SpliceResult. Only the points in the changed ranges (and their
+            neighbors) have arc parameters afterward.
+    """
+    vertical = any_point_has_z(pointList)
+    header = ExtendedPoint.header_list(vertical)
+    with openForRead(previousCsv) as f:
+        lines = f.read().splitlines()
+    if lines and lines[0] == header:
+        oldRows = [line for line in lines[1:] if line]
+    else:
+        oldRows = []
+
+    match = matchVertices(pointKeys(pointList, vertical), rowKeys(oldRows, vertical),
+                          window=window)
+    reusable = reusableVertices(match, len(oldRows))
+    lastIndex = len(pointList) - 1
+    with atomicOutput(outputCsv) as tempName:
+        with openForWrite(tempName) as f:
+            f.write(header + '\n')
+            for position, point in enumerate(pointList):
+                if reusable[position]:
+                    f.write(oldRows[match[position]] + '\n')
+                    continue
+                if 0 < position < lastIndex:
+                    compute_arc_parameters(pointList[position - 1], point,
+                                           pointList[position + 1])
+                f.write(point.csvRow(vertical) + '\n')
+    return SpliceResult(len(pointList), sum(reusable), changedRanges(reusable))
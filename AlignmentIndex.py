@@ -0,0 +1,292 @@
+"""
+A spatial index over the segments (chords) of analyzed alignments, used
+to project large batches of query points -- crash locations, sensor
+points, anything with an X and a Y -- onto the alignments.  For each
+query point the projection finds the nearest alignment segment and
+reports the alignment id, the station (distance along the chords from
+the first point of the alignment), the signed offset (positive is right
+of the direction of travel) and the local radius.
+
+The index is a uniform grid.  Every segment is registered in each grid
+cell its bounding box overlaps.  Queries are grouped by the block of
+cells they fall in, and each group is tested against the segments of the
+surrounding block of cells in one vectorized (numpy) pass.  The block
+grows until the best candidate found is closer than the distance to the
+edge of the block, so the answer is always the true nearest segment.
+"""
+
+import collections
+import math
+import numpy as np
+
+ProjectionResult = collections.namedtuple('ProjectionResult',
+                                          'alignmentId station offset radius distance')
+
+
+def alignmentToArrays(pointList):
+    """
+    Convert a list of ExtendedPoints into numpy arrays.
+    :param pointList: spatially ordered ExtendedPoints. If the points have
+            been analyzed (compute_arc_parameters), their radius is captured.
+    :return: tuple of X, Y, and Radius arrays. Radius is nan for points with
+            no arc information (such as the first and last point).
+    :rtype: tuple of numpy.ndarray
+    """
+    count = len(pointList)
+    xs = np.empty(count)
+    ys = np.empty(count)
+    radii = np.empty(count)
+    for i, pt in enumerate(pointList):
+        xs[i] = pt.X
+        ys[i] = pt.Y
+        if pt.arc:
+            radii[i] = pt.arc.radius
+        else:
+            radii[i] = np.nan
+    return xs, ys, radii
+
+
+class SegmentGridIndex(object):
+    """
+    Grid index over the segments of one or more alignments.
+    Members:
+        cellSize (float) - width and height of a grid cell
+        segmentCount (int) - number of segments in the index
+    Methods:
+        project - project arrays of query points onto the alignments.
+    """
+    _maxPairsPerPass = 2000000
+
+    def __init__(self, alignments, cellSize=None):
+        """
+        ctor for a SegmentGridIndex
+        :param alignments: list of alignments, each a spatially ordered list
+                of ExtendedPoints (usually already analyzed). The alignment
+                id reported by project is the position in this list.
+        :param cellSize: Optional. Grid cell size in coordinate units.
+                Defaults to twice the median segment length.
+        :return: None
+        """
+        ax, ay, bx, by = [], [], [], []
+        alignIds, startStations, radiiA, radiiB = [], [], [], []
+        for alignId, alignment in enumerate(alignments):
+            if len(alignment) < 2:
+                continue
+            xs, ys, radii = alignmentToArrays(alignment)
+            chords = np.hypot(np.diff(xs), np.diff(ys))
+            stations = np.concatenate(([0.0], np.cumsum(chords)))
+            ax.append(xs[:-1])
+            ay.append(ys[:-1])
+            bx.append(xs[1:])
+            by.append(ys[1:])
+            alignIds.append(np.full(len(chords), alignId, dtype=np.int64))
+            startStations.append(stations[:-1])
+            radiiA.append(radii[:-1])
+            radiiB.append(radii[1:])
+        if not ax:
+            raise ValueError('No alignment has two or more points to index.')
+
+        self._ax = np.concatenate(ax)
+        self._ay = np.concatenate(ay)
+        self._bx = np.concatenate(bx)
+        self._by = np.concatenate(by)
+        self._alignIds = np.concatenate(alignIds)
+        self._startStations = np.concatenate(startStations)
+        self._radiiA = np.concatenate(radiiA)
+        self._radiiB = np.concatenate(radiiB)
+        self._dx = self._bx - self._ax
+        self._dy = self._by - self._ay
+        self._lengthSq = self._dx * self._dx + self._dy * self._dy
+        self._length = np.sqrt(self._lengthSq)
+
+        if cellSize is None:
+            positive = self._length[self._length > 0.0]
+            cellSize = 2.0 * float(np.median(positive)) if len(positive) else 1.0
+        self.cellSize = float(cellSize)
+        self._buildGrid()
+
+    @property
+    def segmentCount(self):
+        return len(self._ax)
+
+    def _buildGrid(self):
+        minX = np.minimum(self._ax, self._bx)
+        maxX = np.maximum(self._ax, self._bx)
+        minY = np.minimum(self._ay, self._by)
+        maxY = np.maximum(self._ay, self._by)
+        self._originX = float(minX.min())
+        self._originY = float(minY.min())
+        i0, j0 = self._cellOf(minX, minY)
+        i1, j1 = self._cellOf(maxX, maxY)
+        self._nx = int(i1.max()) + 1
+        self._ny = int(j1.max()) + 1
+
+        # Expand each segment into one entry per overlapped cell.
+        widths = i1 - i0 + 1
+        counts = widths * (j1 - j0 + 1)
+        segIdx = np.repeat(np.arange(len(counts)), counts)
+        firstEntry = np.cumsum(counts) - counts
+        local = np.arange(counts.sum()) - np.repeat(firstEntry, counts)
+        cellI = i0[segIdx] + local % widths[segIdx]
+        cellJ = j0[segIdx] + local // widths[segIdx]
+        keys = cellI * self._ny + cellJ
+
+        order = np.argsort(keys, kind='mergesort')
+        keys = keys[order]
+        self._cellSegments = segIdx[order]
+        self._cellKeys, self._cellStart = np.unique(keys, return_index=True)
+        self._cellEnd = np.append(self._cellStart[1:], len(keys))
+
+    def _cellOf(self, xs, ys):
+        i = np.floor((xs - self._originX) / self.cellSize).astype(np.int64)
+        j = np.floor((ys - self._originY) / self.cellSize).astype(np.int64)
+        return i, j
+
+    def _segmentsInBlock(self, iLo, iHi, jLo, jHi):
+        """Return indices of all segments registered in the block of cells
+        iLo..iHi, jLo..jHi (inclusive)."""
+        iLo, iHi = max(iLo, 0), min(iHi, self._nx - 1)
+        jLo, jHi = max(jLo, 0), min(jHi, self._ny - 1)
+        if iLo > iHi or jLo > jHi:
+            return np.empty(0, dtype=np.int64)
+        ii, jj = np.meshgrid(np.arange(iLo, iHi + 1), np.arange(jLo, jHi + 1))
+        keys = (ii * self._ny + jj).ravel()
+        pos = np.searchsorted(self._cellKeys, keys)
+        inRange = pos < len(self._cellKeys)
+        pos = pos[inRange]
+        found = pos[self._cellKeys[pos] == keys[inRange]]
+        if len(found) == 0:
+            return np.empty(0, dtype=np.int64)
+        parts = [self._cellSegments[self._cellStart[p]:self._cellEnd[p]] for p in found]
+        return np.unique(np.concatenate(parts))
+
+    def _blockCoversGrid(self, iLo, iHi, jLo, jHi):
+        return iLo <= 0 and jLo <= 0 and \
+            iHi >= self._nx - 1 and jHi >= self._ny - 1
+
+    def _groupSize(self, ci, cj):
+        """Number of cells (per side) in a query group, chosen so that a
+        group holds a few dozen queries on average."""
+        spanCells = float(ci.max() - ci.min() + 1) * float(cj.max() - cj.min() + 1)
+        size = int(math.ceil(math.sqrt(spanCells * 32.0 / len(ci))))
+        return min(max(size, 1), 64)
+
+    def _nearest(self, qx, qy, segs):
+        """Vectorized nearest-segment search of queries against candidate
+        segments. Returns best segment, parameter t, and distance."""
+        bestSeg = np.empty(len(qx), dtype=np.int64)
+        bestT = np.empty(len(qx))
+        bestDist = np.empty(len(qx))
+        rowsPerPass = max(1, self._maxPairsPerPass // len(segs))
+        ax = self._ax[segs]
+        ay = self._ay[segs]
+        dx = self._dx[segs]
+        dy = self._dy[segs]
+        lengthSq = self._lengthSq[segs]
+        safeLengthSq = np.where(lengthSq > 0.0, lengthSq, 1.0)
+        for lo in xrange(0, len(qx), rowsPerPass):
+            hi = lo + rowsPerPass
+            vx = qx[lo:hi, None] - ax
+            vy = qy[lo:hi, None] - ay
+            t = np.clip((vx * dx + vy * dy) / safeLengthSq, 0.0, 1.0)
+            t[:, lengthSq == 0.0] = 0.0
+            ex = vx - t * dx
+            ey = vy - t * dy
+            distSq = ex * ex + ey * ey
+            col = np.argmin(distSq, axis=1)
+            rows = np.arange(len(col))
+            bestSeg[lo:hi] = segs[col]
+            bestT[lo:hi] = t[rows, col]
+            bestDist[lo:hi] = np.sqrt(distSq[rows, col])
+        return bestSeg, bestT, bestDist
+
+    def project(self, queryX, queryY, maxDistance=None):
+        """
+        Project query points onto the nearest segment of the indexed
+        alignments.
+        :param queryX: array-like of query X values
+        :param queryY: array-like of query Y values
+        :param maxDistance: Optional. Query points farther than this from
+                every alignment are reported with alignmentId -1 and nan values.
+        :return: ProjectionResult of arrays, one entry per query point.
+                station is measured along the chords from the first point of
+                the alignment. offset is positive to the right of the
+                direction of travel. radius is the radius of the vertex
+                nearest to the projected point (nan at alignment ends).
+        :rtype: ProjectionResult
+        """
+        qx = np.asarray(queryX, dtype=float).ravel()
+        qy = np.asarray(queryY, dtype=float).ravel()
+        count = len(qx)
+        seg = np.full(count, -1, dtype=np.int64)
+        tParam = np.zeros(count)
+        dist = np.full(count, np.inf)
+
+        if count == 0:
+            return self._results(qx, qy, seg, tParam, dist)
+        ci, cj = self._cellOf(qx, qy)
+        size = self._groupSize(ci, cj)
+        groupKeys = np.stack((ci // size, cj // size), axis=1)
+        groups, inverse = np.unique(groupKeys, axis=0, return_inverse=True)
+        order = np.argsort(inverse, kind='mergesort')
+        bounds = np.searchsorted(inverse[order], np.arange(len(groups) + 1))
+        for g, (gi, gj) in enumerate(groups):
+            pending = order[bounds[g]:bounds[g + 1]]
+            k = 1
+            while len(pending) > 0:
+                block = (gi * size - k, gi * size + size - 1 + k,
+                         gj * size - k, gj * size + size - 1 + k)
+                covers = self._blockCoversGrid(*block)
+                segs = self._segmentsInBlock(*block)
+                if len(segs) > 0:
+                    s, t, d = self._nearest(qx[pending], qy[pending], segs)
+                    better = d < dist[pending]
+                    improved = pending[better]
+                    seg[improved] = s[better]
+                    tParam[improved] = t[better]
+                    dist[improved] = d[better]
+                reach = k * self.cellSize
+                if covers or (maxDistance is not None and reach >= maxDistance):
+                    break
+                pending = pending[dist[pending] > reach]
+                k = 2 * k + 1
+
+        if maxDistance is not None:
+            seg[dist > maxDistance] = -1
+        return self._results(qx, qy, seg, tParam, dist)
+
+    def _results(self, qx, qy, seg, tParam, dist):
+        count = len(qx)
+        found = seg >= 0
+        s = seg[found]
+        t = tParam[found]
+
+        alignmentId = np.full(count, -1, dtype=np.int64)
+        station = np.full(count, np.nan)
+        offset = np.full(count, np.nan)
+        radius = np.full(count, np.nan)
+        distance = np.full(count, np.nan)
+
+        alignmentId[found] = self._alignIds[s]
+        station[found] = self._startStations[s] + t * self._length[s]
+        cross = self._dx[s] * (qy[found] - self._ay[s]) - \
+            self._dy[s] * (qx[found] - self._ax[s])
+        offset[found] = np.where(cross > 0.0, -1.0, 1.0) * dist[found]
+        radius[found] = np.where(t < 0.5, self._radiiA[s], self._radiiB[s])
+        distance[found] = dist[found]
+        return ProjectionResult(alignmentId, station, offset, radius, distance)
+
+
+def projectPoints(alignments, queryX, queryY, maxDistance=None, cellSize=None):
+    """
+    Convenience function: build a SegmentGridIndex over the alignments and
+    project the query points onto it.
+    :param alignments: list of lists of (analyzed) ExtendedPoints
+    :param queryX: array-like of query X values
+    :param queryY: array-like of query Y values
+    :param maxDistance: Optional. See SegmentGridIndex.project
+    :param cellSize: Optional. See SegmentGridIndex
+    :rtype: ProjectionResult
+    """
+    index = SegmentGridIndex(alignments, cellSize=cellSize)
+    return index.project(queryX, queryY, maxDistance=maxDistance)
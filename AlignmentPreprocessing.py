@@ -0,0 +1,318 @@
+"""
+Optional vertex preprocessing applied to an assembled alignment before
+arc analysis.
+
+Digitized polylines often carry duplicate or near-duplicate vertices at
+part joins, and dense noise vertices along tangents.  Every vertex costs
+a call to compute_arc_parameters, and duplicates produce degenerate
+zero-length triplets.  The functions here work on numpy arrays of the
+coordinates and return the indices of the vertices to keep, so the
+caller always has a mapping back to the original vertex indices.
+
+    removeDuplicateVertices - drop vertices equal to the previous vertex
+    simplifyVertices - Douglas-Peucker thinning bounded by a tolerance
+    preprocessPointList - both of the above applied to ExtendedPoints
+    resampleVertices - re-parameterize at a fixed spacing along the length
+    resamplePointList - resampleVertices applied to ExtendedPoints
+    chainSourceIndices - the index mapping of two of these steps in a row
+"""
+
+import math
+import numpy as np
+from ExtendedPoint import ExtendedPoint, getEqualityTolerance
+
+# Default duplicate tolerance: stands for the ExtendedPoint equality
+# tolerance in effect when the function is called.
+SHARED_TOLERANCE = object()
+
+# Spans of simplifyVertices with at least this many vertices are measured
+# one at a time rather than batched with the others.
+_LONG_SPAN = 4096
+
+
+def _resolveTolerance(tolerance):
+    if tolerance is SHARED_TOLERANCE:
+        return getEqualityTolerance()
+    return tolerance
+
+
+def pointListToArrays(pointList):
+    """
+    :param pointList: iterable of points with X and Y
+    :return: tuple of X and Y numpy arrays
+    """
+    xs = np.fromiter((pt.X for pt in pointList), dtype=float)
+    ys = np.fromiter((pt.Y for pt in pointList), dtype=float)
+    return xs, ys
+
+
+def removeDuplicateVertices(xs, ys, tolerance=SHARED_TOLERANCE):
+    """
+    Find the vertices which are not spatially equal (within tolerance on
+    both axes) to the vertex before them.
+    :param xs: numpy array of X values
+    :param ys: numpy array of Y values
+    :param tolerance: Axis-based distance for spatial equality
+    :return: indices of the vertices to keep, in order
+    :rtype: numpy array of int
+    """
+    tolerance = _resolveTolerance(tolerance)
+    if len(xs) == 0:
+        return np.empty(0, dtype=np.int64)
+    duplicate = (np.abs(np.diff(xs)) <= tolerance) & \
+                (np.abs(np.diff(ys)) <= tolerance)
+    keep = np.concatenate(([True], ~duplicate))
+    return np.nonzero(keep)[0]
+
+
+def chordDeflections(xs, ys):
+    """
+    The deflection (radians, negative is left) at each interior vertex
+    from the chord behind it to the chord ahead of it.
+    :return: numpy array of length len(xs) - 2
+    """
+    azimuths = np.arctan2(np.diff(xs), np.diff(ys))
+    defl = np.diff(azimuths)
+    return (defl + math.pi) % (2.0 * math.pi) - math.pi
+
+
+def simplifyVertices(xs, ys, tolerance, preserveDeflection=None):
+    """
+    Douglas-Peucker simplification. A vertex is removed only if it lies
+    within tolerance of the chord between the vertices kept on either side
+    of it, so points on a circular curve are kept whenever dropping them
+    would move the curve by more than the tolerance.
+    The spans still to be split are processed a level at a time: the
+    distances of the vertices of all of them are computed in one pass.
+    :param xs: numpy array of X values
+    :param ys: numpy array of Y values
+    :param tolerance: Maximum distance a removed vertex may lie from the
+            simplified polyline.
+    :param preserveDeflection: Optional. Vertices whose chord to chord
+            deflection (radians) is at least this large are always kept.
+    :return: indices of the vertices to keep, in order
+    :rtype: numpy array of int
+    """
+    count = len(xs)
+    if count < 3:
+        return np.arange(count)
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    if preserveDeflection is not None:
+        forced = np.abs(chordDeflections(xs, ys)) >= preserveDeflection
+        keep[1:-1] |= forced
+    anchors = np.nonzero(keep)[0]
+
+    starts, ends = anchors[:-1], anchors[1:]
+    while True:
+        wide = ends - starts >= 2
+        starts, ends = starts[wide], ends[wide]
+        if len(starts) == 0:
+            break
+        split, farthestSq = _farthestVertices(xs, ys, starts, ends)
+        splitting = farthestSq > tolerance * tolerance
+        starts, split, ends = starts[splitting], split[splitting], ends[splitting]
+        keep[split] = True
+        starts, ends = np.concatenate((starts, split)), np.concatenate((split, ends))
+    return np.nonzero(keep)[0]
+
+
+def _farthestVertices(xs, ys, starts, ends):
+    """
+    For each span from starts[k] to ends[k] (each with at least one vertex
+    between them), the vertex between them farthest from their chord.
+    Spans of at least _LONG_SPAN vertices are measured one by one on slices
+    of the coordinates, which costs less per vertex than gathering them; the
+    rest are measured together.
+    :return: tuple of the index of the farthest vertex (the first of equally
+            far ones) and its squared distance, per span
+    """
+    split = np.empty(len(starts), dtype=np.int64)
+    farthestSq = np.empty(len(starts))
+    counts = ends - starts - 1
+    isLong = counts >= _LONG_SPAN
+    for k in np.nonzero(isLong)[0]:
+        start, end = starts[k], ends[k]
+        distSq = _chordDistancesSq(xs[start + 1:end] - xs[start],
+                                   ys[start + 1:end] - ys[start],
+                                   xs[end] - xs[start], ys[end] - ys[start])
+        farthest = int(np.argmax(distSq))
+        split[k] = start + 1 + farthest
+        farthestSq[k] = distSq[farthest]
+
+    short = ~isLong
+    starts, ends, counts = starts[short], ends[short], counts[short]
+    if len(starts) == 0:
+        return split, farthestSq
+    offsets = np.cumsum(counts) - counts
+    vertex = np.arange(counts.sum()) + np.repeat(starts + 1 - offsets, counts)
+    ax = np.repeat(xs[starts], counts)
+    ay = np.repeat(ys[starts], counts)
+    distSq = _chordDistancesSq(xs[vertex] - ax, ys[vertex] - ay,
+                               np.repeat(xs[ends], counts) - ax,
+                               np.repeat(ys[ends], counts) - ay)
+    shortFarthestSq = np.maximum.reduceat(distSq, offsets)
+    isFarthest = np.nonzero(distSq == np.repeat(shortFarthestSq, counts))[0]
+    # The first of the farthest vertices of each span.
+    spanOf = np.searchsorted(offsets, isFarthest, side='right')
+    first = isFarthest[np.concatenate(([True], spanOf[1:] != spanOf[:-1]))]
+    split[short] = vertex[first]
+    farthestSq[short] = shortFarthestSq
+    return split, farthestSq
+
+
+def _chordDistancesSq(vx, vy, dx, dy):
+    """
+    Squared distances of the vectors (vx, vy) from the chord (dx, dy) that
+    starts where they do, as a segment.
+    """
+    lengthSq = dx * dx + dy * dy
+    t = np.clip((vx * dx + vy * dy) / np.where(lengthSq > 0.0, lengthSq, 1.0), 0.0, 1.0)
+    return (vx - t * dx) ** 2 + (vy - t * dy) ** 2
+
+
+def chainSourceIndices(outer, inner):
+    """
+    Compose the index mappings of two steps applied one after the other.
+    :param outer: original index of each point of the first step (-1 for new
+            points)
+    :param inner: index, into the points of the first step, of each point of
+            the second step (-1 for new points)
+    :return: original index of each point of the second step (-1 for new
+            points)
+    :rtype: numpy array of int
+    """
+    outer = np.asarray(outer)
+    inner = np.asarray(inner)
+    if len(outer) == 0:
+        return np.full(len(inner), -1, dtype=np.int64)
+    return np.where(inner >= 0, outer[np.maximum(inner, 0)], -1)
+
+
+def preprocessVertices(xs, ys, duplicateTolerance=SHARED_TOLERANCE,
+                       simplifyTolerance=None, preserveDeflection=None):
+    """
+    Remove duplicates, then (optionally) simplify.
+    :param duplicateTolerance: tolerance for removeDuplicateVertices. None
+            skips duplicate removal.
+    :param simplifyTolerance: tolerance for simplifyVertices. None skips
+            simplification.
+    :param preserveDeflection: See simplifyVertices
+    :return: indices (into the original arrays) of the vertices to keep
+    :rtype: numpy array of int
+    """
+    indices = np.arange(len(xs))
+    if duplicateTolerance is not None:
+        indices = removeDuplicateVertices(xs, ys, duplicateTolerance)
+    if simplifyTolerance is not None:
+        kept = simplifyVertices(xs[indices], ys[indices], simplifyTolerance,
+                                preserveDeflection=preserveDeflection)
+        indices = indices[kept]
+    return indices
+
+
+def preprocessPointList(pointList, duplicateTolerance=SHARED_TOLERANCE,
+                        simplifyTolerance=None, preserveDeflection=None):
+    """
+    Apply preprocessVertices to a spatially ordered list of ExtendedPoints.
+    :param pointList: list of ExtendedPoints
+    :return: tuple of the list of kept points (the same point objects) and
+            the numpy array of their indices in the original list
+    """
+    xs, ys = pointListToArrays(pointList)
+    indices = preprocessVertices(xs, ys,
+                                 duplicateTolerance=duplicateTolerance,
+                                 simplifyTolerance=simplifyTolerance,
+                                 preserveDeflection=preserveDeflection)
+    return [pointList[i] for i in indices], indices
+
+
+def resampleVertices(xs, ys, spacing, keepOriginalVertices=False):
+    """
+    Re-parameterize a polyline at a fixed spacing along its cumulative
+    length. The first and last vertices are always kept, and a regularly
+    spaced point closer than half of the spacing to a kept vertex is
+    dropped. Between original vertices the chord between resampled points
+    equals the spacing; across an original vertex it is slightly shorter.
+    :param xs: numpy array of X values
+    :param ys: numpy array of Y values
+    :param spacing: Distance between resampled points
+    :param keepOriginalVertices: If True, every original vertex is kept as an
+            anchor point.
+    :return: tuple of resampled X, resampled Y, and the original index of
+            each resampled point (-1 for new points)
+    :rtype: tuple of numpy arrays
+    """
+    if spacing <= 0.0:
+        raise ValueError('spacing must be positive.')
+    if len(xs) < 2:
+        return xs.copy(), ys.copy(), np.arange(len(xs))
+    allStations, sourceIndex, cumLength = _resampleStations(xs, ys, spacing,
+                                                            keepOriginalVertices)
+    isAnchor = sourceIndex >= 0
+    rx = np.interp(allStations, cumLength, xs)
+    ry = np.interp(allStations, cumLength, ys)
+    rx[isAnchor] = xs[sourceIndex[isAnchor]]
+    ry[isAnchor] = ys[sourceIndex[isAnchor]]
+    return rx, ry, sourceIndex
+
+
+def _resampleStations(xs, ys, spacing, keepOriginalVertices):
+    """
+    :return: tuple of the station and the original index (-1 for new
+            points) of each resampled point, and the station of each
+            original vertex
+    """
+    count = len(xs)
+    cumLength = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(xs), np.diff(ys)))))
+    total = cumLength[-1]
+    stations = np.arange(spacing, total, spacing)
+
+    if keepOriginalVertices:
+        anchorStations = cumLength
+        anchorIndex = np.arange(count)
+    else:
+        anchorStations = cumLength[[0, -1]]
+        anchorIndex = np.array([0, count - 1])
+    nextAnchor = np.searchsorted(anchorStations, stations)
+    nextAnchor = np.clip(nextAnchor, 1, len(anchorStations) - 1)
+    gap = np.minimum(stations - anchorStations[nextAnchor - 1],
+                     anchorStations[nextAnchor] - stations)
+    stations = stations[gap >= spacing / 2.0]
+
+    allStations = np.concatenate((anchorStations, stations))
+    sourceIndex = np.concatenate((anchorIndex, np.full(len(stations), -1, dtype=np.int64)))
+    order = np.argsort(allStations, kind='mergesort')
+    return allStations[order], sourceIndex[order], cumLength
+
+
+def resamplePointList(pointList, spacing, keepOriginalVertices=False):
+    """
+    Apply resampleVertices to a spatially ordered list of ExtendedPoints.
+    The result is ready for compute_arc_parameters. If every point has Z,
+    the Z of the new points is interpolated along the horizontal length.
+    :param pointList: list of ExtendedPoints
+    :return: tuple of the list of new ExtendedPoints and the numpy array of
+            the original index of each one (-1 for new points)
+    """
+    xs, ys = pointListToArrays(pointList)
+    rx, ry, sourceIndex = resampleVertices(xs, ys, spacing,
+                                           keepOriginalVertices=keepOriginalVertices)
+    rz = [None] * len(rx)
+    if len(xs) >= 2 and all(pt.Z is not None for pt in pointList):
+        zs = np.fromiter((pt.Z for pt in pointList), dtype=float)
+        allStations, _, cumLength = _resampleStations(xs, ys, spacing,
+                                                      keepOriginalVertices)
+        rz = np.interp(allStations, cumLength, zs)
+        isAnchor = sourceIndex >= 0
+        rz[isAnchor] = zs[sourceIndex[isAnchor]]
+        rz = rz.tolist()
+    newPoints = []
+    previous = 0
+    for x, y, z, source in zip(rx, ry, rz, sourceIndex):
+        if source >= 0:
+            previous = source
+        newPoints.append(ExtendedPoint(float(x), float(y),
+                                       parentPK=pointList[previous].ParentPK,
+                                       newZ=z))
+    return newPoints, sourceIndex
@@ -0,0 +1,568 @@
+"""
+Long-lived local analysis service.
+
+Starting Python, importing arcpy and importing these modules costs more
+than analyzing a typical road, so automation which runs the analysis
+thousands of times should send jobs to one warm process instead of
+starting the toolbox script each time:
+
+    ROADGEOMETRY_SERVICE_TOKEN=<secret> python AnalysisService.py --port 8765 --workers 2 --preload
+
+The service listens on localhost only.  Since jobs write files wherever
+they are told to, every request must carry the shared token (from
+--token, ROADGEOMETRY_SERVICE_TOKEN, or else generated and printed at
+startup) in an X-Analysis-Token header, and a Host header naming the
+loopback interface; a request with an Origin header (i.e. from a web
+page) is refused with 403.  POSTs must be Content-Type application/json
+(else 415), which a web page cannot send cross-origin without a
+preflight.  Jobs are JSON objects, POSTed to /jobs:
+    {"type": "featureClasses", "fcs": [...], "outDir": ..., ...}
+        - the arguments of CogoPointAnalyst.analyzePolylines
+    {"type": "csvFiles", "inputs": [...], "outDir": ...}
+        - csv point files, analyzed as by BatchRunner.analyzeCsvFile
+    {"type": "coordinates", "alignments": [[[x, y], ...], ...]}
+        - raw vertices; the arc values of every vertex are returned, and
+          the vertical values too for alignments given as [x, y, z]
+The csvFiles and coordinates jobs take optional "sourceSystem" and
+"targetSystem" EPSG codes, to reproject the points (with a
+Projection.Transformer, no arcpy) before the analysis.  The spatialRef
+of a featureClasses job is an EPSG code or WKT; a code of one of the
+built-in Projection systems is reprojected the same way.
+They wait in a bounded queue (a full queue answers 503) for a pool of
+worker threads.  Feature class jobs run one at a time, since arcpy is
+not thread safe.  GET /jobs/<id>?wait=<seconds> returns the status and
+the result of a job, and GET /metrics the job counts and timings.
+
+AnalysisClient is a thin client; its analyzePolylines has the signature
+of CogoPointAnalyst.analyzePolylines and returns the csv files written.
+It takes the token as an argument or from ROADGEOMETRY_SERVICE_TOKEN.
+"""
+
+import argparse
+import hmac
+import json
+import math
+import os
+import threading
+import time
+import uuid
+import collections
+
+try:
+    import Queue as queue
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+    from urllib2 import Request, urlopen, HTTPError
+except ImportError:
+    import queue
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+
+from ArcKernel import compute_arc_arrays, compute_arc_and_vertical_arrays
+from Projection import CoordinateSystem, coordinateSystemFromEpsg, optionalTransformer
+
+DEFAULT_PORT = 8765
+TOKEN_ENVIRONMENT_VARIABLE = 'ROADGEOMETRY_SERVICE_TOKEN'
+TOKEN_HEADER = 'X-Analysis-Token'
+
+_localHosts = ('127.0.0.1', 'localhost', '[::1]')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class AnalysisServiceError(Exception):
+    pass
+
+
+class QueueFullError(AnalysisServiceError):
+    pass
+
+
+class _Job(object):
+    def __init__(self, jobType, params):
+        self.id = uuid.uuid4().hex
+        self.type = jobType
+        self.params = params
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def toDict(self):
+        d = {'id': self.id, 'type': self.type, 'status': self.status,
+             'result': self.result, 'error': self.error}
+        if self.started is not None:
+            d['queueSeconds'] = self.started - self.submitted
+        if self.finished is not None:
+            d['runSeconds'] = self.finished - self.started
+        return d
+
+
+def _finiteOrNone(values):
+    return [None if math.isinf(v) or math.isnan(v) else v for v in values]
+
+
+def runCoordinatesJob(params):
+    """
+    :param params: {'alignments': list of lists of [x, y] or [x, y, z],
+            optionally 'sourceSystem' and 'targetSystem' EPSG codes}
+    :return: one dict per alignment of the ArcKernel.ARC_FIELDS lists, and
+            the VERTICAL_FIELDS lists when it has Z (None where a value is
+            inf or nan)
+    """
+    transformer = optionalTransformer(params.get('sourceSystem'),
+                                      params.get('targetSystem'))
+    results = []
+    for alignment in params['alignments']:
+        xs = [float(xyz[0]) for xyz in alignment]
+        ys = [float(xyz[1]) for xyz in alignment]
+        if transformer is not None and alignment:
+            xs, ys = transformer.transform(xs, ys)
+        if alignment and all(len(xyz) > 2 for xyz in alignment):
+            zs = [float(xyz[2]) for xyz in alignment]
+            arrays = compute_arc_and_vertical_arrays(xs, ys, zs)
+        else:
+            arrays = (compute_arc_arrays(xs, ys),)
+        results.append(dict((name, _finiteOrNone(column.tolist()))
+                            for namedArrays in arrays
+                            for name, column in zip(namedArrays._fields, namedArrays)))
+    return results
+
+
+def runCsvFilesJob(params):
+    """
+    :param params: {'inputs': list of csv files, 'outDir': directory,
+            optionally 'sourceSystem' and 'targetSystem' EPSG codes}
+    :return: list of the csv files written
+    """
+    from BatchRunner import analyzeCsvFile
+    outputs = []
+    for inputPath in params['inputs']:
+        outputs.extend(analyzeCsvFile(inputPath, params['outDir'],
+                                      sourceSystem=params.get('sourceSystem'),
+                                      targetSystem=params.get('targetSystem')))
+    return outputs
+
+
+def _spatialReference(value):
+    """
+    The spatialRef for analyzePolylines from a factory code or a WKT string:
+    the built-in Projection system of the code if there is one, so the
+    vertices are reprojected as arrays, else an arcpy SpatialReference.
+    """
+    if value is None:
+        return None
+    if isinstance(value, int):
+        try:
+            return coordinateSystemFromEpsg(value)
+        except ValueError:
+            pass
+    import arcpy
+    if isinstance(value, int):
+        return arcpy.SpatialReference(value)
+    spatialRef = arcpy.SpatialReference()
+    spatialRef.loadFromString(value)
+    return spatialRef
+
+
+_arcpyLock = threading.Lock()
+
+
+def runFeatureClassesJob(params):
+    """
+    :param params: the arguments of analyzePolylines, with spatialRef as a
+            factory code or WKT string (see _spatialReference)
+    :return: list of the csv files written
+    """
+    from CogoPointAnalyst import analyzePolylines
+    with _arcpyLock:
+        return analyzePolylines(params['fcs'], params['outDir'],
+                                loadCSVtoFeatureClass=params.get('loadCSVtoFeatureClass', False),
+                                spatialRef=_spatialReference(params.get('spatialRef')),
+                                resultsStore=params.get('resultsStore'),
+                                pipelined=params.get('pipelined', False),
+                                curvatureStatistics=params.get('curvatureStatistics', False),
+                                detectSpirals=params.get('detectSpirals', False),
+                                previousDir=params.get('previousDir'))
+
+
+JOB_TYPES = {'coordinates': runCoordinatesJob,
+             'csvFiles': runCsvFilesJob,
+             'featureClasses': runFeatureClassesJob}
+
+
+class AnalysisService(object):
+    """
+    Methods:
+        start - serve on a background thread
+        serveForever - serve on this thread
+        stop - stop serving and stop the workers
+        submit - queue a job (also used by the HTTP handler)
+    Members:
+        port - the port being served (useful when constructed with port 0)
+        token - the shared token requests must carry
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, workers=2,
+                 maxQueued=64, keepFinished=1000, token=None):
+        """
+        ctor for an AnalysisService
+        :param host: interface to listen on; keep it local
+        :param port: port to listen on, 0 for any free port
+        :param token: shared token requests must carry. Defaults to
+                ROADGEOMETRY_SERVICE_TOKEN, or a random one if it is not set.
+        :param workers: number of worker threads
+        :param maxQueued: most jobs waiting for a worker
+        :param keepFinished: number of finished jobs whose results are kept
+        :return: None
+        """
+        self.token = token or os.environ.get(TOKEN_ENVIRONMENT_VARIABLE) or uuid.uuid4().hex
+        self._queue = queue.Queue(maxQueued)
+        self._jobs = {}
+        self._finished = collections.deque()
+        self._keepFinished = keepFinished
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._counts = collections.Counter()
+        self._timings = collections.defaultdict(lambda: {'completed': 0, 'failed': 0,
+                                                         'totalSeconds': 0.0,
+                                                         'maxSeconds': 0.0})
+        self._running = 0
+        self._workers = [threading.Thread(target=self._work) for _ in range(workers)]
+        for worker in self._workers:
+            worker.daemon = True
+            worker.start()
+
+        class Handler(_RequestHandler):
+            service = self
+        self._server = _ThreadingHTTPServer((host, port), Handler)
+        self.port = self._server.server_address[1]
+        self._serverThread = None
+
+    def submit(self, jobType, params):
+        """
+        :return: the queued job
+        :raises: ValueError for an unknown job type, QueueFullError if the
+                queue is full
+        """
+        if jobType not in JOB_TYPES:
+            raise ValueError('Unknown job type: {0}'.format(jobType))
+        job = _Job(jobType, params)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+                self._counts['rejected'] += 1
+            raise QueueFullError('The job queue is full.')
+        with self._lock:
+            self._counts['submitted'] += 1
+        return job
+
+    def job(self, jobId):
+        with self._lock:
+            return self._jobs.get(jobId)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self._running += 1
+            job.started = time.time()
+            job.status = RUNNING
+            try:
+                job.result = JOB_TYPES[job.type](job.params)
+                job.status = DONE
+            except Exception as e:
+                job.error = '{0}: {1}'.format(type(e).__name__, e)
+                job.status = FAILED
+            job.finished = time.time()
+            self._recordFinished(job)
+            job.done.set()
+
+    def _recordFinished(self, job):
+        seconds = job.finished - job.started
+        with self._lock:
+            self._running -= 1
+            self._counts[job.status] += 1
+            timing = self._timings[job.type]
+            timing['completed' if job.status == DONE else 'failed'] += 1
+            timing['totalSeconds'] += seconds
+            timing['maxSeconds'] = max(timing['maxSeconds'], seconds)
+            self._finished.append(job.id)
+            while len(self._finished) > self._keepFinished:
+                self._jobs.pop(self._finished.popleft(), None)
+
+    def metrics(self):
+        with self._lock:
+            byType = {}
+            for jobType, timing in self._timings.items():
+                count = timing['completed'] + timing['failed']
+                byType[jobType] = dict(timing, meanSeconds=timing['totalSeconds'] / count)
+            return {'uptimeSeconds': time.time() - self._started,
+                    'submitted': self._counts['submitted'],
+                    'rejected': self._counts['rejected'],
+                    'completed': self._counts[DONE],
+                    'failed': self._counts[FAILED],
+                    'queued': self._queue.qsize(),
+                    'running': self._running,
+                    'workers': len(self._workers),
+                    'byType': byType}
+
+    def serveForever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        self._serverThread = threading.Thread(target=self._server.serve_forever)
+        self._serverThread.daemon = True
+        self._serverThread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _refused(self):
+        """
+        Reply 403 and return True unless the request comes from a local
+        client holding the token: not from a web page (Origin), not through
+        a DNS name rebound to the loopback address (Host).
+        """
+        host = self.headers.get('Host', '')
+        hostName = host.rsplit(':', 1)[0] if not host.endswith(']') else host
+        token = self.headers.get(TOKEN_HEADER, '')
+        if self.headers.get('Origin') is not None or hostName not in _localHosts:
+            self._reply(403, {'error': 'Only local clients are served.'})
+            return True
+        if not hmac.compare_digest(str(token), str(self.service.token)):
+            self._reply(403, {'error': 'Missing or wrong {0}.'.format(TOKEN_HEADER)})
+            return True
+        return False
+
+    def do_GET(self):
+        if self._refused():
+            return
+        url = urlparse(self.path)
+        if url.path == '/metrics':
+            self._reply(200, self.service.metrics())
+            return
+        if url.path.startswith('/jobs/'):
+            job = self.service.job(url.path[len('/jobs/'):])
+            if job is None:
+                self._reply(404, {'error': 'No such job.'})
+                return
+            wait = parse_qs(url.query).get('wait')
+            if wait:
+                job.done.wait(float(wait[0]))
+            self._reply(200, job.toDict())
+            return
+        self._reply(404, {'error': 'Unknown path.'})
+
+    def do_POST(self):
+        if self._refused():
+            return
+        if urlparse(self.path).path != '/jobs':
+            self._reply(404, {'error': 'Unknown path.'})
+            return
+        contentType = self.headers.get('Content-Type', '').split(';')[0].strip()
+        if contentType.lower() != 'application/json':
+            self._reply(415, {'error': 'Jobs must be posted as application/json.'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            params = json.loads(self.rfile.read(length).decode('utf-8'))
+            job = self.service.submit(params.pop('type', None), params)
+        except QueueFullError as e:
+            self._reply(503, {'error': str(e)})
+            return
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+            return
+        self._reply(202, job.toDict())
+
+
+class AnalysisClient(object):
+    """
+    Client of an AnalysisService.
+    Methods:
+        submit - queue a job; returns its id
+        wait - wait for a job to finish; returns its result
+        analyzePolylines - mirrors CogoPointAnalyst.analyzePolylines
+        analyzeCsvFiles, analyzeCoordinates - the other job types
+        metrics - the service's job metrics
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, pollSeconds=30.0, token=None):
+        """
+        :param token: the service's token. Defaults to ROADGEOMETRY_SERVICE_TOKEN.
+        """
+        self.baseUrl = 'http://{0}:{1}'.format(host, port)
+        self.pollSeconds = pollSeconds
+        self.token = token or os.environ.get(TOKEN_ENVIRONMENT_VARIABLE, '')
+
+    def _request(self, path, body=None):
+        data = None if body is None else json.dumps(body).encode('utf-8')
+        request = Request(self.baseUrl + path, data=data,
+                          headers={'Content-Type': 'application/json',
+                                   TOKEN_HEADER: self.token})
+        try:
+            response = urlopen(request)
+        except HTTPError as e:
+            message = json.loads(e.read().decode('utf-8')).get('error', str(e))
+            if e.code == 503:
+                raise QueueFullError(message)
+            if e.code == 403:
+                raise AnalysisServiceError('Refused by the service: {0}'.format(message))
+            raise AnalysisServiceError(message)
+        return json.loads(response.read().decode('utf-8'))
+
+    def submit(self, jobType, **params):
+        params['type'] = jobType
+        return self._request('/jobs', params)['id']
+
+    def wait(self, jobId, timeout=None):
+        """
+        :return: the result of the job
+        :raises: AnalysisServiceError if the job failed or timed out
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            waitSeconds = self.pollSeconds
+            if deadline is not None:
+                waitSeconds = max(0.0, min(waitSeconds, deadline - time.time()))
+            job = self._request('/jobs/{0}?wait={1}'.format(jobId, waitSeconds))
+            if job['status'] == DONE:
+                return job['result']
+            if job['status'] == FAILED:
+                raise AnalysisServiceError(job['error'])
+            if deadline is not None and time.time() >= deadline:
+                raise AnalysisServiceError('Timed out waiting for job {0}'.format(jobId))
+
+    def metrics(self):
+        return self._request('/metrics')
+
+    def analyzePolylines(self, fcs, outDir, loadCSVtoFeatureClass=False, spatialRef=None,
+                         resultsStore=None, pipelined=False, curvatureStatistics=False,
+                         detectSpirals=False, previousDir=None):
+        """
+        Run CogoPointAnalyst.analyzePolylines in the service and wait for it.
+        :param spatialRef: factory code, WKT string, Projection.CoordinateSystem
+                (sent as its factory code) or arcpy SpatialReference
+        :return: list of the csv files written
+        """
+        if isinstance(spatialRef, CoordinateSystem):
+            spatialRef = _epsgCode(spatialRef)
+        elif hasattr(spatialRef, 'exportToString'):
+            spatialRef = spatialRef.exportToString()
+        if isinstance(fcs, str):
+            fcs = [fcs]
+        return self.wait(self.submit('featureClasses', fcs=list(fcs), outDir=outDir,
+                                     loadCSVtoFeatureClass=loadCSVtoFeatureClass,
+                                     spatialRef=spatialRef, resultsStore=resultsStore,
+                                     pipelined=pipelined,
+                                     curvatureStatistics=curvatureStatistics,
+                                     detectSpirals=detectSpirals,
+                                     previousDir=previousDir))
+
+    def analyzeCsvFiles(self, inputs, outDir, sourceSystem=None, targetSystem=None):
+        """
+        :param sourceSystem: Optional. EPSG code or Projection.CoordinateSystem
+                of the points in the files
+        :param targetSystem: Optional. The same, to reproject the points to
+        :return: list of the csv files written
+        """
+        return self.wait(self.submit('csvFiles', inputs=list(inputs), outDir=outDir,
+                                     sourceSystem=_epsgCode(sourceSystem),
+                                     targetSystem=_epsgCode(targetSystem)))
+
+    def analyzeCoordinates(self, alignments, sourceSystem=None, targetSystem=None):
+        """
+        :param alignments: list of lists of (x, y) or (x, y, z)
+        :param sourceSystem: Optional. EPSG code or Projection.CoordinateSystem
+                of the coordinates
+        :param targetSystem: Optional. The same, to reproject them to
+        :return: one dict per alignment of the ArcKernel.ARC_FIELDS (and
+                VERTICAL_FIELDS) lists
+        """
+        return self.wait(self.submit('coordinates',
+                                     alignments=[[list(map(float, xy)) for xy in a]
+                                                 for a in alignments],
+                                     sourceSystem=_epsgCode(sourceSystem),
+                                     targetSystem=_epsgCode(targetSystem)))
+
+
+def _epsgCode(system):
+    """
+    The EPSG code to send for a coordinate system, which the service turns
+    back into the same built-in Projection system.
+    """
+    if not isinstance(system, CoordinateSystem):
+        return system
+    if not system.factoryCode:
+        raise ValueError('{0!r} has no EPSG code to send to the service.'.format(system))
+    return system.factoryCode
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve analysis jobs on localhost.')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--queue', type=int, default=64,
+                        help='most jobs waiting for a worker')
+    parser.add_argument('--preload', action='store_true',
+                        help='import arcpy and the analysis modules now')
+    parser.add_argument('--token',
+                        help='shared token clients must send; defaults to {0} or a '
+                             'random one'.format(TOKEN_ENVIRONMENT_VARIABLE))
+    args = parser.parse_args(argv)
+    if args.preload:
+        import CogoPointAnalyst
+    service = AnalysisService(port=args.port, workers=args.workers,
+                              maxQueued=args.queue, token=args.token)
+    if not (args.token or os.environ.get(TOKEN_ENVIRONMENT_VARIABLE)):
+        print('Token: {0}'.format(service.token))
+    try:
+        service.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+
+
+if __name__ == '__main__':
+    main()
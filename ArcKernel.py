@@ -0,0 +1,279 @@
+"""
+The math of ExtendedPoint.compute_arc_parameters on plain floats and on
+numpy arrays, for the paths where creating ExtendedPoint objects and
+their arc and pt2pt structs per vertex is too costly (streaming, batch).
+
+arc_values computes the values for a single triplet and returns them as
+a tuple.  compute_arc_arrays does the same for every interior vertex of
+a polyline in one vectorized sweep.  Both report the same quantities as
+compute_arc_parameters, in the same units (radians, coordinate units):
+
+    distanceBack, distanceAhead - chord distances to the adjacent points
+    pointsDeflection - chord to chord deflection
+    chordAzimuth - azimuth of the chord from point1 to point3
+    radius - inf on a tangent
+    degreeCurve - signed 1 / radius (0.0 on a tangent)
+    arcDeflection - deflection along the arc from point1 to point3
+    lengthBack, lengthAhead - arc lengths to the adjacent points (0.0 on
+        a tangent)
+    centerX, centerY - curve center (nan on a tangent)
+
+arc_values is compiled with Numba when the numba package is installed,
+which makes the one-triplet-at-a-time paths (StreamingCurvature.push)
+several times faster; otherwise it is the pure-Python function.  The
+ROADGEOMETRY_ARC_KERNEL environment variable forces the choice: 'python'
+or 'numba' ('auto', the default, picks numba if it can be imported).
+ARC_KERNEL names the kernel in use.
+
+For polylines with Z, compute_arc_and_vertical_arrays adds the vertical
+geometry of ExtendedPoint.compute_vertical_parameters to the same sweep,
+using the horizontal distances the arc computation has already found:
+
+    gradeBack, gradeAhead - rise over horizontal run to the adjacent points
+    gradeChange - gradeAhead - gradeBack
+    rateOfChange - change of grade per unit of horizontal length
+    K - horizontal length per percent of grade change (inf where the
+        grade does not change)
+"""
+
+import collections
+import math
+import os
+import numpy as np
+
+ARC_FIELDS = ('distanceBack distanceAhead pointsDeflection chordAzimuth '
+              'radius degreeCurve arcDeflection lengthBack lengthAhead '
+              'centerX centerY')
+
+ArcArrays = collections.namedtuple('ArcArrays', ARC_FIELDS)
+
+VERTICAL_FIELDS = 'gradeBack gradeAhead gradeChange rateOfChange K'
+
+VerticalArrays = collections.namedtuple('VerticalArrays', VERTICAL_FIELDS)
+
+KERNEL_VARIABLE = 'ROADGEOMETRY_ARC_KERNEL'
+
+_twoPi = 2.0 * math.pi
+_inf = float('inf')
+_nan = float('nan')
+
+
+def _wrap(angle):
+    if angle < -math.pi:
+        return angle + _twoPi
+    if angle > math.pi:
+        return angle - _twoPi
+    return angle
+
+
+def python_arc_values(x1, y1, x2, y2, x3, y3):
+    """
+    Scalar equivalent of compute_arc_parameters. (Written in the subset of
+    Python that Numba compiles.)
+    :return: tuple of the values named in ARC_FIELDS
+    """
+    dx12 = x2 - x1
+    dy12 = y2 - y1
+    dx23 = x3 - x2
+    dy23 = y3 - y2
+    distanceBack = math.sqrt(dx12 * dx12 + dy12 * dy12)
+    distanceAhead = math.sqrt(dx23 * dx23 + dy23 * dy23)
+    defl = _wrap(math.atan2(dx23, dy23) - math.atan2(dx12, dy12))
+    chordAzimuth = math.atan2(x3 - x1, y3 - y1)
+
+    # Circumcenter relative to point2
+    ax = x1 - x2
+    ay = y1 - y2
+    cx = x3 - x2
+    cy = y3 - y2
+    denominator = 2.0 * (ax * cy - ay * cx)
+    if defl == 0.0 or denominator == 0.0:
+        return (distanceBack, distanceAhead, defl, chordAzimuth, _inf, 0.0,
+                0.0, 0.0, 0.0, _nan, _nan)
+    aSq = ax * ax + ay * ay
+    cSq = cx * cx + cy * cy
+    ux = (cy * aSq - ay * cSq) / denominator
+    uy = (ax * cSq - cx * aSq) / denominator
+
+    # Radial vectors from the center to each point
+    r1x = ax - ux
+    r1y = ay - uy
+    radius = math.sqrt(r1x * r1x + r1y * r1y)
+    azStart = math.atan2(r1x, r1y)
+    azMid = math.atan2(-ux, -uy)
+    azEnd = math.atan2(cx - ux, cy - uy)
+
+    arcDeflection = _wrap(azEnd - azStart)
+    if arcDeflection != 0.0 and (arcDeflection > 0.0) != (defl > 0.0):
+        arcDeflection -= math.copysign(_twoPi, arcDeflection)
+    defl12 = _wrap(azMid - azStart)
+    if defl < 0.0:
+        degreeCurve = -1.0 / radius
+    else:
+        degreeCurve = 1.0 / radius
+    return (distanceBack, distanceAhead, defl, chordAzimuth, radius,
+            degreeCurve, arcDeflection, defl12 * radius,
+            (arcDeflection - defl12) * radius, ux + x2, uy + y2)
+
+
+def _fill_arc_rows(xs, ys, rows):
+    """
+    Loop form of compute_arc_arrays: rows[:, i] = arc_values of the triplet
+    around point i. Only used compiled; calling a compiled arc_values once
+    per triplet from Python costs as much as the pure-Python kernel.
+    """
+    for i in range(1, len(xs) - 1):
+        values = arc_values(xs[i - 1], ys[i - 1], xs[i], ys[i],
+                            xs[i + 1], ys[i + 1])
+        for field in range(len(values)):
+            rows[field, i] = values[field]
+
+
+def _selectKernel():
+    """
+    :return: name of the kernel, the arc_values function to use, and the
+            compiled _fill_arc_rows (None for the Python kernel)
+    """
+    choice = os.environ.get(KERNEL_VARIABLE, 'auto').lower()
+    if choice not in ('auto', 'python', 'numba'):
+        raise ValueError('{0} must be auto, python or numba, not {1}'
+                         .format(KERNEL_VARIABLE, choice))
+    if choice == 'python':
+        return 'python', python_arc_values, None
+    try:
+        import numba
+        import numba.extending
+    except ImportError:
+        if choice == 'numba':
+            raise ImportError('{0}=numba, but numba is not installed.'
+                              .format(KERNEL_VARIABLE))
+        return 'python', python_arc_values, None
+    # register_jitable lets the compiled kernel call _wrap, while Python
+    # callers still get the plain function.
+    numba.extending.register_jitable(_wrap)
+    return ('numba', numba.njit(cache=True, nogil=True)(python_arc_values),
+            numba.njit(cache=True, nogil=True)(_fill_arc_rows))
+
+
+ARC_KERNEL, arc_values, _compiledArcRows = _selectKernel()
+
+
+def _wrapArray(angle):
+    return np.where(angle < -math.pi, angle + _twoPi,
+                    np.where(angle > math.pi, angle - _twoPi, angle))
+
+
+def compute_arc_arrays(xs, ys):
+    """
+    Vectorized equivalent of calling compute_arc_parameters on every
+    triplet of a polyline.
+    :param xs: array-like of X values, spatially ordered
+    :param ys: array-like of Y values
+    :return: ArcArrays whose arrays have one entry per point. The first
+            and last entries are nan since those points have no triplet.
+    :rtype: ArcArrays
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    count = len(xs)
+    if _compiledArcRows is not None:
+        rows = np.full((len(ArcArrays._fields), count), np.nan)
+        _compiledArcRows(xs, ys, rows)
+        return ArcArrays(*rows)
+    columns = [np.full(count, np.nan) for _ in ArcArrays._fields]
+    if count < 3:
+        return ArcArrays(*columns)
+
+    x1, x2, x3 = xs[:-2], xs[1:-1], xs[2:]
+    y1, y2, y3 = ys[:-2], ys[1:-1], ys[2:]
+    dx12 = x2 - x1
+    dy12 = y2 - y1
+    dx23 = x3 - x2
+    dy23 = y3 - y2
+    distanceBack = np.sqrt(dx12 * dx12 + dy12 * dy12)
+    distanceAhead = np.sqrt(dx23 * dx23 + dy23 * dy23)
+    defl = _wrapArray(np.arctan2(dx23, dy23) - np.arctan2(dx12, dy12))
+    chordAzimuth = np.arctan2(x3 - x1, y3 - y1)
+
+    ax = x1 - x2
+    ay = y1 - y2
+    cx = x3 - x2
+    cy = y3 - y2
+    denominator = 2.0 * (ax * cy - ay * cx)
+    tangent = (defl == 0.0) | (denominator == 0.0)
+    safeDenominator = np.where(tangent, 1.0, denominator)
+    aSq = ax * ax + ay * ay
+    cSq = cx * cx + cy * cy
+    ux = (cy * aSq - ay * cSq) / safeDenominator
+    uy = (ax * cSq - cx * aSq) / safeDenominator
+
+    r1x = ax - ux
+    r1y = ay - uy
+    radius = np.sqrt(r1x * r1x + r1y * r1y)
+    azStart = np.arctan2(r1x, r1y)
+    azMid = np.arctan2(-ux, -uy)
+    azEnd = np.arctan2(cx - ux, cy - uy)
+
+    arcDeflection = _wrapArray(azEnd - azStart)
+    wrongWay = (arcDeflection != 0.0) & ((arcDeflection > 0.0) != (defl > 0.0))
+    arcDeflection = np.where(wrongWay,
+                             arcDeflection - np.copysign(_twoPi, arcDeflection),
+                             arcDeflection)
+    defl12 = _wrapArray(azMid - azStart)
+    degreeCurve = np.where(defl < 0.0, -1.0, 1.0) / radius
+    lengthBack = defl12 * radius
+    lengthAhead = (arcDeflection - defl12) * radius
+
+    values = [distanceBack, distanceAhead, defl, chordAzimuth,
+              np.where(tangent, np.inf, radius),
+              np.where(tangent, 0.0, degreeCurve),
+              np.where(tangent, 0.0, arcDeflection),
+              np.where(tangent, 0.0, lengthBack),
+              np.where(tangent, 0.0, lengthAhead),
+              np.where(tangent, np.nan, ux + x2),
+              np.where(tangent, np.nan, uy + y2)]
+    for column, value in zip(columns, values):
+        column[1:-1] = value
+    return ArcArrays(*columns)
+
+
+def compute_vertical_arrays(zs, distanceBack, distanceAhead):
+    """
+    Vectorized equivalent of compute_vertical_parameters for every triplet.
+    :param zs: array-like of Z values
+    :param distanceBack: horizontal distances, as from compute_arc_arrays
+    :param distanceAhead: horizontal distances, as from compute_arc_arrays
+    :return: VerticalArrays whose arrays have one entry per point; nan at
+            the ends and where a distance is zero
+    :rtype: VerticalArrays
+    """
+    zs = np.asarray(zs, dtype=float)
+    count = len(zs)
+    columns = [np.full(count, np.nan) for _ in VerticalArrays._fields]
+    if count < 3:
+        return VerticalArrays(*columns)
+    back = distanceBack[1:-1]
+    ahead = distanceAhead[1:-1]
+    apart = (back != 0.0) & (ahead != 0.0)
+    safeBack = np.where(apart, back, np.nan)
+    safeAhead = np.where(apart, ahead, np.nan)
+    gradeBack = (zs[1:-1] - zs[:-2]) / safeBack
+    gradeAhead = (zs[2:] - zs[1:-1]) / safeAhead
+    gradeChange = gradeAhead - gradeBack
+    rateOfChange = 2.0 * gradeChange / (safeBack + safeAhead)
+    safeRate = np.where(rateOfChange == 0.0, 1.0, rateOfChange)
+    K = np.where(rateOfChange == 0.0, np.inf, 1.0 / (100.0 * safeRate))
+    for column, value in zip(columns, (gradeBack, gradeAhead, gradeChange,
+                                       rateOfChange, K)):
+        column[1:-1] = value
+    return VerticalArrays(*columns)
+
+
+def compute_arc_and_vertical_arrays(xs, ys, zs):
+    """
+    compute_arc_arrays and compute_vertical_arrays in one sweep.
+    :return: ArcArrays and VerticalArrays
+    :rtype: (ArcArrays, VerticalArrays)
+    """
+    arcs = compute_arc_arrays(xs, ys)
+    return arcs, compute_vertical_arrays(zs, arcs.distanceBack, arcs.distanceAhead)
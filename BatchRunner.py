@@ -0,0 +1,272 @@
+"""
+Resumable batch driver for analyzing many inputs.
+
+A manifest (JSON, written next to the outputs by default) records each
+input's status, output paths, output checksums, sizes and modification
+times, and timings.  Every output file is written to a temporary name and
+renamed into place only once it is complete.  The record of each input is
+appended to a journal beside the manifest (manifest.json.log) as soon as
+the input is finished, and the journal is folded into the manifest, which
+is rewritten atomically, at the end of the batch.  When a run dies part
+way through (an arcpy error, running out of memory, a killed job), running
+it again skips every input whose outputs are already complete and
+unchanged.  An output whose size and modification time are the recorded
+ones is taken to be unchanged; only the others are checksummed.
+
+Usage from the command line, over a directory of csv point files
+(anything CreateExtendedPointList can read):
+    python BatchRunner.py inputDir outputDir [--pattern *.csv] [--force]
+        [--source-epsg 4269 --target-epsg 2264]
+"""
+
+import argparse
+import fnmatch
+import functools
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import traceback
+from CompressedIO import atomicOutput, replaceFile
+
+MANIFEST_NAME = 'manifest.json'
+JOURNAL_SUFFIX = '.log'
+
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def fileChecksum(fileName, blockSize=1 << 20):
+    """
+    :return: sha1 hex digest of the contents of the file
+    :rtype: str
+    """
+    digest = hashlib.sha1()
+    with open(fileName, 'rb') as f:
+        block = f.read(blockSize)
+        while block:
+            digest.update(block)
+            block = f.read(blockSize)
+    return digest.hexdigest()
+
+
+class Manifest(object):
+    """
+    Per-input record of a batch run, persisted as JSON, with a journal of
+    the records made since the manifest was last saved.
+    Methods:
+        isComplete - True if an input's outputs are done and unchanged
+        record - store the outcome of an input and append it to the journal
+        save - rewrite the manifest with every record and drop the journal
+    """
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.journalName = fileName + JOURNAL_SUFFIX
+        self.entries = {}
+        if os.path.exists(fileName):
+            with open(fileName, 'r') as f:
+                self.entries = json.load(f).get('inputs', {})
+        if os.path.exists(self.journalName):
+            with open(self.journalName, 'r') as f:
+                for line in f:
+                    try:
+                        inputPath, entry = json.loads(line)
+                    except ValueError:
+                        # The last line of a journal cut off by a crash.
+                        break
+                    self.entries[inputPath] = entry
+
+    def save(self):
+        with atomicOutput(self.fileName) as tempName:
+            with open(tempName, 'w') as f:
+                json.dump({'version': 1, 'inputs': self.entries}, f,
+                          indent=1, sort_keys=True)
+        if os.path.exists(self.journalName):
+            os.remove(self.journalName)
+
+    @staticmethod
+    def _signature(inputPath):
+        if os.path.isfile(inputPath):
+            stat = os.stat(inputPath)
+            return [stat.st_size, stat.st_mtime]
+        return None
+
+    def isComplete(self, inputPath):
+        """
+        :return: True if the input was done, has not changed since, and all
+                of its outputs still exist with the recorded checksums. An
+                output with the recorded size and modification time is not
+                checksummed again.
+        """
+        entry = self.entries.get(inputPath)
+        if entry is None or entry.get('status') != STATUS_DONE:
+            return False
+        if entry.get('input') != self._signature(inputPath):
+            return False
+        signatures = entry.get('signatures', {})
+        for outputFile, checksum in entry.get('checksums', {}).items():
+            if not os.path.exists(outputFile):
+                return False
+            if signatures.get(outputFile) == self._signature(outputFile):
+                continue
+            if fileChecksum(outputFile) != checksum:
+                return False
+        return True
+
+    def record(self, inputPath, status, outputs=(), seconds=0.0, error=None):
+        self.entries[inputPath] = {
+            'status': status,
+            'input': self._signature(inputPath),
+            'outputs': list(outputs),
+            'checksums': dict((o, fileChecksum(o)) for o in outputs),
+            'signatures': dict((o, self._signature(o)) for o in outputs),
+            'seconds': round(seconds, 3),
+            'finished': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'error': error,
+        }
+        with open(self.journalName, 'a') as f:
+            f.write(json.dumps([inputPath, self.entries[inputPath]], sort_keys=True) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def runBatch(inputs, outDir, processInput, manifestFile=None, force=False,
+             report=None):
+    """
+    Run processInput over every input, skipping the ones completed by an
+    earlier run. A failing input is recorded as failed and the batch
+    continues with the next one.
+    :param inputs: list of input paths (csv files, feature classes, ...)
+    :param outDir: directory for the outputs (created if needed)
+    :param processInput: function(inputPath, outDir) -> list of output
+            files. It must write each output atomically (see atomicOutput).
+    :param manifestFile: Optional. Defaults to outDir/manifest.json
+    :param force: If True, redo every input.
+    :param report: Optional. function(str) for progress messages.
+    :return: dict of counts of 'done', 'skipped' and 'failed' inputs
+    """
+    if not os.path.exists(outDir):
+        os.makedirs(outDir)
+    if manifestFile is None:
+        manifestFile = os.path.join(outDir, MANIFEST_NAME)
+    if report is None:
+        report = lambda message: None
+    manifest = Manifest(manifestFile)
+    counts = {'done': 0, 'skipped': 0, 'failed': 0}
+
+    try:
+        for inputPath in inputs:
+            if not force and manifest.isComplete(inputPath):
+                counts['skipped'] += 1
+                report('Skipping (already complete): {0}'.format(inputPath))
+                continue
+            start = time.time()
+            try:
+                outputs = processInput(inputPath, outDir)
+            except Exception as e:
+                manifest.record(inputPath, STATUS_FAILED, seconds=time.time() - start,
+                                error='{0}: {1}'.format(type(e).__name__, e))
+                counts['failed'] += 1
+                report('Failed: {0}\n{1}'.format(inputPath, traceback.format_exc()))
+                continue
+            manifest.record(inputPath, STATUS_DONE, outputs=outputs,
+                            seconds=time.time() - start)
+            counts['done'] += 1
+            report('Done: {0}'.format(inputPath))
+    finally:
+        manifest.save()
+    return counts
+
+
+def analyzeCsvFile(inputPath, outDir, sourceSystem=None, targetSystem=None):
+    """
+    processInput for csv point files: analyze the points of the file and
+    write the results to a csv file of the same name in outDir.
+    Bind the coordinate systems with functools.partial to use it in runBatch.
+    :param sourceSystem: Optional. Coordinate system (Projection.CoordinateSystem
+            or EPSG code) of the points in the file.
+    :param targetSystem: Optional. Coordinate system to reproject the points
+            to before the analysis. Given with sourceSystem.
+    :return: list with the output file name
+    """
+    from ExtendedPointList import CreateExtendedPointList
+    from Projection import optionalTransformer
+    transformer = optionalTransformer(sourceSystem, targetSystem)
+    outputFile = os.path.join(outDir, os.path.basename(inputPath))
+    if os.path.abspath(outputFile) == os.path.abspath(inputPath):
+        raise ValueError('Output directory must differ from the input directory.')
+    aPointList = CreateExtendedPointList(inputPath)
+    if transformer is not None:
+        transformer.transformPoints(aPointList)
+    aPointList.computeAllPointInformation()
+    with atomicOutput(outputFile) as tempName:
+        aPointList.writeToCSV(tempName)
+    return [outputFile]
+
+
+def analyzeFeatureClass(fc, outDir, spatialRef=None):
+    """
+    processInput for Polyline feature classes (requires arcpy). The csv
+    files are written to a scratch directory and renamed into outDir.
+    :return: list of output file names
+    """
+    from CogoPointAnalyst import processFCforCogoAnalysis
+    scratchDir = os.path.join(outDir, '.partial_' + os.path.basename(fc))
+    if os.path.exists(scratchDir):
+        shutil.rmtree(scratchDir)
+    os.makedirs(scratchDir)
+    try:
+        scratchFiles = processFCforCogoAnalysis(fc, scratchDir, spatialRef=spatialRef)
+        outputs = []
+        for scratchFile in scratchFiles:
+            outputFile = os.path.join(outDir, os.path.basename(scratchFile))
+            replaceFile(scratchFile, outputFile)
+            outputs.append(outputFile)
+    finally:
+        shutil.rmtree(scratchDir, ignore_errors=True)
+    return outputs
+
+
+def _listInputs(inputDir, pattern):
+    return [os.path.join(inputDir, name)
+            for name in sorted(os.listdir(inputDir))
+            if fnmatch.fnmatch(name, pattern)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Analyze every csv point file in a directory, resuming '
+                    'where an earlier run stopped.')
+    parser.add_argument('inputDir')
+    parser.add_argument('outputDir')
+    parser.add_argument('--pattern', default='*.csv',
+                        help='file name pattern of the inputs (default *.csv)')
+    parser.add_argument('--manifest', default=None,
+                        help='manifest file (default outputDir/manifest.json)')
+    parser.add_argument('--force', action='store_true',
+                        help='redo inputs which are already complete')
+    parser.add_argument('--source-epsg', type=int, default=None,
+                        help='EPSG code of the coordinates in the inputs')
+    parser.add_argument('--target-epsg', type=int, default=None,
+                        help='EPSG code to reproject the coordinates to '
+                             '(with --source-epsg)')
+    args = parser.parse_args(argv)
+    if (args.source_epsg is None) != (args.target_epsg is None):
+        parser.error('--source-epsg and --target-epsg go together')
+
+    def report(message):
+        sys.stdout.write(message + '\n')
+
+    inputs = _listInputs(args.inputDir, args.pattern)
+    processInput = functools.partial(analyzeCsvFile, sourceSystem=args.source_epsg,
+                                     targetSystem=args.target_epsg)
+    counts = runBatch(inputs, args.outputDir, processInput,
+                      manifestFile=args.manifest, force=args.force, report=report)
+    report('{done} done, {skipped} skipped, {failed} failed'.format(**counts))
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
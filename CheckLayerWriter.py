@@ -0,0 +1,235 @@
+"""
+Writes check-layer geometry straight from the analyzed alignments, one
+polyline per alignment with a summary of the analysis attached.
+
+This replaces re-reading each csv file through MakeXYEventLayer and
+PointsToLine: the whole feature class is written in one pass by a small
+built-in ESRI Shapefile writer (.shp, .shx, .dbf and optional .prj), so
+neither a csv re-parse nor per-file geoprocessing is needed.
+PolylineShapefileWriter writes each feature as it is added, so only the
+file headers wait for the last one.
+
+The layer holds the summary of each alignment (CHECK_LAYER_FIELDS), not
+the curvature of each vertex: that is in the csv file named by CSV_FILE,
+and in the ResultsStore when there is one.
+"""
+
+import collections
+import datetime
+import math
+import os
+import struct
+import numpy as np
+
+AlignmentSummary = collections.namedtuple('AlignmentSummary',
+                                          'pointCount length minRadius maxDegree curvePointCount')
+
+_polylineShapeType = 3
+
+# name, type, length, decimal count
+CHECK_LAYER_FIELDS = (('NAME', 'C', 80, 0),
+                      ('CSV_FILE', 'C', 254, 0),
+                      ('NUM_PTS', 'N', 10, 0),
+                      ('LENGTH', 'N', 19, 4),
+                      ('MIN_RADIUS', 'N', 19, 4),
+                      ('MAX_DEGREE', 'N', 19, 6),
+                      ('NUM_CURVE', 'N', 10, 0))
+
+
+def alignmentSummary(pointList):
+    """
+    Summarize the analysis of one alignment.
+    :param pointList: spatially ordered, analyzed ExtendedPoints
+    :return: point count, chord length, smallest radius (None if the
+            alignment is all tangent), largest absolute degree of curve, and
+            the number of points on a curve
+    :rtype: AlignmentSummary
+    """
+    length = 0.0
+    minRadius = None
+    maxDegree = 0.0
+    curvePointCount = 0
+    for previous, point in zip(pointList[:-1], pointList[1:]):
+        length += math.sqrt((point.X - previous.X) ** 2 + (point.Y - previous.Y) ** 2)
+    for point in pointList:
+        if not point.arc or math.isinf(point.arc.radius):
+            continue
+        curvePointCount += 1
+        if minRadius is None or point.arc.radius < minRadius:
+            minRadius = point.arc.radius
+        maxDegree = max(maxDegree, math.fabs(point.arc.degreeCurve100))
+    return AlignmentSummary(len(pointList), length, minRadius, maxDegree,
+                            curvePointCount)
+
+
+def csvAlignmentSummary(csvFileName):
+    """
+    Summarize the analysis of one alignment from its csv file, for an
+    alignment whose points do not all carry their arc (e.g. one spliced by
+    AlignmentDiff.spliceAnalysis).
+    :rtype: AlignmentSummary
+    """
+    from CsvCache import loadCsvColumns
+    header, values = loadCsvColumns(csvFileName)
+    xs = values[:, header.index('X')]
+    ys = values[:, header.index('Y')]
+    radii = values[:, header.index('Radius')]
+    degrees = values[:, header.index('Degree')]
+    length = float(np.hypot(np.diff(xs), np.diff(ys)).sum())
+    onCurve = np.isfinite(radii)
+    minRadius = float(radii[onCurve].min()) if onCurve.any() else None
+    maxDegree = float(np.abs(degrees[onCurve]).max()) if onCurve.any() else 0.0
+    return AlignmentSummary(len(values), length, minRadius, maxDegree,
+                            int(onCurve.sum()))
+
+
+class PolylineShapefileWriter(object):
+    """
+    Writes one polyline feature per alignment to an ESRI Shapefile as the
+    alignments are added; close fills in the headers.
+        with PolylineShapefileWriter(checkLayerFile, projectionWkt) as writer:
+            for alignment in alignments:
+                writer.add(alignment, name, csvFile)
+    Methods:
+        add - write the feature and attributes of an alignment
+        close - finish the headers and close the files
+    """
+    def __init__(self, fileName, projectionWkt=None):
+        """
+        :param fileName: path of the .shp file (the .shx, .dbf and .prj files
+                are written next to it)
+        :param projectionWkt: Optional. ESRI WKT of the coordinate system, for
+                the .prj file.
+        """
+        basePath = os.path.splitext(fileName)[0]
+        if projectionWkt:
+            with open(basePath + '.prj', 'w') as prj:
+                prj.write(projectionWkt)
+        self._shp = open(basePath + '.shp', 'wb')
+        self._shx = open(basePath + '.shx', 'wb')
+        self._dbf = open(basePath + '.dbf', 'wb')
+        self._shp.write(b'\0' * 100)
+        self._shx.write(b'\0' * 100)
+        self._dbf.write(_dbfHeader(CHECK_LAYER_FIELDS, 0))
+        self._offset = 100
+        self._count = 0
+        self._box = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def add(self, alignment, name='', csvFile='', summary=None):
+        """
+        :param alignment: analyzed list of ExtendedPoints
+        :param name: Optional. A name for the alignment.
+        :param csvFile: Optional. The csv file the alignment was written to.
+        :param summary: Optional. The AlignmentSummary of the alignment.
+                Defaults to the summary of its points' arcs.
+        :return: None
+        """
+        xs = [pt.X for pt in alignment]
+        ys = [pt.Y for pt in alignment]
+        box = (min(xs), min(ys), max(xs), max(ys))
+        coordinates = [value for xy in zip(xs, ys) for value in xy]
+        content = struct.pack('<i4d3i', _polylineShapeType, box[0], box[1],
+                              box[2], box[3], 1, len(xs), 0) + \
+            struct.pack('<{0}d'.format(len(coordinates)), *coordinates)
+        self._count += 1
+        self._shp.write(struct.pack('>2i', self._count, len(content) // 2))
+        self._shp.write(content)
+        self._shx.write(struct.pack('>2i', self._offset // 2, len(content) // 2))
+        self._offset += 8 + len(content)
+        if self._box is None:
+            self._box = box
+        else:
+            self._box = (min(self._box[0], box[0]), min(self._box[1], box[1]),
+                         max(self._box[2], box[2]), max(self._box[3], box[3]))
+
+        if summary is None:
+            summary = alignmentSummary(alignment)
+        self._dbf.write(_dbfRecord(CHECK_LAYER_FIELDS,
+                                   (name, csvFile, summary.pointCount, summary.length,
+                                    summary.minRadius, summary.maxDegree,
+                                    summary.curvePointCount)))
+
+    def close(self):
+        if self._shp.closed:
+            return
+        box = self._box or (0.0, 0.0, 0.0, 0.0)
+        self._shp.seek(0)
+        self._shp.write(_shapefileHeader(self._offset, box))
+        self._shx.seek(0)
+        self._shx.write(_shapefileHeader(100 + 8 * self._count, box))
+        self._dbf.write(b'\x1a')
+        self._dbf.seek(0)
+        self._dbf.write(_dbfHeader(CHECK_LAYER_FIELDS, self._count))
+        for f in (self._shp, self._shx, self._dbf):
+            f.close()
+
+
+def writePolylineShapefile(fileName, alignments, names=None, csvFiles=None,
+                           projectionWkt=None, summaries=None):
+    """
+    Write one polyline feature per alignment to an ESRI Shapefile.
+    :param fileName: path of the .shp file (the .shx, .dbf and .prj files are
+            written next to it)
+    :param alignments: iterable of analyzed lists of ExtendedPoints
+    :param names: Optional. A name for each alignment.
+    :param csvFiles: Optional. The csv file each alignment was written to.
+    :param projectionWkt: Optional. ESRI WKT of the coordinate system, for the
+            .prj file.
+    :param summaries: Optional. The AlignmentSummary of each alignment, or
+            None for those to be summarized from their points' arcs.
+    :return: None
+    """
+    with PolylineShapefileWriter(fileName, projectionWkt) as writer:
+        for number, alignment in enumerate(alignments):
+            writer.add(alignment,
+                       name=names[number] if names is not None else '',
+                       csvFile=csvFiles[number] if csvFiles is not None else '',
+                       summary=summaries[number] if summaries is not None else None)
+
+
+def _shapefileHeader(fileLengthBytes, box):
+    return struct.pack('>7i', 9994, 0, 0, 0, 0, 0, fileLengthBytes // 2) + \
+        struct.pack('<2i8d', 1000, _polylineShapeType,
+                    box[0], box[1], box[2], box[3], 0.0, 0.0, 0.0, 0.0)
+
+
+def _formatDbfValue(value, fieldType, length, decimals):
+    if fieldType == 'C':
+        text = '' if value is None else str(value)
+        return text[:length].ljust(length)
+    if value is None or math.isinf(value) or math.isnan(value):
+        return ' ' * length
+    if decimals:
+        text = '{0:.{1}f}'.format(value, decimals)
+    else:
+        text = str(int(value))
+    if len(text) > length:
+        return '*' * length
+    return text.rjust(length)
+
+
+def _dbfHeader(fields, recordCount):
+    """The header and field descriptors of a dBase III table."""
+    today = datetime.date.today()
+    headerLength = 32 + 32 * len(fields) + 1
+    recordLength = 1 + sum(field[2] for field in fields)
+    header = struct.pack('<4BIHH20x', 3, today.year - 1900, today.month,
+                         today.day, recordCount, headerLength, recordLength)
+    for name, fieldType, length, decimals in fields:
+        header += struct.pack('<11sc4xBB14x', name.encode('ascii'),
+                              fieldType.encode('ascii'), length, decimals)
+    return header + b'\r'
+
+
+def _dbfRecord(fields, row):
+    record = ' ' + ''.join(_formatDbfValue(value, *field[1:])
+                           for value, field in zip(row, fields))
+    if not isinstance(record, bytes):
+        record = record.encode('latin-1', 'replace')
+    return record
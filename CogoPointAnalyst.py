@@ -20,18 +20,32 @@ from arcpy.arcobjects.arcobjects import Point as arcPoint
 import arcpy
 import collections
 from ExtendedPoint import ExtendedPoint
-from ExtendedPoint import any_in_point_equals_any_in_other
-from ExtendedPoint import compute_arc_parameters
+from ExtendedPoint import compute_arc_parameters, any_point_has_z
+from AlignmentPreprocessing import preprocessPointList, SHARED_TOLERANCE
+from AlignmentPreprocessing import resamplePointList, chainSourceIndices
+from ResultsStore import ResultsStore, srsOrganization
+from CheckLayerWriter import PolylineShapefileWriter, csvAlignmentSummary
+from CompressedIO import openForWrite
+from Pipeline import Pipeline
+from PointSnapIndex import SegmentChainer, chainSegments
+from CurvatureStatistics import CurvatureSummary, writeStatistics
+from SpiralDetection import detectSpiralsInPointList, writeSpiralsCSV
+from AlignmentDiff import spliceAnalysis
+from Projection import CoordinateSystem, Transformer
 print 'finished imports'
 
 def arcPrint(aString):
     print aString
     arcpy.AddMessage(aString)
 
-successList = []
 
+RUN_STATISTICS_NAME = 'curvature_stats.json'
+SOURCE_VERTEX_FIELD = 'SourceVertex'
 
-def analyzePolylines(fcs, outDir, loadCSVtoFeatureClass=False,spatialRef=None):
+
+def analyzePolylines(fcs, outDir, loadCSVtoFeatureClass=False,spatialRef=None,
+                     resultsStore=None, pipelined=False, curvatureStatistics=False,
+                     detectSpirals=False, previousDir=None, tileSize=None, processes=1):
     """
     This is the only function you need to call.
     Given a list of Polyline Feature classes, compute the curve data for each
@@ -39,78 +53,285 @@ def analyzePolylines(fcs, outDir, loadCSVtoFeatureClass=False,spatialRef=None):
     :param fcs: Name of feature class to be processed (or list of feature classes)
     :param outDir: Directory to put the resulting csv files. (CSV names are autogenerated)
     :param loadCSVtoFeatureClass: Optional. Load the csv file back into arcmap as a confidence check
-    :param spatialRef: Coordinate System to which to project point coordinates and show length units
-    :return: None
+    :param spatialRef: Coordinate System to which to project point coordinates and show length units.
+            An arcpy SpatialReference, or a Projection.CoordinateSystem to reproject without arcpy
+    :param resultsStore: Optional. Path of a GeoPackage file to also bulk-insert all vertex results into
+    :param pipelined: Optional. Overlap the analysis and the writing of each feature class's alignments on threads
+    :param curvatureStatistics: Optional. Write curvature distribution statistics per feature class and for the whole run
+    :param detectSpirals: Optional. Also write the spiral transitions found in each alignment to <csv name>_spirals.csv
+    :param previousDir: Optional. Directory of the csv files of a previous run (may be outDir). Only changed vertices are recomputed
+    :param tileSize: Optional. Analyze each feature class one square tile of this size at a time, in bounded memory
+    :param processes: Optional. With tileSize, the number of worker processes the tiles are analyzed in
+    :return: list of the csv files written
     """
     try:
         validate_or_create_outDir(outDir)
     except:
         arcPrint("Unable to create output directory. No files processed.")
-        return
+        return []
 
     if type(fcs) is str:
         fcs_list = [fcs]
     else:
         fcs_list = fcs
 
-    for fc in fcs_list:
+    store = None
+    if resultsStore is not None:
+        store = _openResultsStore(resultsStore, spatialRef)
+
+    written = []
+    checkLayers = []
+    statistics = None
+    statisticsParts = {}
+    if curvatureStatistics:
+        statistics = CurvatureSummary()
+    try:
+        for fc in fcs_list:
+            try:
+                arcPrint("Now processing {0}".format(fc))
+                checkLayer = None
+                fcStatistics = None
+                if statistics is not None:
+                    fcStatistics = CurvatureSummary()
+                if loadCSVtoFeatureClass:
+                    checkLayer = _generateCheckLayerFileName(fc, outDir)
+                csvName = processFCforCogoAnalysis(fc, outDir, spatialRef=spatialRef,
+                                                   store=store,
+                                                   checkLayerFile=checkLayer,
+                                                   pipelined=pipelined,
+                                                   statistics=fcStatistics,
+                                                   detectSpirals=detectSpirals,
+                                                   previousDir=previousDir,
+                                                   tileSize=tileSize,
+                                                   processes=processes)
+                written.extend(csvName)
+                if checkLayer is not None:
+                    checkLayers.append(checkLayer)
+                if fcStatistics is not None:
+                    statistics.merge(fcStatistics)
+                    statisticsParts[fc] = fcStatistics
+                arcPrint("File created: {0}".format(csvName))
+                arcPrint(" ")
+            except NotPolylineError:
+                arcPrint("{0} not processed because it " + \
+                      "is not a Polyline Feature Class.".format(fc))
+            except arcpy.ExecuteError:
+                arcPrint("Arc Error while processing Feature Class: {0}".format(fc))
+            except Exception as e:
+                arcPrint("Unexpected error: {0}".format(e.message))
+                raise
+    finally:
+        if store is not None:
+            store.close()
+            arcPrint("Results store written: {0}".format(resultsStore))
+        if statistics is not None:
+            statisticsFile = os.path.join(outDir, RUN_STATISTICS_NAME)
+            writeStatistics(statisticsFile, statistics, statisticsParts)
+            arcPrint("Curvature statistics written: {0}".format(statisticsFile))
+
+    if loadCSVtoFeatureClass and len(checkLayers) > 0:
         try:
-            arcPrint("Now processing {0}".format(fc))
-            csvName = processFCforCogoAnalysis(fc, outDir, spatialRef=spatialRef)
-            successList.extend(csvName)
-            arcPrint("File created: {0}".format(csvName))
-            arcPrint(" ")
-        except NotPolylineError:
-            arcPrint("{0} not processed because it " + \
-                  "is not a Polyline Feature Class.".format(fc))
-        except arcpy.ExecuteError:
-            arcPrint("Arc Error while processing Feature Class: {0}".format(fc))
-        except Exception as e:
-            arcPrint("Unexpected error: {0}".format(e.message))
-            raise
-
-    if loadCSVtoFeatureClass and len(successList) > 0:
-        tempPoints = 'tempPoints___'
-        mxd = arcpy.mapping.MapDocument('CURRENT')
+            mxd = arcpy.mapping.MapDocument('CURRENT')
+        except RuntimeError:
+            # Not running inside ArcMap (e.g. in AnalysisService).
+            arcPrint("No current map document; check layers were written but not added.")
+            return written
         dataFrame = mxd.activeDataFrame
 
         try:
-            for csv in successList:
-                baseName = os.path.basename(csv)[:-4] + "_check"
-                newLayerName = arcpy.env.workspace + '/' + baseName
-                arcpy.AddMessage('Workspace: {0}'.format(arcpy.env.workspace))
-                arcpy.MakeXYEventLayer_management(csv, 'X', 'Y',
-                                                  tempPoints,
-                                                  spatial_reference=spatialRef)
+            for checkLayer in checkLayers:
+                baseName = os.path.basename(checkLayer)
                 arcpy.AddMessage('Attempting to Add Layer: {0}'.format(baseName))
-                arcpy.PointsToLine_management(tempPoints, newLayerName)
-                layerObj = arcpy.mapping.Layer(newLayerName)
+                layerObj = arcpy.mapping.Layer(checkLayer)
                 arcpy.mapping.AddLayer(dataFrame, layerObj, 'BOTTOM')
                 arcpy.AddMessage('Added Layer: {0}'.format(baseName))
         finally:
-            arcpy.Delete_management(tempPoints)
             del mxd
     else:
         arcpy.AddMessage('Loading check layers was not requested.')
         arcpy.AddMessage(' ')
+    return written
+
+
+def _openResultsStore(fileName, spatialRef):
+    """
+    Open a ResultsStore whose spatial reference matches spatialRef.
+    :param fileName: path of the GeoPackage file
+    :param spatialRef: arcpy SpatialReference (may be None)
+    :rtype: ResultsStore
+    """
+    if spatialRef is None:
+        return ResultsStore(fileName)
+    # factoryCode is an EPSG or an ESRI code; ArcGIS does not say which.
+    srsId = spatialRef.factoryCode or -1
+    return ResultsStore(fileName, srsId=srsId,
+                        srsName=spatialRef.name,
+                        srsDefinition=_spatialRefWkt(spatialRef),
+                        organization=srsOrganization(srsId))
+
+
+def _spatialRefWkt(spatialRef):
+    """
+    The ESRI WKT of an arcpy SpatialReference, without the XY domain and
+    resolution values exportToString appends after it.
+    """
+    return spatialRef.exportToString().split(';')[0]
 
 
-def processFCforCogoAnalysis(fc, outputDir, spatialRef=None):
+def processFCforCogoAnalysis(fc, outputDir, spatialRef=None,
+                             removeDuplicates=False, simplifyTolerance=None,
+                             resampleSpacing=None, keepOriginalVertices=False,
+                             store=None, checkLayerFile=None,
+                             pipelined=False, maxPending=4, statistics=None,
+                             detectSpirals=False, previousDir=None, tileSize=None,
+                             processes=1):
     """
     Process a Polyline file to analyze its points, generating a csv file of
     the same name, but saved to the output Directory.
     :param fc: Feature Class to be processed.
     :param outputDir: Output directory to put the resulting csv file in.
+    :param removeDuplicates: Optional. Drop vertices spatially equal to the
+            vertex before them before analysis.
+    :param simplifyTolerance: Optional. Thin vertices lying within this
+            distance of the simplified polyline before analysis.
+    :param resampleSpacing: Optional. Resample each alignment at this spacing
+            along its length before analysis.
+    :param keepOriginalVertices: Optional. When resampling, keep the original
+            vertices as anchor points.
+            When removeDuplicates, simplifyTolerance or resampleSpacing is
+            given, the csv files get a SourceVertex column: the index of each
+            point among the vertices of the assembled alignment (-1 for a
+            resampled point which is not one of them).
+    :param store: Optional. ResultsStore to add every analyzed alignment to.
+    :param checkLayerFile: Optional. Path of a polyline shapefile to write all of
+            the analyzed alignments to, as a check layer. Each feature is
+            written as soon as its alignment is, with the summary of the
+            alignment; the curvature of each vertex is only in the csv files.
+    :param pipelined: Optional. Analyze alignments on a Pipeline thread while
+            the csv files (and store, check layer) of those before them are
+            written on this thread. The geometry is still read first, on this
+            thread, since arcpy cursors are not thread safe, and all of the
+            segments are needed before the first alignment is assembled.
+    :param maxPending: Optional. When pipelined, the most alignments waiting
+            between two stages.
+    :param statistics: Optional. CurvatureSummary to add every analyzed
+            alignment to. The summaries of each alignment and of the whole
+            feature class are also written to <name>_stats.json in outputDir.
+    :param detectSpirals: Optional. Fit the spiral transitions of each
+            alignment and write them to <csv name>_spirals.csv beside its csv
+            file (see SpiralDetection).
+    :param previousDir: Optional. Directory holding the csv files of a
+            previous run (it may be outputDir). An alignment whose csv file
+            is there is diffed against it, and only its changed vertices are
+            recomputed (see AlignmentDiff). Cannot be combined with store,
+            statistics or detectSpirals, which need every vertex analyzed,
+            nor with the vertex preprocessing, whose SourceVertex column would
+            go stale in the reused rows.
+            The check layer summary of a spliced alignment is read from its
+            csv file.
+    :param tileSize: Optional. Analyze the feature class one square tile of
+            this width and height at a time, stitching the alignments that
+            cross tiles, so memory is bounded by the tile rather than the
+            feature class (see TiledAnalysis). Only spatialRef can be
+            combined with it.
+    :param processes: Optional. With tileSize, the number of worker
+            processes the tiles are analyzed in.
     :return: list of filename(s) of the csv file that was saved (str)
     """
+    preprocessed = removeDuplicates or simplifyTolerance is not None or \
+        resampleSpacing is not None
+    if previousDir is not None and \
+            (store is not None or statistics is not None or detectSpirals or preprocessed):
+        raise ValueError('previousDir cannot be combined with a results store, '
+                         'statistics, spiral detection or vertex preprocessing.')
+    if tileSize is not None:
+        if preprocessed or store is not None or checkLayerFile is not None or \
+                pipelined or statistics is not None or detectSpirals or \
+                previousDir is not None:
+            raise ValueError('tileSize can only be combined with spatialRef.')
+        # Here, since TiledAnalysis imports from this module.
+        from TiledAnalysis import analyzeFCTiled
+        return analyzeFCTiled(fc, outputDir, tileSize, spatialRef=spatialRef,
+                              processes=processes)
     confirmFCisPolyline(fc)
     returnList = []
-    alignmentsList = getListOfAlignmentsAsPoints(fc, spatialRef=spatialRef)
-    for num, alignment in enumerate(alignmentsList):
-        outputFile = _generateOutputFileName(fc, num, outputDir)
-        returnList.append(outputFile)
-        processPointsForCogo(alignment)
-        writeToCSV(alignment, outputFile)
+    fcStatistics = CurvatureSummary()
+    alignmentStatistics = {}
+
+    def analyzeAlignments(alignments):
+        for alignment in alignments:
+            sourceVertices = None
+            if removeDuplicates or simplifyTolerance is not None:
+                duplicateTolerance = SHARED_TOLERANCE if removeDuplicates else None
+                alignment, sourceVertices = preprocessPointList(
+                    alignment, duplicateTolerance=duplicateTolerance,
+                    simplifyTolerance=simplifyTolerance)
+            if resampleSpacing is not None:
+                alignment, resampled = resamplePointList(
+                    alignment, resampleSpacing,
+                    keepOriginalVertices=keepOriginalVertices)
+                if sourceVertices is None:
+                    sourceVertices = resampled
+                else:
+                    sourceVertices = chainSourceIndices(sourceVertices, resampled)
+            if previousDir is None:
+                processPointsForCogo(alignment)
+            yield alignment, sourceVertices
+
+    if pipelined:
+        # The cursor is read here; the csv files, store and check layer are
+        # written here too. Only the assembly and analysis run on threads.
+        segments = _breakPolylinesIntoSegments(fc, spatialRef=spatialRef)
+        analyzedAlignments = Pipeline(assembleAlignments(segments),
+                                      [analyzeAlignments],
+                                      maxPending=maxPending)
+    else:
+        analyzedAlignments = analyzeAlignments(
+            getListOfAlignmentsAsPoints(fc, spatialRef=spatialRef))
+    checkLayer = None
+    if checkLayerFile is not None:
+        if spatialRef is None:
+            spatialRef = arcpy.Describe(fc).spatialReference
+        checkLayer = PolylineShapefileWriter(checkLayerFile,
+                                             projectionWkt=_spatialRefWkt(spatialRef))
+    try:
+        for num, (alignment, sourceVertices) in enumerate(analyzedAlignments):
+            outputFile = _generateOutputFileName(fc, num, outputDir)
+            returnList.append(outputFile)
+            previousFile = None
+            checkSummary = None
+            if previousDir is not None:
+                previousFile = os.path.join(previousDir, os.path.basename(outputFile))
+            if previousFile is not None and os.path.exists(previousFile):
+                spliceAnalysis(alignment, previousFile, outputFile)
+                if checkLayerFile is not None:
+                    # The reused vertices have no arc; their values are in the csv.
+                    checkSummary = csvAlignmentSummary(outputFile)
+            else:
+                if previousDir is not None:
+                    processPointsForCogo(alignment)
+                writeToCSV(alignment, outputFile, sourceVertices=sourceVertices)
+            if detectSpirals:
+                writeSpiralsCSV(_generateSpiralsFileName(outputFile),
+                                detectSpiralsInPointList(alignment))
+            if store is not None:
+                store.addAlignment(alignment, source=fc, alignmentNumber=num,
+                                   csvFile=outputFile)
+            if checkLayer is not None:
+                checkLayer.add(alignment, name=os.path.basename(outputFile)[:-4],
+                               csvFile=outputFile, summary=checkSummary)
+            if statistics is not None:
+                summary = CurvatureSummary()
+                summary.addPointList(alignment)
+                fcStatistics.merge(summary)
+                alignmentStatistics[os.path.basename(outputFile)] = summary
+    finally:
+        if checkLayer is not None:
+            checkLayer.close()
+    if statistics is not None:
+        writeStatistics(_generateStatisticsFileName(fc, outputDir),
+                        fcStatistics, alignmentStatistics)
+        statistics.merge(fcStatistics)
     return returnList
 
 def processPointsForCogo(listOfPoints):
@@ -128,19 +349,37 @@ def processPointsForCogo(listOfPoints):
         compute_arc_parameters(pt1, pt2, pt3)
 
 
-def writeToCSV(pointList, fileName):
+def writeToCSV(pointList, fileName, compressLevel=None, background=False,
+               sourceVertices=None):
     """
     Write all points in the point list to the indicated file, expecting
     the points to be of type ExtendedPoint.
     :param pointList:
+    :param fileName: A .gz or .bz2 extension compresses the file.
+    :param compressLevel: Optional. 1 (fastest) to 9 (smallest).
+    :param background: If True, compress on a separate thread.
+    :param sourceVertices: Optional. Written as a last SourceVertex column:
+            the original vertex index of each point (-1 for none), as
+            returned by the AlignmentPreprocessing functions.
     :return: None
     """
-    with open(fileName, 'w') as f:
-        headerStr = ExtendedPoint.header_list()
-        f.write(headerStr + '\n')
-        for i, point in enumerate(pointList):
-            writeStr = str(point)
-            f.write(writeStr + '\n')
+    vertical = any_point_has_z(pointList)
+    with openForWrite(fileName, compressLevel=compressLevel,
+                      background=background) as f:
+        headerStr = ExtendedPoint.header_list(vertical)
+        if sourceVertices is None:
+            f.write(headerStr + '\n')
+            for i, point in enumerate(pointList):
+                writeStr = point.csvRow(vertical)
+                f.write(writeStr + '\n')
+            return
+        f.write(headerStr + ',' + SOURCE_VERTEX_FIELD + '\n')
+        fieldCount = headerStr.count(',') + 1
+        for point, sourceVertex in zip(pointList, sourceVertices):
+            # Rows of points without an arc stop short of the last columns.
+            writeStr = point.csvRow(vertical)
+            padding = ',' * (fieldCount - writeStr.count(',') - 1)
+            f.write('{0}{1},{2}\n'.format(writeStr, padding, int(sourceVertex)))
 
 def getListOfAlignmentsAsPoints(fc, spatialRef=None):
     """
@@ -157,12 +396,19 @@ def getListOfAlignmentsAsPoints(fc, spatialRef=None):
     segmentList = _breakPolylinesIntoSegments(fc, spatialRef=spatialRef)
     # _writeToCSV(segmentList, 'segmentListDump.csv')
 
-    alignmentList = []
-    while len(segmentList) > 0:
-        pointList = getPointListFromSegmentList(segmentList)
-        alignmentList.append(pointList)
+    return list(assembleAlignments(segmentList))
+
 
-    return alignmentList
+def assembleAlignments(segments):
+    """
+    Chain Polyline Segments into alignments. All of the segments are taken
+    before the first alignment is produced, since any segment may connect
+    to any other.
+    :param segments: iterable of Polyline Segments
+    :return: generator of spatially ordered lists of ExtendedPoints, one per
+            alignment
+    """
+    return chainSegments(segments)
 
 
 def getPointListFromSegmentList(segmentDeque):
@@ -173,63 +419,36 @@ def getPointListFromSegmentList(segmentDeque):
     segmentDeque.  If more than one alignment have been passed to this function,
     it will only remove the segments which are colinear with the first segment.
     Thus len(segmentDeque) will not == 0.
+    The end points are indexed once per deque from _breakPolylinesIntoSegments,
+    as long as it is only changed by these calls; any other deque is indexed
+    on every call.
     :param segmentList: Deque containing all of the Polyline Segments
     :return: List of Points that are spatially ordered from beginning to end.
     """
-    # Check for adjacency going to the right
-    currentSegment = segmentDeque.popleft()
-    orderedSegments = collections.deque()
-    orderedSegments.append(currentSegment)
-    firstSegment = currentSegment
-    matchingSegment = True
-    while matchingSegment: # Search right from firstSegment
-        matchingSegment = False
-        for i in xrange(len(segmentDeque)):
-            matches = any_in_point_equals_any_in_other(currentSegment.endPoints,
-                                                       segmentDeque[0].endPoints)
-            if matches:
-                testSegment = segmentDeque.popleft()
-                if matches[0] == 0:  # if current's begin point is the match
-                    currentSegment.reverse()
-                if matches[1] == 1:  # if test's end point is the match
-                    testSegment.reverse()
-                testSegment.popleft() # eliminates duplicate point
-                orderedSegments.append(testSegment)
-                currentSegment = testSegment
-                matchingSegment = True
-                break
-            segmentDeque.rotate(-1)  # for performance since deque is a linked list
-
-    matchingSegment = True
-    currentSegment = firstSegment
-    while matchingSegment: # Search left from firstSegment
-        matchingSegment = False
-        for i in xrange(len(segmentDeque)):
-            matches = any_in_point_equals_any_in_other(currentSegment.endPoints,
-                                                       segmentDeque[0].endPoints)
-            if matches:
-                testSegment = segmentDeque.pop()
-                if matches[0] == 1:  # if current's end point is the match
-                    currentSegment.reverse()
-                if matches[1] == 0:  # if test's begin point is the match
-                    testSegment.reverse()
-                testSegment.pop() # eliminates duplicate point
-                orderedSegments.appendleft(testSegment)
-                currentSegment = testSegment
-                matchingSegment = True
-                break
-            segmentDeque.rotate(1)  # for performance since deque is a linked list
-
-    # flatten all points to a single list
-    # orderPoints = [pt for seg in orderedSegments for pt in seg]
-    orderedPoints = []
-    for seg in orderedSegments:
-        for pt in seg:
-            orderedPoints.append(pt)
-
+    chainer = getattr(segmentDeque, 'chainer', None)
+    if chainer is None or not _sameSegments(chainer.unusedSegments(), segmentDeque):
+        chainer = SegmentChainer(list(segmentDeque))
+        if isinstance(segmentDeque, _SegmentDeque):
+            segmentDeque.chainer = chainer
+    orderedPoints = chainer.chainNext()
+    segmentDeque.clear()
+    segmentDeque.extend(chainer.unusedSegments())
     return orderedPoints
 
 
+def _sameSegments(segments, other):
+    return len(segments) == len(other) and \
+        all(a is b for a, b in zip(segments, other))
+
+
+class _SegmentDeque(collections.deque):
+    """
+    The deque of segments _breakPolylinesIntoSegments returns. It keeps the
+    SegmentChainer getPointListFromSegmentList builds for its segments.
+    """
+    chainer = None
+
+
 class _PolylineSegment(collections.deque):
     """
     Convenience class to make picking the start point and
@@ -239,19 +458,29 @@ class _PolylineSegment(collections.deque):
     def endPoints(self):
         return self[0], self[-1]
 
-def _breakPolylinesIntoSegments(fc, spatialRef=None):
+def _breakPolylinesIntoSegments(fc, spatialRef=None, whereClause=None):
     """
     Given a feature class (Polyline), returns all segments
-    broken out as ExtendedPoints.
+    broken out as ExtendedPoints. The points of a PolylineZ keep their Z.
     :param fc: Feature Class to break into segments.
-    :param onlySoSelected: If true, only operate on selected items
+    :param whereClause: Optional. SQL expression limiting which features are read.
     :return: deque of all segments in the feature class
     :rtype: deque (of list of segments)
     """
-    segmentDeque = collections.deque()
+    return _SegmentDeque(_iterPolylineSegments(fc, spatialRef=spatialRef,
+                                               whereClause=whereClause))
+
+def _iterPolylineSegments(fc, spatialRef=None, whereClause=None):
+    """
+    Generator form of _breakPolylinesIntoSegments, yielding each segment as
+    soon as it is read.
+    """
     oidName = arcpy.Describe(fc).OIDFieldName
+    cursorSpatialRef, transformer = _cursorProjection(fc, spatialRef)
 
-    lines_cursor = arcpy.da.SearchCursor(fc, ["SHAPE@", oidName], spatial_reference=spatialRef)
+    lines_cursor = arcpy.da.SearchCursor(fc, ["SHAPE@", oidName],
+                                         where_clause=whereClause,
+                                         spatial_reference=cursorSpatialRef)
     try:
         for lines_row in lines_cursor:
             oid = lines_row[1]
@@ -261,10 +490,25 @@ def _breakPolylinesIntoSegments(fc, spatialRef=None):
                 geomPart = geom.getPart(partIndex)
                 for aPoint in geomPart:
                     aPolylineSegment.append(ExtendedPoint(aPoint, parentPK=oid))
-            segmentDeque.append(aPolylineSegment)
+            if transformer is not None:
+                transformer.transformPoints(aPolylineSegment)
+            yield aPolylineSegment
     finally:
         del lines_cursor
-    return segmentDeque
+
+def _cursorProjection(fc, spatialRef):
+    """
+    A built-in Projection.CoordinateSystem is not something a SearchCursor
+    can project to: read the features in their own coordinate system and
+    reproject them with a Transformer instead.
+    :return: tuple of the spatial_reference for the cursor, and the
+            Transformer to apply to what it reads (None for an arcpy
+            SpatialReference or None)
+    """
+    if not isinstance(spatialRef, CoordinateSystem):
+        return spatialRef, None
+    source = arcpy.Describe(fc).spatialReference.factoryCode
+    return None, Transformer(source, spatialRef)
 
 def _generateOutputFileName(seedName, fileNumber, outDir):
     """
@@ -284,6 +528,33 @@ def _generateOutputFileName(seedName, fileNumber, outDir):
     return outDir + '/' + os.path.basename(seedName_) + fn + '.csv'
 
 
+def _generateCheckLayerFileName(seedName, outDir):
+    """
+    Takes a feature class name and generates the check layer shapefile
+    name from it, in outDir.
+    :rtype: str
+    """
+    return _generateOutputFileName(seedName, 0, outDir)[:-4] + '_check.shp'
+
+
+def _generateStatisticsFileName(seedName, outDir):
+    """
+    Takes a feature class name and generates the curvature statistics
+    file name from it, in outDir.
+    :rtype: str
+    """
+    return _generateOutputFileName(seedName, 0, outDir)[:-4] + '_stats.json'
+
+
+def _generateSpiralsFileName(csvFileName):
+    """
+    Takes the name of an alignment's csv file and generates the name of
+    the csv file of its spirals.
+    :rtype: str
+    """
+    return csvFileName[:-4] + '_spirals.csv'
+
+
 class NotPolylineError(TypeError):
     """
     Indicates that the given file or feature class is not a Polyline type.
@@ -0,0 +1,175 @@
+"""
+Compact in-memory storage of alignment coordinates.
+
+State plane coordinates (X about 2,151,730 in US survey feet for
+Y15A_GIS.csv) need float64: float32 keeps only 24 bits of mantissa, which
+at that magnitude is a step of 0.25 ft.  Offsets from a nearby origin are
+small, so a CompactAlignment keeps one float64 origin and the offsets of
+its vertices as float32, half of the memory of float64 coordinates.  The
+origin is the whole-unit center of the alignment's extent by default, or
+a shared tile origin (see tileOrigin).
+
+Error bound: converting an offset d to float32 (round to nearest) errs by
+at most |d| * 2 ** -24, and adding the float64 origin back errs by at most
+|X| * 2 ** -53.  So every restored coordinate is within
+    errorBound = maxOffset * 2 ** -24 + maxCoordinate * 2 ** -53
+of the original, maxOffset being the largest offset on any axis: 0.3 mm
+for offsets up to 5 km.  The constructor refuses an alignment whose bound
+exceeds maxError, if one is given.
+
+The arc analysis is done in the local coordinates (the offsets, widened
+to float64), which also keeps the circumcenter math away from the
+cancellation of subtracting coordinates of seven significant digits.
+Distances, angles and radii do not depend on the origin; the vertex and
+curve center coordinates are restored to absolute ones only for output.
+The analysis results are those of the stored vertices, i.e. of the
+original vertices each moved by at most errorBound.
+"""
+
+import math
+import numpy as np
+from ArcKernel import compute_arc_arrays, compute_vertical_arrays
+from ExtendedPoint import ExtendedPoint
+from ExtendedPointList import ExtendedPointList
+
+_float32Error = 2.0 ** -24
+_float64Error = 2.0 ** -53
+
+
+def tileOrigin(x, y, tileSize):
+    """
+    :return: origin (lower left corner) of the tile of size tileSize
+            holding x, y, for alignments sharing one tile origin
+    """
+    return (math.floor(x / tileSize) * tileSize, math.floor(y / tileSize) * tileSize)
+
+
+class CompactAlignment(object):
+    """
+    Methods:
+        absoluteCoordinates - restored float64 X, Y (and Z) arrays
+        analyze - arc (and vertical) arrays computed in local coordinates
+        toAnalyzedPointList - analyzed ExtendedPointList in absolute
+            coordinates, for writing with writeToCSV
+    Members:
+        origin - (X, Y, Z) of the origin; Z is None without Z
+        offsets - float32 array of shape (count, 2 or 3)
+        errorBound - most distance (per axis) of a restored coordinate
+            from the original
+        nbytes - bytes of coordinate storage
+    """
+    def __init__(self, xs, ys, zs=None, origin=None, maxError=None):
+        """
+        ctor for a CompactAlignment
+        :param xs: array-like of X values
+        :param ys: array-like of Y values
+        :param zs: Optional. array-like of Z values
+        :param origin: Optional. (X, Y) or (X, Y, Z) of the origin. Defaults
+                to the whole-unit center of the extent.
+        :param maxError: Optional. Raise ValueError if errorBound exceeds it.
+        :return: None
+        """
+        columns = [np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)]
+        if zs is not None:
+            columns.append(np.asarray(zs, dtype=float))
+        if origin is None:
+            origin = [math.floor((c.min() + c.max()) / 2.0) if len(c) else 0.0
+                      for c in columns]
+        else:
+            origin = [float(value) for value in origin]
+            if zs is not None and len(origin) < 3:
+                origin.append(math.floor((columns[2].min() + columns[2].max()) / 2.0)
+                              if len(columns[2]) else 0.0)
+        self.origin = tuple(origin[:2]) + ((origin[2],) if zs is not None else (None,))
+        self.offsets = np.empty((len(columns[0]), len(columns)), dtype=np.float32)
+        maxOffset = 0.0
+        maxCoordinate = 0.0
+        for axis, column in enumerate(columns):
+            offset = column - origin[axis]
+            self.offsets[:, axis] = offset
+            if len(column):
+                maxOffset = max(maxOffset, np.abs(offset).max())
+                maxCoordinate = max(maxCoordinate, np.abs(column).max())
+        self.errorBound = maxOffset * _float32Error + maxCoordinate * _float64Error
+        if maxError is not None and self.errorBound > maxError:
+            raise ValueError('Error bound {0} exceeds {1}; use a nearer origin '
+                             '(smaller tiles).'.format(self.errorBound, maxError))
+
+    @classmethod
+    def fromPointList(cls, pointList, origin=None, maxError=None):
+        """
+        :param pointList: list of ExtendedPoints; Z is kept if every point
+                has it
+        :rtype: CompactAlignment
+        """
+        xs = [point.X for point in pointList]
+        ys = [point.Y for point in pointList]
+        zs = None
+        if pointList and all(point.Z is not None for point in pointList):
+            zs = [point.Z for point in pointList]
+        return cls(xs, ys, zs, origin=origin, maxError=maxError)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def hasZ(self):
+        return self.origin[2] is not None
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes
+
+    def localCoordinates(self):
+        """
+        :return: float64 arrays of the offsets, one per axis
+        """
+        return [self.offsets[:, axis].astype(float) for axis in range(self.offsets.shape[1])]
+
+    def absoluteCoordinates(self):
+        """
+        :return: float64 arrays X, Y (and Z) restored from the offsets
+        """
+        return [column + origin for column, origin in
+                zip(self.localCoordinates(), self.origin)]
+
+    def analyze(self):
+        """
+        Compute the arc values (see ArcKernel) in local coordinates. The
+        curve centers are restored to absolute coordinates.
+        :return: ArcArrays, and VerticalArrays (None without Z)
+        :rtype: (ArcArrays, VerticalArrays)
+        """
+        local = self.localCoordinates()
+        arcs = compute_arc_arrays(local[0], local[1])
+        arcs = arcs._replace(centerX=arcs.centerX + self.origin[0],
+                             centerY=arcs.centerY + self.origin[1])
+        vertical = None
+        if self.hasZ:
+            vertical = compute_vertical_arrays(local[2], arcs.distanceBack,
+                                               arcs.distanceAhead)
+        return arcs, vertical
+
+    def toAnalyzedPointList(self):
+        """
+        Analyze ExtendedPoints of the local coordinates with
+        computeAllPointInformation, then move them (and their curve centers)
+        to absolute coordinates.
+        :rtype: ExtendedPointList
+        """
+        local = self.localCoordinates()
+        zs = local[2].tolist() if self.hasZ else [None] * len(self)
+        pointList = ExtendedPointList()
+        pointList.extend(ExtendedPoint(x, y, newZ=z)
+                         for x, y, z in zip(local[0].tolist(), local[1].tolist(), zs))
+        pointList.computeAllPointInformation()
+        originX, originY, originZ = self.origin
+        for point in pointList:
+            point.X += originX
+            point.Y += originY
+            if originZ is not None:
+                point.Z += originZ
+            if point.arc and point.arc.curveCenter:
+                point.arc.curveCenter = ExtendedPoint(point.arc.curveCenter.X + originX,
+                                                      point.arc.curveCenter.Y + originY)
+        return pointList
@@ -0,0 +1,218 @@
+"""
+Transparent gzip / bz2 streaming for the result csv files.
+
+The compression is chosen from the file extension (.gz or .bz2, e.g.
+Y15A.csv.gz); any other extension is plain text.  Writers collect lines
+in a large buffer and hand the compressor big blocks, since compressing
+one short line at a time is slow.  With background=True the compression
+and the disk writes run on a separate thread, so they overlap with the
+arc computations of the caller (zlib and bz2 release the GIL while they
+compress).
+
+    with openForWrite('Y15A.csv.gz') as f:
+        f.write(header + '\\n')
+    with openForRead('Y15A.csv.gz') as f:
+        for row in csv.reader(f): ...
+
+Outputs that must not be left half written go through atomicOutput,
+which hands out a temporary name and renames it into place when done.
+"""
+
+import bz2
+import contextlib
+import gzip
+import io
+import os
+import sys
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Compression levels used when none is given.
+DEFAULT_LEVELS = {'gzip': 6, 'bz2': 9}
+
+_extensions = {'.gz': 'gzip', '.gzip': 'gzip', '.bz2': 'bz2'}
+
+
+def compressionFor(fileName):
+    """
+    :return: 'gzip', 'bz2' or None, based on the extension of fileName
+    """
+    lowered = fileName.lower()
+    for extension, compression in _extensions.items():
+        if lowered.endswith(extension):
+            return compression
+    return None
+
+
+def _openCompressed(fileName, mode, compression, compressLevel):
+    if compressLevel is None:
+        compressLevel = DEFAULT_LEVELS[compression]
+    if compression == 'gzip':
+        return gzip.GzipFile(fileName, mode, compresslevel=compressLevel)
+    return bz2.BZ2File(fileName, mode, compresslevel=compressLevel)
+
+
+def openForRead(fileName):
+    """
+    Open a csv file for reading text, decompressing it if its extension
+    calls for it. The result can be passed to csv.reader.
+    """
+    compression = compressionFor(fileName)
+    if compression is None:
+        return open(fileName, 'r')
+    f = _openCompressed(fileName, 'rb', compression, None)
+    if sys.version_info[0] >= 3:
+        return io.TextIOWrapper(f)
+    return f
+
+
+def openForWrite(fileName, compressLevel=None, bufferSize=DEFAULT_BUFFER_SIZE,
+                 background=False):
+    """
+    Open a csv file for writing text, compressing it if its extension calls
+    for it.
+    :param fileName: output file name; .gz or .bz2 selects the compression
+    :param compressLevel: Optional. 1 (fastest) to 9 (smallest).
+    :param bufferSize: number of characters collected before they are
+            handed to the compressor
+    :param background: If True, compress and write on a separate thread.
+    :return: a writer with write, close, and context manager support
+    """
+    compression = compressionFor(fileName)
+    if compression is None:
+        return open(fileName, 'w', bufferSize)
+    f = _openCompressed(fileName, 'wb', compression, compressLevel)
+    if background:
+        return BufferedTextWriter(_BackgroundSink(f), bufferSize)
+    return BufferedTextWriter(f, bufferSize)
+
+
+def replaceFile(source, destination):
+    """Rename source to destination, replacing destination if it exists."""
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+        return
+    if os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+
+@contextlib.contextmanager
+def atomicOutput(fileName):
+    """
+    Context manager yielding a temporary file name next to fileName. If the
+    block completes, the temporary file is renamed to fileName; if it raises,
+    the temporary file is removed and fileName is left untouched.
+        with atomicOutput(outName) as tempName:
+            aPointList.writeToCSV(tempName)
+    """
+    directory, baseName = os.path.split(fileName)
+    # Keep the extension, so compression chosen by extension still applies.
+    tempName = os.path.join(directory, '.partial.' + baseName)
+    try:
+        yield tempName
+    except BaseException:
+        if os.path.exists(tempName):
+            os.remove(tempName)
+        raise
+    replaceFile(tempName, fileName)
+
+
+class BufferedTextWriter(object):
+    """
+    Collects written text and passes it on to the underlying binary file in
+    blocks of at least bufferSize characters.
+    """
+    def __init__(self, sink, bufferSize=DEFAULT_BUFFER_SIZE):
+        self._sink = sink
+        self._bufferSize = bufferSize
+        self._pieces = []
+        self._size = 0
+
+    def write(self, text):
+        self._pieces.append(text)
+        self._size += len(text)
+        if self._size >= self._bufferSize:
+            self._flushPieces()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def _flushPieces(self):
+        if not self._pieces:
+            return
+        block = ''.join(self._pieces)
+        if not isinstance(block, bytes):
+            block = block.encode('utf-8')
+        self._sink.write(block)
+        self._pieces = []
+        self._size = 0
+
+    def flush(self):
+        self._flushPieces()
+        self._sink.flush()
+
+    def close(self):
+        try:
+            self._flushPieces()
+        finally:
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self.close()
+
+
+class _BackgroundSink(object):
+    """
+    Writes blocks to a file on a worker thread. At most maxPending blocks
+    wait in the queue, so a slow disk holds the producer back instead of
+    letting memory grow. An error on the worker thread is raised by the
+    next write or by close.
+    """
+    _endOfStream = None
+
+    def __init__(self, f, maxPending=4):
+        self._file = f
+        self._queue = queue.Queue(maxPending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            block = self._queue.get()
+            if block is self._endOfStream:
+                return
+            if self._error is None:
+                try:
+                    self._file.write(block)
+                except Exception as e:
+                    self._error = e
+
+    def _raiseError(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, block):
+        self._raiseError()
+        self._queue.put(block)
+
+    def flush(self):
+        self._raiseError()
+
+    def close(self):
+        self._queue.put(self._endOfStream)
+        self._thread.join()
+        self._file.close()
+        self._raiseError()
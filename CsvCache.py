@@ -0,0 +1,250 @@
+"""
+Binary cache of the parsed numeric columns of csv files.
+
+The first load of a csv file parses it into a 2-D float array (one column
+per header field, nan for empty or non-numeric values, and 0.0 for the
+False the writer emits for the arc lengths of a tangent) and saves that
+array as a .npy file in the cache directory.  A small JSON file beside it
+holds the column names and the path, size and modification time of the
+csv file.  Later loads memory-map the .npy file instead of parsing the
+text again, as long as the csv file has the same size and modification
+time; otherwise the entry is rebuilt.
+
+The cache is opt-in: it is used only when the ROADGEOMETRY_CSV_CACHE
+environment variable names a directory for it ('~' is expanded; unset,
+empty or 'off' disables it, and every load parses the csv file).  When
+the cache grows beyond ROADGEOMETRY_CSV_CACHE_MB megabytes (default
+1024), the entries used least recently are removed.
+
+The csv file is parsed PARSE_CHUNK_ROWS rows at a time, so besides the
+float array parsing needs memory for one chunk of text only.  Lines are
+split on commas, except those holding a double quote, which are read
+with the csv module (a quoted field may hold commas, or line breaks).
+"""
+
+import csv
+import hashlib
+import json
+import os
+import numpy as np
+from CompressedIO import atomicOutput, openForRead
+
+CACHE_DIR_VARIABLE = 'ROADGEOMETRY_CSV_CACHE'
+CACHE_SIZE_VARIABLE = 'ROADGEOMETRY_CSV_CACHE_MB'
+
+PARSE_CHUNK_ROWS = 65536
+
+_defaultCacheMegabytes = 1024
+
+
+def cacheDirectory():
+    """
+    :return: the cache directory, or None if the cache is turned off (the
+            default)
+    """
+    directory = os.environ.get(CACHE_DIR_VARIABLE, '')
+    if not directory or directory.lower() == 'off':
+        return None
+    return os.path.expanduser(directory)
+
+
+def cacheSizeLimit():
+    """
+    :return: the most bytes the cache directory may hold
+    """
+    return int(float(os.environ.get(CACHE_SIZE_VARIABLE,
+                                    _defaultCacheMegabytes)) * 1024 * 1024)
+
+
+def parseCsvColumns(csvFileName, chunkRows=PARSE_CHUNK_ROWS):
+    """
+    Parse a csv file into its column names and a 2-D float array.
+    Rows with fewer fields than the header (the end points of an analyzed
+    alignment) are padded with nan.
+    :param chunkRows: Optional. Number of rows parsed at a time.
+    :rtype: (list of str, numpy array)
+    """
+    with openForRead(csvFileName) as f:
+        headerLine = f.readline().rstrip('\r\n')
+        if not headerLine:
+            raise ValueError('{0} has no header row.'.format(csvFileName))
+        header = [name.strip() for name in next(csv.reader([headerLine]))]
+        chunks = []
+        rows = []
+        rowCount = 0
+        quotedLines = None
+        for line in f:
+            if quotedLines is not None:
+                quotedLines.append(line)
+                line = ''.join(quotedLines)
+            if '"' in line:
+                if line.count('"') % 2:
+                    # A quoted field goes on in the next line.
+                    quotedLines = [line]
+                    continue
+                quotedLines = None
+                line = _unquoteRow(line)
+            line = line.rstrip('\r\n')
+            if not line:
+                continue
+            rows.append(line)
+            if len(rows) == chunkRows:
+                chunks.append(_parseRows(rows, len(header), rowCount, csvFileName))
+                rowCount += len(rows)
+                rows = []
+        if quotedLines is not None:
+            rows.append(_unquoteRow(''.join(quotedLines)).rstrip('\r\n'))
+        if rows or not chunks:
+            chunks.append(_parseRows(rows, len(header), rowCount, csvFileName))
+    if len(chunks) == 1:
+        return header, chunks[0]
+    return header, np.concatenate(chunks)
+
+
+def _unquoteRow(line):
+    """
+    A line read with the csv module, written back as plain comma separated
+    text. The commas and line breaks inside a field are blanked; such a
+    field is not a number, and parses to nan either way.
+    """
+    fields = next(csv.reader([line]))
+    return ','.join(field.replace(',', ' ').replace('\r', ' ').replace('\n', ' ')
+                    for field in fields)
+
+
+def _parseRows(rows, columnCount, rowsBefore, csvFileName):
+    """
+    :return: 2-D float array of rows (lines of text, without empty ones)
+    """
+    commaCount = columnCount - 1
+    for index, line in enumerate(rows):
+        missing = commaCount - line.count(',')
+        if missing > 0:
+            rows[index] = line + ',' * missing
+        elif missing < 0:
+            raise ValueError('{0}: row {1} has more fields than the header.'
+                             .format(csvFileName, rowsBefore + index + 2))
+
+    values = np.empty((len(rows), columnCount), dtype=float)
+    if rows:
+        fields = ','.join(rows).split(',')
+        for column in range(columnCount):
+            values[:, column] = _parseColumn(fields[column::columnCount])
+    return values
+
+
+def _parseColumn(texts):
+    texts = [text or 'nan' for text in texts]
+    parsed = np.fromstring(','.join(texts).replace('False', '0.0'), sep=',')
+    if len(parsed) == len(texts):
+        return parsed
+    # Some values are not numbers; convert one at a time.
+    parsed = np.empty(len(texts))
+    for index, text in enumerate(texts):
+        try:
+            parsed[index] = float(text)
+        except ValueError:
+            parsed[index] = 0.0 if text == 'False' else np.nan
+    return parsed
+
+
+def _entryPaths(directory, csvFileName):
+    key = hashlib.sha1(os.path.abspath(csvFileName).encode('utf-8')).hexdigest()
+    basePath = os.path.join(directory, key)
+    return basePath + '.json', basePath + '.npy'
+
+
+def _csvSignature(csvFileName):
+    stat = os.stat(csvFileName)
+    return {'path': os.path.abspath(csvFileName), 'size': stat.st_size,
+            'mtime': stat.st_mtime}
+
+
+def loadCsvColumns(csvFileName):
+    """
+    Load the parsed columns of a csv file, from the cache if they are there
+    and still current.
+    :return: column names and a 2-D float array of rows x columns. From the
+            cache, the array is a read-only memory map.
+    :rtype: (list of str, numpy array)
+    """
+    directory = cacheDirectory()
+    if directory is None:
+        return parseCsvColumns(csvFileName)
+    headerFile, arrayFile = _entryPaths(directory, csvFileName)
+    signature = _csvSignature(csvFileName)
+
+    if os.path.exists(headerFile) and os.path.exists(arrayFile):
+        try:
+            with open(headerFile, 'r') as f:
+                entry = json.load(f)
+            if entry['source'] == signature:
+                values = np.load(arrayFile, mmap_mode='r')
+                os.utime(headerFile, None)
+                return entry['columns'], values
+        except (ValueError, KeyError, IOError, OSError):
+            pass
+        _removeEntry(headerFile, arrayFile)
+
+    header, values = parseCsvColumns(csvFileName)
+    try:
+        _storeEntry(directory, headerFile, arrayFile, signature, header, values)
+    except (IOError, OSError):
+        # A cache that cannot be written must not stop the analysis.
+        pass
+    return header, values
+
+
+def _storeEntry(directory, headerFile, arrayFile, signature, header, values):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with atomicOutput(arrayFile) as tempName:
+        with open(tempName, 'wb') as f:
+            np.save(f, values)
+    # The header is written last, so an entry without one is never used.
+    with atomicOutput(headerFile) as tempName:
+        with open(tempName, 'w') as f:
+            json.dump({'source': signature, 'columns': header}, f)
+    trimCache(directory, cacheSizeLimit())
+
+
+def _removeEntry(headerFile, arrayFile):
+    for fileName in (headerFile, arrayFile):
+        try:
+            os.remove(fileName)
+        except OSError:
+            pass
+
+
+def trimCache(directory, maxBytes):
+    """
+    Remove the least recently used entries until the cache directory holds
+    at most maxBytes.
+    """
+    entries = []
+    totalBytes = 0
+    for name in os.listdir(directory):
+        if not name.endswith('.json') or name.startswith('.'):
+            continue
+        headerFile = os.path.join(directory, name)
+        arrayFile = headerFile[:-5] + '.npy'
+        try:
+            size = os.path.getsize(headerFile)
+            if os.path.exists(arrayFile):
+                size += os.path.getsize(arrayFile)
+            entries.append((os.path.getmtime(headerFile), size, headerFile, arrayFile))
+        except OSError:
+            continue
+        totalBytes += size
+    for lastUsed, size, headerFile, arrayFile in sorted(entries):
+        if totalBytes <= maxBytes:
+            break
+        _removeEntry(headerFile, arrayFile)
+        totalBytes -= size
+
+
+def clearCache():
+    """Remove every entry from the cache directory."""
+    directory = cacheDirectory()
+    if directory is not None and os.path.exists(directory):
+        trimCache(directory, 0)
@@ -0,0 +1,361 @@
+"""
+Mergeable, bounded-memory summaries of the curvature of many alignments.
+
+A CurvatureSummary keeps, for each of radius, degree of curve, arc
+deflection and arc length, a fixed-bin log-scale histogram and a
+quantile sketch.  Neither grows with the number of vertices added, and
+two summaries of the same configuration merge exactly, so the summaries
+of parallel workers, of separate runs, or of many roads can be combined
+into county or state summaries without re-reading any csv files.
+
+The quantile sketch keeps counts in logarithmically sized buckets (as in
+DDSketch), so any quantile it reports is within relativeAccuracy of a
+value actually at that rank.
+
+Units are those of the csv files: degree is degrees per 100 units of
+length, deflection is in degrees.  Radius and arc length are summarized
+for curved vertices only; degree and deflection for every vertex with a
+triplet (tangents count as 0).
+
+Statistics files are JSON with a 'total' summary and named 'parts' (the
+alignments of a feature class, or the feature classes of a run).
+To merge statistics files from the command line:
+    python CurvatureStatistics.py merged.json a_stats.json b_stats.json ...
+"""
+
+import json
+import math
+import sys
+import numpy as np
+from CompressedIO import atomicOutput
+
+QUANTITIES = ('radius', 'degree', 'deflection', 'arcLength')
+
+REPORTED_PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+
+
+class LogHistogram(object):
+    """
+    Counts of absolute values in bins of equal width on a log scale, from
+    10 ** lowExponent to 10 ** highExponent, plus counts of zeros and of
+    values below and above that range.
+    """
+    def __init__(self, lowExponent=-3, highExponent=7, binsPerDecade=20):
+        self.lowExponent = lowExponent
+        self.highExponent = highExponent
+        self.binsPerDecade = binsPerDecade
+        self.counts = np.zeros((highExponent - lowExponent) * binsPerDecade,
+                               dtype=np.int64)
+        self.zeroCount = 0
+        self.underflowCount = 0
+        self.overflowCount = 0
+
+    @property
+    def binEdges(self):
+        return 10.0 ** np.linspace(self.lowExponent, self.highExponent,
+                                   len(self.counts) + 1)
+
+    @property
+    def count(self):
+        return int(self.counts.sum()) + self.zeroCount + \
+            self.underflowCount + self.overflowCount
+
+    def addArray(self, values):
+        magnitudes = np.abs(np.asarray(values, dtype=float))
+        magnitudes = magnitudes[np.isfinite(magnitudes)]
+        self.zeroCount += int(np.count_nonzero(magnitudes == 0.0))
+        magnitudes = magnitudes[magnitudes > 0.0]
+        bins = np.floor((np.log10(magnitudes) - self.lowExponent) *
+                        self.binsPerDecade).astype(np.int64)
+        self.underflowCount += int(np.count_nonzero(bins < 0))
+        self.overflowCount += int(np.count_nonzero(bins >= len(self.counts)))
+        inRange = bins[(bins >= 0) & (bins < len(self.counts))]
+        self.counts += np.bincount(inRange, minlength=len(self.counts))
+
+    def _configuration(self):
+        return self.lowExponent, self.highExponent, self.binsPerDecade
+
+    def merge(self, other):
+        if self._configuration() != other._configuration():
+            raise ValueError('Histograms with different bins cannot be merged.')
+        self.counts += other.counts
+        self.zeroCount += other.zeroCount
+        self.underflowCount += other.underflowCount
+        self.overflowCount += other.overflowCount
+
+    def toDict(self):
+        return {'lowExponent': self.lowExponent,
+                'highExponent': self.highExponent,
+                'binsPerDecade': self.binsPerDecade,
+                'counts': self.counts.tolist(),
+                'zeroCount': self.zeroCount,
+                'underflowCount': self.underflowCount,
+                'overflowCount': self.overflowCount}
+
+    @classmethod
+    def fromDict(cls, d):
+        histogram = cls(d['lowExponent'], d['highExponent'], d['binsPerDecade'])
+        histogram.counts = np.array(d['counts'], dtype=np.int64)
+        histogram.zeroCount = d['zeroCount']
+        histogram.underflowCount = d['underflowCount']
+        histogram.overflowCount = d['overflowCount']
+        return histogram
+
+
+class QuantileSketch(object):
+    """
+    Relative-error quantile sketch of signed values. A value v is counted
+    in bucket ceil(log(|v|) / log(gamma)) of the store for its sign, where
+    gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy). If a store
+    would exceed maxBins buckets, its buckets of smallest magnitude are
+    collapsed into one, which only affects quantiles among those values.
+    """
+    def __init__(self, relativeAccuracy=0.01, maxBins=2048):
+        self.relativeAccuracy = relativeAccuracy
+        self.maxBins = maxBins
+        self._gamma = (1.0 + relativeAccuracy) / (1.0 - relativeAccuracy)
+        self._logGamma = math.log(self._gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeroCount = 0
+        self.minimum = float('inf')
+        self.maximum = float('-inf')
+
+    @property
+    def count(self):
+        return sum(self.positive.values()) + sum(self.negative.values()) + \
+            self.zeroCount
+
+    def _addToStore(self, store, magnitudes):
+        if len(magnitudes) == 0:
+            return
+        keys = np.ceil(np.log(magnitudes) / self._logGamma).astype(np.int64)
+        uniqueKeys, counts = np.unique(keys, return_counts=True)
+        for key, keyCount in zip(uniqueKeys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + keyCount
+        self._collapse(store)
+
+    def _collapse(self, store):
+        if len(store) <= self.maxBins:
+            return
+        keys = sorted(store)
+        excess = len(keys) - self.maxBins
+        lowest = keys[excess]
+        store[lowest] += sum(store.pop(key) for key in keys[:excess])
+
+    def addArray(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self.zeroCount += int(np.count_nonzero(values == 0.0))
+        self._addToStore(self.positive, values[values > 0.0])
+        self._addToStore(self.negative, -values[values < 0.0])
+
+    def merge(self, other):
+        if self.relativeAccuracy != other.relativeAccuracy:
+            raise ValueError('Sketches of different accuracy cannot be merged.')
+        for store, otherStore in ((self.positive, other.positive),
+                                  (self.negative, other.negative)):
+            for key, keyCount in otherStore.items():
+                store[key] = store.get(key, 0) + keyCount
+            self._collapse(store)
+        self.zeroCount += other.zeroCount
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def _bucketValue(self, key):
+        return 2.0 * self._gamma ** key / (self._gamma + 1.0)
+
+    def quantile(self, q):
+        """
+        :param q: quantile, 0.0 to 1.0
+        :return: estimated value at that quantile, or None if empty
+        """
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._bucketValue(key), self.minimum)
+        seen += self.zeroCount
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._bucketValue(key), self.maximum)
+        return self.maximum
+
+    def toDict(self):
+        return {'relativeAccuracy': self.relativeAccuracy,
+                'maxBins': self.maxBins,
+                'positive': dict((str(k), v) for k, v in self.positive.items()),
+                'negative': dict((str(k), v) for k, v in self.negative.items()),
+                'zeroCount': self.zeroCount,
+                'minimum': self.minimum if self.count else None,
+                'maximum': self.maximum if self.count else None}
+
+    @classmethod
+    def fromDict(cls, d):
+        sketch = cls(d['relativeAccuracy'], d['maxBins'])
+        sketch.positive = dict((int(k), v) for k, v in d['positive'].items())
+        sketch.negative = dict((int(k), v) for k, v in d['negative'].items())
+        sketch.zeroCount = d['zeroCount']
+        if d['minimum'] is not None:
+            sketch.minimum = d['minimum']
+            sketch.maximum = d['maximum']
+        return sketch
+
+
+class CurvatureSummary(object):
+    """
+    Histogram and quantile sketch of each of QUANTITIES.
+    Methods:
+        addPointList - add the analyzed vertices of an alignment
+        addArcArrays - add the output of ArcKernel.compute_arc_arrays
+        merge - add the counts of another summary
+        percentile - estimated value of a quantity at a percentile
+    """
+    def __init__(self, relativeAccuracy=0.01):
+        self.vertexCount = 0
+        self.curveCount = 0
+        self.histograms = dict((q, LogHistogram()) for q in QUANTITIES)
+        self.sketches = dict((q, QuantileSketch(relativeAccuracy))
+                             for q in QUANTITIES)
+
+    def addValues(self, radius, degree, deflection, arcLength):
+        """
+        :param radius: array of radii of the vertices, inf on tangents
+        :param degree: array of degrees of curve (per 100 units)
+        :param deflection: array of arc deflections, in degrees
+        :param arcLength: array of arc lengths through the vertices
+        """
+        radius = np.asarray(radius, dtype=float)
+        curved = np.isfinite(radius)
+        self.vertexCount += len(radius)
+        self.curveCount += int(np.count_nonzero(curved))
+        values = {'radius': radius[curved],
+                  'degree': degree,
+                  'deflection': deflection,
+                  'arcLength': np.asarray(arcLength, dtype=float)[curved]}
+        for quantity in QUANTITIES:
+            self.histograms[quantity].addArray(values[quantity])
+            self.sketches[quantity].addArray(values[quantity])
+
+    def addPointList(self, pointList):
+        """
+        :param pointList: ExtendedPoints after compute_arc_parameters. The
+                end points, having no arc, are skipped.
+        """
+        arcs = [point.arc for point in pointList if getattr(point, 'arc', None)]
+        self.addValues([arc.radius for arc in arcs],
+                       [arc.degreeCurve100 for arc in arcs],
+                       [math.degrees(arc.deflection) for arc in arcs],
+                       [(arc.lengthBack or 0.0) + (arc.lengthAhead or 0.0)
+                        for arc in arcs])
+
+    def addArcArrays(self, arcArrays):
+        """
+        :param arcArrays: ArcKernel.ArcArrays (the nan end entries are skipped)
+        """
+        interior = np.isfinite(arcArrays.distanceBack) & \
+            np.isfinite(arcArrays.distanceAhead)
+        self.addValues(arcArrays.radius[interior],
+                       np.degrees(arcArrays.degreeCurve[interior]) * 100.0,
+                       np.degrees(arcArrays.arcDeflection[interior]),
+                       (arcArrays.lengthBack + arcArrays.lengthAhead)[interior])
+
+    def merge(self, other):
+        self.vertexCount += other.vertexCount
+        self.curveCount += other.curveCount
+        for quantity in QUANTITIES:
+            self.histograms[quantity].merge(other.histograms[quantity])
+            self.sketches[quantity].merge(other.sketches[quantity])
+
+    def percentile(self, quantity, percent):
+        return self.sketches[quantity].quantile(percent / 100.0)
+
+    def toDict(self):
+        d = {'vertexCount': self.vertexCount, 'curveCount': self.curveCount}
+        for quantity in QUANTITIES:
+            d[quantity] = {
+                'histogram': self.histograms[quantity].toDict(),
+                'sketch': self.sketches[quantity].toDict(),
+                'percentiles': dict((str(p), self.percentile(quantity, p))
+                                    for p in REPORTED_PERCENTILES)}
+        return d
+
+    @classmethod
+    def fromDict(cls, d):
+        summary = cls()
+        summary.vertexCount = d['vertexCount']
+        summary.curveCount = d['curveCount']
+        for quantity in QUANTITIES:
+            summary.histograms[quantity] = LogHistogram.fromDict(d[quantity]['histogram'])
+            summary.sketches[quantity] = QuantileSketch.fromDict(d[quantity]['sketch'])
+        return summary
+
+
+def writeStatistics(fileName, total, parts=None):
+    """
+    Write a statistics file.
+    :param total: CurvatureSummary of everything in the file
+    :param parts: Optional. dict of name: CurvatureSummary
+    """
+    document = {'version': 1, 'total': total.toDict(),
+                'parts': dict((name, summary.toDict())
+                              for name, summary in (parts or {}).items())}
+    with atomicOutput(fileName) as tempName:
+        with open(tempName, 'w') as f:
+            json.dump(document, f, sort_keys=True)
+
+
+def readStatistics(fileName):
+    """
+    :return: total and parts of a statistics file
+    :rtype: (CurvatureSummary, dict of name: CurvatureSummary)
+    """
+    with open(fileName, 'r') as f:
+        document = json.load(f)
+    parts = dict((name, CurvatureSummary.fromDict(d))
+                 for name, d in document['parts'].items())
+    return CurvatureSummary.fromDict(document['total']), parts
+
+
+def mergeStatisticsFiles(fileNames):
+    """
+    Merge statistics files, e.g. of parallel workers or separate runs.
+    Parts of the same name are merged with each other.
+    :rtype: (CurvatureSummary, dict of name: CurvatureSummary)
+    """
+    total = CurvatureSummary()
+    parts = {}
+    for fileName in fileNames:
+        fileTotal, fileParts = readStatistics(fileName)
+        total.merge(fileTotal)
+        for name, summary in fileParts.items():
+            if name in parts:
+                parts[name].merge(summary)
+            else:
+                parts[name] = summary
+    return total, parts
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print "Usage: python CurvatureStatistics.py merged.json stats1.json stats2.json ..."
+        sys.exit(1)
+    mergedTotal, mergedParts = mergeStatisticsFiles(sys.argv[2:])
+    writeStatistics(sys.argv[1], mergedTotal, mergedParts)
+    print "{0} vertices, {1} on curves".format(mergedTotal.vertexCount,
+                                              mergedTotal.curveCount)
+    for aQuantity in QUANTITIES:
+        print aQuantity, ', '.join('P{0}={1:.4g}'.format(p, mergedTotal.percentile(aQuantity, p))
+                                   for p in REPORTED_PERCENTILES
+                                   if mergedTotal.percentile(aQuantity, p) is not None)
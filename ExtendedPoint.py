@@ -17,11 +17,35 @@ __author__ = 'Paul Schrum'
 import math
 import collections
 
+# Axis-based distance within which two points are the same point. Used by
+# __eq__, spatiallyEquals, any_in_point_equals_any_in_other,
+# duplicate removal and PointSnapIndex. Change it with setEqualityTolerance.
+EQUALITY_TOLERANCE = 0.0055
+
+
+def getEqualityTolerance():
+    return EQUALITY_TOLERANCE
+
+
+def setEqualityTolerance(tolerance):
+    """
+    Set the tolerance for spatial equality everywhere. A PointSnapIndex
+    built before keeps the tolerance it was built with.
+    :param tolerance: Axis-based distance (positive) in coordinate units
+    :return: None
+    """
+    global EQUALITY_TOLERANCE
+    if not tolerance > 0.0:
+        raise ValueError('The equality tolerance must be positive.')
+    EQUALITY_TOLERANCE = float(tolerance)
+
+
 class ExtendedPoint(object):
     """
     Members:
         X - X value (float)
         Y - Y value (float)
+        Z - Z value (float), or None for 2D points
         ParentPK - Primary Key of parent object (may be None)
 
                   Note: Some members are not known until method
@@ -50,30 +74,48 @@ class ExtendedPoint(object):
             pt2pt.distanceAhead (float) - chord distance to next point
             pt2pt.deflection (float) -  deflection chord to chord interpreted
                 as radians.
+        vertical (object) - vertical geometry at this point, when it and
+            both of its neighbors have Z (otherwise False). Grades are
+            rise over horizontal run.
+            vertical.gradeBack (float) - grade from the previous point
+            vertical.gradeAhead (float) - grade to the next point
+            vertical.gradeChange (float) - gradeAhead - gradeBack (negative
+                on a crest)
+            vertical.rateOfChange (float) - change of grade per unit of
+                horizontal length of the parabola through the three points
+            vertical.K (float) - horizontal length per percent of grade
+                change (1 / (100 * rateOfChange)); signed like gradeChange
     Methods:
         compute_arc_parameters - given 3 points, it computes parameters
             for the arc which passes through the three given points.
             Side Effect: All parameters are attached to the second
             ExtendedPoint parameter.
     """
-    def __init__(self, aPoint, newY=None, parentPK=None):
+    def __init__(self, aPoint, newY=None, parentPK=None, newZ=None):
         """
         ctor for an Extnded Point
-        :param aPoint: anything with an X (float) and Y(float).
+        :param aPoint: anything with an X (float) and Y(float), and optionally
+                a Z (float or None), such as an arcpy Point of a PolylineZ.
                 If it is a number, then newY must be define (also a number)
         :param newY: If aPoint is really X(float), then newY is the Y (float)
         :param parentPK: if desired, the primary key of the object that
                 owns this point
+        :param newZ: If aPoint is really X(float), the optional Z (float)
         :return: None
         """
         if newY is None:
             self.X = aPoint.X
             self.Y = aPoint.Y
+            newZ = getattr(aPoint, 'Z', None)
         else:
             self.X = aPoint
             self.Y = newY
+        if newZ is not None and math.isnan(newZ):
+            newZ = None
+        self.Z = newZ
         self.pt2pt = False
         self.arc = False
+        self.vertical = False
         self._parentPK = parentPK
 
     def __repr__(self):
@@ -109,6 +151,26 @@ class ExtendedPoint(object):
 
         return mainString + arcString + p2pString
 
+    def csvRow(self, vertical=False):
+        """
+        :param vertical: If True, the row is padded to all of the columns of
+                header_list() and the vertical columns are appended.
+        :return: This point as a row of the csv file (no newline)
+        """
+        row = str(self)
+        if not vertical:
+            return row
+        row += ',' * (_HORIZONTAL_FIELD_COUNT - 1 - row.count(','))
+        if self.Z is None:
+            return row + ',' * _VERTICAL_FIELD_COUNT
+        if not self.vertical:
+            return row + ',{0}'.format(self.Z) + ',' * (_VERTICAL_FIELD_COUNT - 1)
+        return row + ',{0},{1},{2},{3},{4}'.format(self.Z,
+                                                   100.0 * self.vertical.gradeBack,
+                                                   100.0 * self.vertical.gradeAhead,
+                                                   100.0 * self.vertical.gradeChange,
+                                                   self.vertical.K)
+
     def __add__(self, other):
         return ExtendedPoint(self.X + other.X,
                              self.Y + other.Y)
@@ -130,23 +192,27 @@ class ExtendedPoint(object):
     def azimuth(self):
         return math.atan2(self.X, self.Y)
 
-    def __hash__(self):
-        return self.X - self.Y + (self.X % 17)
+    # Equality within a tolerance has no hash consistent with it, so points
+    # are not hashable. Use PointSnapIndex to look points up.
+    __hash__ = None
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __eq__(self, other):
-        return self.spatiallyEquals(other, tolerance=0.0055)
+        return self.spatiallyEquals(other)
 
-    def spatiallyEquals(self, other, tolerance=0.015):
+    def spatiallyEquals(self, other, tolerance=None):
         """
         Determines whether this and the other are at the same spatial
         location within a certain tolerance
         :param other: Other point to compare against
-        :param tolerance: Axis-based distance to compare for spatial equality
+        :param tolerance: Axis-based distance to compare for spatial equality.
+                Defaults to EQUALITY_TOLERANCE.
         :return: True if the two points are within tolerance of each other on both axes.
         """
+        if tolerance is None:
+            tolerance = EQUALITY_TOLERANCE
         if math.fabs(self.X -other.X) > tolerance:
             return False
         if math.fabs(self.Y - other.Y) > tolerance:
@@ -185,9 +251,19 @@ class ExtendedPoint(object):
         return interiorDeflection
 
     @staticmethod
-    def header_list():
-        return 'X,Y,Degree,Radius,ArcDeflection,ChordDirection,' + \
-               'PointsDefl,DistanceBack,DistanceAhead,ArcLengthBack,ArcLengthAhead'
+    def header_list(vertical=False):
+        """
+        :param vertical: If True, add the columns of Z and the vertical
+                geometry (grades in percent), as written by csvRow.
+        """
+        header = 'X,Y,Degree,Radius,ArcDeflection,ChordDirection,' + \
+                 'PointsDefl,DistanceBack,DistanceAhead,ArcLengthBack,ArcLengthAhead'
+        if vertical:
+            header += ',Z,GradeBack,GradeAhead,GradeChange,K'
+        return header
+
+_HORIZONTAL_FIELD_COUNT = 11
+_VERTICAL_FIELD_COUNT = 5
 
 AzimuthPair = collections.namedtuple('AzimuthPair', 'interiorSolution exteriorSolution')
 
@@ -202,11 +278,18 @@ class struct():
     '''
     pass
 
-def any_in_point_equals_any_in_other(pointList, other, tolerance=0.005):
+def any_point_has_z(pointList):
+    """
+    :return: True if any point of the list has a Z value
+    """
+    return any(point.Z is not None for point in pointList)
+
+def any_in_point_equals_any_in_other(pointList, other, tolerance=None):
     """
     True if any point in pointList equals and point in other
     :param pointList: iterable of Points
     :param other: iterable of Points
+    :param tolerance: Optional. Defaults to EQUALITY_TOLERANCE.
     :return: False or Tuple of matching indices
     :rtype: False or Tuple
     """
@@ -357,17 +440,58 @@ def normalizeAzimuth(defl):
     return returnDef
 
 def normalizeDeflection(defl):
+    """
+    Wrap a deflection (the difference of two azimuths) into the
+    range -pi to pi.
+    Azimuths from getAzimuth are in -pi..pi, so two chords on either side
+    of due south differ by almost 2 pi. Earlier versions only wrapped
+    values beyond +/-2 pi, and reported such a vertex with a deflection
+    near -360 degrees: PointsDefl, the sign of Degree, and ArcLengthBack /
+    ArcLengthAhead in the csv files were wrong there, and differ from the
+    files those versions wrote. ArcKernel wraps the same way.
+    """
     returnDef = defl
-    if defl < -2.0 * math.pi:
+    if defl < -math.pi:
         returnDef = defl + 2.0 * math.pi
-    elif defl > 2.0 * math.pi:
+    elif defl > math.pi:
         returnDef = defl - 2.0 * math.pi
     return returnDef
 
+def compute_vertical_parameters(point1, point2, point3):
+    """
+    Computes the grades and the vertical curve of the trio of points, from
+    their Z values and the horizontal distances between them.
+    Side Effects: point2.vertical is set (False unless all three points
+    have Z and are apart horizontally).
+    :param point1: Back point
+    :param point2: Current point
+    :param point3: Ahead point
+    :requirement: point2.pt2pt must already hold the horizontal distances.
+    :return: None
+    """
+    point2.vertical = False
+    if point1.Z is None or point2.Z is None or point3.Z is None:
+        return
+    distanceBack = point2.pt2pt.distanceBack
+    distanceAhead = point2.pt2pt.distanceAhead
+    if distanceBack == 0.0 or distanceAhead == 0.0:
+        return
+    point2.vertical = struct()
+    point2.vertical.gradeBack = (point2.Z - point1.Z) / distanceBack
+    point2.vertical.gradeAhead = (point3.Z - point2.Z) / distanceAhead
+    gradeChange = point2.vertical.gradeAhead - point2.vertical.gradeBack
+    point2.vertical.gradeChange = gradeChange
+    point2.vertical.rateOfChange = 2.0 * gradeChange / (distanceBack + distanceAhead)
+    if gradeChange == 0.0:
+        point2.vertical.K = float('inf')
+    else:
+        point2.vertical.K = 1.0 / (100.0 * point2.vertical.rateOfChange)
+
 def compute_arc_parameters(point1, point2, point3):
     """
     Computes all relevatnt parameters to the trio of points.
-    Side Effects: The computed parameters are added to pt2.
+    Side Effects: The computed parameters are added to pt2, including the
+    vertical parameters when the points have Z.
     Assumptions: Total arc deflection from point1 to point3 is less than 180 degrees.
     :param point1: Back point
     :param point2: Current point
@@ -378,6 +502,7 @@ def compute_arc_parameters(point1, point2, point3):
     point2.pt2pt = struct()
     point2.pt2pt.distanceBack = getDist2Points(point2, point1)
     point2.pt2pt.distanceAhead = getDist2Points(point3, point2)
+    compute_vertical_parameters(point1, point2, point3)
     azimuth12 = getAzimuth(point1, point2)
     azimuth23 = getAzimuth(point2, point3)
     defl = normalizeDeflection(azimuth23 - azimuth12)
@@ -425,7 +550,10 @@ def compute_arc_parameters(point1, point2, point3):
     point2.arc.deflection = radStartV.deflectionTo(radEndV, preferredDir=defl)
 
     p2Vector = point2.arc.curveCenter - point2
-    defl12 = p2Vector.azimuth - point2.arc.radiusStartVector.azimuth
+    # Wrapped, or the arc length is off by a full circle when the radius
+    # vectors straddle due south.
+    defl12 = normalizeDeflection(p2Vector.azimuth -
+                                 point2.arc.radiusStartVector.azimuth)
     defl23 = point2.arc.deflection - defl12
     point2.arc.lengthBack = defl12 * point2.arc.radiusStartVector.magnitude
     point2.arc.lengthAhead = defl23 * point2.arc.radiusStartVector.magnitude
@@ -470,14 +598,17 @@ if __name__ == '__main__':
     expected = 1.10714940556
     _assertFloatsEqual(azmuth12, expected)
 
-    #Test point equality and hashing.
+    #Test point equality, and that points are not hashable.
     point98 = ExtendedPoint(20.0, 25.0)
     point99 = ExtendedPoint(20.01, 25.01)
     _assertPointsEqualXY(point2, point98)
     assert(point2 == point98)
     assert(point2 != point99)
-    assert(point2.__hash__() == point98.__hash__())
-    assert(point2.__hash__() != point99.__hash__())
+    try:
+        hash(point2)
+        assert(False)
+    except TypeError:
+        pass
 
     # Test vector creation
     vec12 = vectorFromDistanceAzimuth(distance12, azmuth12)
@@ -551,6 +682,18 @@ if __name__ == '__main__':
     _assertFloatsEqual(p2.arc.lengthAhead, expected)
     _assertFloatsEqual(p2.arc.lengthBack, expected)
 
+    # Test arc whose radius vectors cross due south of the center
+    p1 = ExtendedPoint(100.0 * math.sin(math.radians(170.0)),
+                       100.0 * math.cos(math.radians(170.0)))
+    p2 = ExtendedPoint(100.0 * math.sin(math.radians(181.0)),
+                       100.0 * math.cos(math.radians(181.0)))
+    p3 = ExtendedPoint(100.0 * math.sin(math.radians(190.0)),
+                       100.0 * math.cos(math.radians(190.0)))
+    compute_arc_parameters(p1, p2, p3)
+    _assertFloatsEqual(p2.arc.radius, 100.0)
+    _assertFloatsEqual(p2.arc.lengthBack, 100.0 * math.radians(11.0))
+    _assertFloatsEqual(p2.arc.lengthAhead, 100.0 * math.radians(9.0))
+
     # Test deflections which cross due north
     p1 = ExtendedPoint(-1.0, 1.0)
     p2 = ExtendedPoint(2, 2)
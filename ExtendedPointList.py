@@ -1,6 +1,10 @@
 import sys, csv, os
 from ExtendedPoint import ExtendedPoint as EP
 import ExtendedPoint
+import AlignmentPreprocessing
+from CompressedIO import openForWrite
+from CsvCache import loadCsvColumns
+import numpy as np
 
 __author__ = ['Paul Schrum']
 
@@ -22,18 +26,59 @@ class ExtendedPointList(list):
                                  self[2:]):
             ExtendedPoint.compute_arc_parameters(pt1, pt2, pt3)
 
-    def writeToCSV(self, fileName):
+    def preprocess(self, duplicateTolerance=AlignmentPreprocessing.SHARED_TOLERANCE,
+                   simplifyTolerance=None, preserveDeflection=None):
+        """
+        Remove duplicate vertices and optionally thin the vertices with a
+        tolerance-bounded simplification, in place. Call this before
+        computeAllPointInformation.
+        :param duplicateTolerance: Axis-based tolerance for duplicate vertices.
+                None skips duplicate removal.
+        :param simplifyTolerance: Maximum distance a removed vertex may lie
+                from the simplified polyline. None skips simplification.
+        :param preserveDeflection: Vertices with a chord deflection (radians)
+                at least this large are always kept.
+        :return: numpy array of the original index of each remaining point.
+        """
+        kept, indices = AlignmentPreprocessing.preprocessPointList(
+            self, duplicateTolerance=duplicateTolerance,
+            simplifyTolerance=simplifyTolerance,
+            preserveDeflection=preserveDeflection)
+        self[:] = kept
+        return indices
+
+    def resample(self, spacing, keepOriginalVertices=False):
+        """
+        Replace the points, in place, with points at a fixed spacing along
+        the length of the list. Call this before computeAllPointInformation.
+        :param spacing: Distance between resampled points
+        :param keepOriginalVertices: If True, the original points are kept as
+                anchor points among the resampled points.
+        :return: numpy array of the original index of each point (-1 for
+                new points).
+        """
+        newPoints, sourceIndex = AlignmentPreprocessing.resamplePointList(
+            self, spacing, keepOriginalVertices=keepOriginalVertices)
+        self[:] = newPoints
+        return sourceIndex
+
+    def writeToCSV(self, fileName, compressLevel=None, background=False):
         """
         Write all points in the point list to the indicated file, expecting
         the points to be of type ExtendedPoint.
         :param self:
+        :param fileName: A .gz or .bz2 extension compresses the file.
+        :param compressLevel: Optional. 1 (fastest) to 9 (smallest).
+        :param background: If True, compress on a separate thread.
         :return: None
         """
-        with open(fileName, 'w') as f:
-            headerStr = EP.header_list()
+        vertical = ExtendedPoint.any_point_has_z(self)
+        with openForWrite(fileName, compressLevel=compressLevel,
+                          background=background) as f:
+            headerStr = EP.header_list(vertical)
             f.write(headerStr + '\n')
             for i, point in enumerate(self):
-                writeStr = str(point)
+                writeStr = point.csvRow(vertical)
                 f.write(writeStr + '\n')
 
 
@@ -42,23 +87,25 @@ def CreateExtendedPointList(csvFileName):
     Factory method. Use this instead of variable = ExtendedPointList().
     Args:
         csvFileName: The path and filename of the csv file to be read.
+            It may be gzip or bz2 compressed (.gz or .bz2 extension).
+            The parsed columns are kept in the CsvCache for the next load,
+            when the cache is turned on.
+            A Z column, if there is one, is read too.
 
     Returns: New instance of an ExtendedPointList.
     '''
     newEPL = ExtendedPointList()
-    with open(csvFileName, mode='r') as f:
-        rdr = csv.reader(f)
-        count = 0
-        for aRow in rdr:
-            if count == 0:
-                header = aRow
-                count += 1
-                xIndex = header.index('X')
-                yIndex = header.index('Y')
-            else:
-                x = float(aRow[xIndex])
-                y = float(aRow[yIndex])
-                newEPL.append(EP(x, y))
+    header, values = loadCsvColumns(csvFileName)
+    xs = values[:, header.index('X')]
+    ys = values[:, header.index('Y')]
+    if np.isnan(xs).any() or np.isnan(ys).any():
+        raise ValueError('{0} has rows without X or Y.'.format(csvFileName))
+    if 'Z' in header:
+        zs = values[:, header.index('Z')].tolist()
+    else:
+        zs = [None] * len(xs)
+    for x, y, z in zip(xs.tolist(), ys.tolist(), zs):
+        newEPL.append(EP(x, y, newZ=z))
     return newEPL
 
 if __name__ == '__main__':
@@ -0,0 +1,154 @@
+"""
+Staged producer/consumer pipeline on threads, connected by bounded queues.
+
+    pipeline = Pipeline(assembleAlignments(segments), [analyze], maxPending=4)
+    for alignment in pipeline:
+        write(alignment)
+
+The source iterable and every stage run on their own thread.  A stage is
+a function taking an iterator of the items of the stage before it and
+returning (or yielding) its own items, so a stage may emit items one to
+one (analyze each alignment), or only after seeing everything before it
+(chain segments into alignments).  The items of the last stage are
+yielded to the caller on the calling thread, which is where objects tied
+to one thread (sqlite connections, arcpy map documents) should be used.
+The source is iterated on a thread of its own, so it must not be one of
+those objects either: read an arcpy cursor before building the Pipeline.
+
+Each queue holds at most maxPending items, so a fast stage blocks until
+the stage after it catches up and memory use stays bounded.
+
+If any stage raises, the other stages are stopped and the exception is
+re-raised to the caller.  Setting the cancel event (or calling cancel)
+stops every stage and raises PipelineCancelled to the caller.  If the
+caller stops iterating early, the stages are stopped as well.
+"""
+
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+_endOfStream = object()
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+class _Stop(BaseException):
+    """Raised inside stage threads to unwind them once the pipeline stops.
+    It is a BaseException so that stages catching Exception do not swallow
+    it."""
+    pass
+
+
+class Pipeline(object):
+    """
+    Methods:
+        __iter__ - start the stages and yield the items of the last stage
+        cancel - stop all stages
+    Members:
+        cancelEvent - threading.Event; set it to cancel the pipeline
+        failedStage - name of the stage which raised, if any
+    """
+    def __init__(self, source, stages=(), maxPending=4, cancelEvent=None,
+                 pollInterval=0.1):
+        """
+        ctor for a Pipeline
+        :param source: iterable of the first items. It is consumed on its own
+                thread.
+        :param stages: list of functions, each taking an iterator of the items
+                of the stage before it and returning an iterable of items.
+        :param maxPending: capacity of each queue between stages
+        :param cancelEvent: Optional. threading.Event shared with other code
+                that may cancel the pipeline.
+        :param pollInterval: seconds between checks for cancellation while a
+                stage is blocked on a queue
+        :return: None
+        """
+        self._source = source
+        self._stages = list(stages)
+        self.maxPending = maxPending
+        self.cancelEvent = cancelEvent if cancelEvent is not None else threading.Event()
+        self.pollInterval = pollInterval
+        self.failedStage = None
+        self._error = None
+        self._errorLock = threading.Lock()
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+    def _put(self, aQueue, item):
+        while True:
+            if self.cancelEvent.is_set():
+                raise _Stop()
+            try:
+                aQueue.put(item, timeout=self.pollInterval)
+                return
+            except queue.Full:
+                pass
+
+    def _items(self, aQueue):
+        while True:
+            if self.cancelEvent.is_set():
+                raise _Stop()
+            try:
+                item = aQueue.get(timeout=self.pollInterval)
+            except queue.Empty:
+                continue
+            if item is _endOfStream:
+                return
+            yield item
+
+    def _runStage(self, name, produce, outQueue):
+        try:
+            for item in produce():
+                self._put(outQueue, item)
+            self._put(outQueue, _endOfStream)
+        except _Stop:
+            pass
+        except BaseException as e:
+            with self._errorLock:
+                if self._error is None:
+                    self._error = e
+                    self.failedStage = name
+            self.cancelEvent.set()
+
+    def _stageProducer(self, stage, inQueue):
+        return lambda: stage(self._items(inQueue))
+
+    def __iter__(self):
+        queues = [queue.Queue(self.maxPending) for _ in range(len(self._stages) + 1)]
+        producers = [('source', lambda: iter(self._source))]
+        for index, stage in enumerate(self._stages):
+            name = getattr(stage, '__name__', 'stage {0}'.format(index + 1))
+            producers.append((name, self._stageProducer(stage, queues[index])))
+
+        threads = []
+        for (name, produce), outQueue in zip(producers, queues):
+            thread = threading.Thread(target=self._runStage,
+                                      args=(name, produce, outQueue))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        completed = False
+        try:
+            for item in self._items(queues[-1]):
+                yield item
+            completed = True
+        except _Stop:
+            pass
+        finally:
+            if not completed:
+                self.cancelEvent.set()
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
+        if not completed:
+            raise PipelineCancelled()
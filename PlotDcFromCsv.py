@@ -1,10 +1,22 @@
 '''
 Based on code taken from
 https://pythonprogramming.net/loading-file-data-matplotlib-tutorial/
+
+For batch use, renderDcProfiles writes degree of curve profiles to png or
+svg files without a display: the columns are loaded with numpy, each
+profile is downsampled to about one point per pixel with Largest Triangle
+Three Buckets, and the figures are drawn with the Agg canvas, in a pool of
+worker processes.
+    python PlotDcFromCsv.py --render outputDir file1.csv file2.csv ...
 '''
 
-import matplotlib.pyplot as plt
-import csv, sys
+import sys, os
+import multiprocessing
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from CsvCache import loadCsvColumns
+from CompressedIO import compressionFor
 
 def computeHalfArcLength(rowList, workingRowIndex, backIndex, aheadIndex):
     aRow = rowList[workingRowIndex]
@@ -19,32 +31,164 @@ def computeHalfArcLength(rowList, workingRowIndex, backIndex, aheadIndex):
     return lenBack, lenAhead
 
 def plotCSVfile(filename):
-    x = []
-    y = []
-
-    with open(filename,'r') as csvfile:
-        plots = list(csv.reader(csvfile, delimiter=','))
-        headerRow = plots[0]
-        degreeIndex = headerRow.index("Degree")
-        distBackIndex = headerRow.index("ArcLengthBack")
-        distAheadIndex = headerRow.index("ArcLengthAhead")
-
-        cumulative_dist = 0.0
-        for idx, row in enumerate(plots[2:-2]):
-            distBack, distAhead = computeHalfArcLength(plots, idx+2, distBackIndex, distAheadIndex)
-            cumulative_dist += distBack
-            x.append(cumulative_dist)
-            cumulative_dist += distAhead
-            y.append(float(row[degreeIndex]))
-
-        lastRow = plots[-2]
-        y.append(float(lastRow[degreeIndex]))
-        cumulative_dist += float(row[distBackIndex])
-        x.append(cumulative_dist)
+    '''
+    :return: x (length along chords) and y (degree of curve) lists of the
+            profile, loaded by loadDcProfile (through the CsvCache)
+    '''
+    x, y = loadDcProfile(filename)
+    return x.tolist(), y.tolist()
+
+
+def loadDcProfile(filename):
+    '''
+    Vectorized loading of a profile, returning numpy arrays. The values
+    are those of the row by row reader plotCSVfile used to be (kept in
+    test_plotDcFromCsv), including its treatment of the first and last
+    points. Arc lengths
+    written as False (a triplet with no deflection) are read as 0.0. When
+    the CsvCache is turned on, the parsed columns are kept in it, so
+    loading the file again is fast.
+    :return: x (length along chords), y (degree of curve)
+    :rtype: (numpy array, numpy array)
+    '''
+    headerRow, values = loadCsvColumns(filename)
+    degreeIndex = headerRow.index("Degree")
+    distBackIndex = headerRow.index("ArcLengthBack")
+    distAheadIndex = headerRow.index("ArcLengthAhead")
+
+    # The rows of plotCSVfile's loop, plus the second to last point.
+    body = values[1:-1]
+    if len(body) < 2:
+        raise ValueError('{0} has too few points to plot.'.format(filename))
+    y = np.array(body[:, degreeIndex])
+    distBack = np.array(body[:-1, distBackIndex])
+    distAhead = np.array(body[:-1, distAheadIndex])
+    if np.isnan(y).any() or np.isnan(distBack).any() or np.isnan(distAhead).any():
+        raise ValueError('{0} has rows with missing values.'.format(filename))
+    lastDistBack = distBack[-1]
+    distBack[0] *= 2.0
+    aheadBefore = np.concatenate(([0.0], np.cumsum(distAhead)[:-1]))
+    x = np.cumsum(distBack) + aheadBefore
+    x = np.append(x, x[-1] + distAhead[-1] + lastDistBack)
     return x, y
 
 
+def downsampleLTTB(x, y, threshold):
+    '''
+    Largest Triangle Three Buckets downsampling. Keeps the first and last
+    points, and from each of threshold - 2 buckets in between the point
+    forming the largest triangle with the point kept before it and the
+    average of the next bucket, which preserves peaks of the profile.
+    :param threshold: number of points to keep
+    :return: downsampled x and y arrays
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return x, y
+
+    bucketStarts = (np.arange(threshold - 1) * (count - 2.0) /
+                    (threshold - 2)).astype(int) + 1
+    bucketStarts[-1] = count - 1
+    bucketStarts = np.append(bucketStarts, count)
+    kept = np.empty(threshold, dtype=int)
+    kept[0] = 0
+    kept[-1] = count - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = bucketStarts[bucket], bucketStarts[bucket + 1]
+        nextEnd = bucketStarts[bucket + 2]
+        averageX = x[end:nextEnd].mean()
+        averageY = y[end:nextEnd].mean()
+        areas = np.abs((x[a] - averageX) * (y[start:end] - y[a]) -
+                       (x[a] - x[start:end]) * (averageY - y[a]))
+        a = start + int(np.argmax(areas))
+        kept[bucket + 1] = a
+    return x[kept], y[kept]
+
+
+def renderDcProfile(csvFileName, outputFileName, width=1600, height=500,
+                    dpi=100, title=None):
+    '''
+    Write the degree of curve profile of a csv file to an image file
+    without a display. The format follows the extension (.png, .svg, ...).
+    :param width: image width in pixels; the profile is downsampled to
+            this many points
+    :param height: image height in pixels
+    :param title: Optional. Defaults to the name of the csv file.
+    :return: outputFileName
+    '''
+    x, y = loadDcProfile(csvFileName)
+    x, y = downsampleLTTB(x, y, width)
+    figure = Figure(figsize=(width / float(dpi), height / float(dpi)), dpi=dpi)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    axes.plot(x, y, 'r-', linewidth=0.8)
+    axes.set_xlabel('Length Along Chords')
+    axes.set_ylabel('Dc')
+    axes.grid()
+    if title is None:
+        title = os.path.basename(csvFileName)
+    figure.suptitle('{0} Degree of Curve vs. Length Along Chords'.format(title))
+    figure.savefig(outputFileName, dpi=dpi)
+    return outputFileName
+
+
+def _renderJob(arguments):
+    csvFileName, outputFileName, options = arguments
+    return renderDcProfile(csvFileName, outputFileName, **options)
+
+
+def renderDcProfiles(csvFileNames, outputDir, imageFormat='png', processes=None,
+                     **options):
+    '''
+    Render the profile of each csv file to outputDir, in parallel.
+    :param imageFormat: 'png' or 'svg'
+    :param processes: Optional. Number of worker processes; defaults to the
+            number of cpus. 1 renders in this process.
+    :param options: passed on to renderDcProfile
+    :return: list of the image file names
+    :raises: ValueError if two csv files would get the same image name
+    '''
+    imageFileNames = _imageFileNames(csvFileNames, outputDir, imageFormat)
+    if not os.path.exists(outputDir):
+        os.makedirs(outputDir)
+    jobs = [(csvFileName, imageFileName, options)
+            for csvFileName, imageFileName in zip(csvFileNames, imageFileNames)]
+    if processes == 1:
+        return [_renderJob(job) for job in jobs]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_renderJob, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _imageFileNames(csvFileNames, outputDir, imageFormat):
+    '''
+    The image file name of each csv file: its name without the .csv (and
+    .gz or .bz2) extension, in outputDir.
+    '''
+    imageFileNames = []
+    sources = {}
+    for csvFileName in csvFileNames:
+        stem = os.path.basename(csvFileName)
+        if compressionFor(stem) is not None:
+            stem = os.path.splitext(stem)[0]
+        stem = os.path.splitext(stem)[0]
+        imageFileName = os.path.join(outputDir, stem + '.' + imageFormat)
+        if imageFileName in sources:
+            raise ValueError('{0} and {1} would both be rendered to {2}.'.format(
+                sources[imageFileName], csvFileName, imageFileName))
+        sources[imageFileName] = csvFileName
+        imageFileNames.append(imageFileName)
+    return imageFileNames
+
+
 def plotAllXYlists(listOfXYvals):
+    import matplotlib.pyplot as plt
     for aDataSet in listOfXYvals:
         name = aDataSet[0]
         dataSet = aDataSet[1]
@@ -62,6 +206,10 @@ def plotAllXYlists(listOfXYvals):
     plt.show()
 
 if __name__ == '__main__':
+    if len(sys.argv) > 3 and sys.argv[1] == '--render':
+        for imageFile in renderDcProfiles(sys.argv[3:], sys.argv[2]):
+            print imageFile
+        sys.exit(0)
     allFiles = [r"D:\SourceModules\Python\RoadGeometryAnalysis\TestFiles\CSV\Y15A_GIS.csv"]
     if len(sys.argv) > 1:
         allFiles = sys.argv[1:]
@@ -0,0 +1,216 @@
+"""
+Tolerance-aware lookup of points, and chaining of polyline segments by
+their end points with it.
+
+PointSnapIndex quantizes points onto a grid whose cells are as wide as
+the equality tolerance.  Two points within tolerance of each other on
+both axes are then in the same or in adjacent cells, so a lookup only
+has to compare against the points of 3 x 3 cells: expected O(1) per
+find or insert, where a plain list needs a scan of every point.
+Equality is the same as ExtendedPoint.spatiallyEquals.
+
+chainSegments uses an index of segment end points to join segments into
+alignments without scanning all of the remaining segments for every
+join.
+"""
+
+import collections
+import math
+from ExtendedPoint import getEqualityTolerance
+
+
+class PointSnapIndex(object):
+    """
+    Methods:
+        insert - add a point (with an optional value)
+        find - value of the nearest point equal to a point
+        findAll - values of all points equal to a point
+        unique - snap a collection of points to the first of each group of
+            equal points
+    """
+    def __init__(self, tolerance=None):
+        """
+        ctor for a PointSnapIndex
+        :param tolerance: Optional. Axis-based distance for equality.
+                Defaults to ExtendedPoint's EQUALITY_TOLERANCE.
+        :return: None
+        """
+        if tolerance is None:
+            tolerance = getEqualityTolerance()
+        if not tolerance > 0.0:
+            raise ValueError('The tolerance must be positive.')
+        self.tolerance = float(tolerance)
+        self._cells = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _cellOf(self, x, y):
+        return (int(math.floor(x / self.tolerance)),
+                int(math.floor(y / self.tolerance)))
+
+    def _matches(self, x, y):
+        """
+        :return: list of (squared distance, insertion number, value) of the
+                points equal to x, y
+        """
+        i, j = self._cellOf(x, y)
+        tolerance = self.tolerance
+        matches = []
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                for entry in self._cells.get((i + di, j + dj), ()):
+                    dx = entry[0] - x
+                    dy = entry[1] - y
+                    if math.fabs(dx) <= tolerance and math.fabs(dy) <= tolerance:
+                        matches.append((dx * dx + dy * dy, entry[2], entry[3]))
+        return matches
+
+    def insert(self, point, value=None):
+        """
+        Add a point. Equal points are kept as separate entries.
+        :param point: anything with X and Y
+        :param value: Optional. What find returns for this point. Defaults to
+                the point itself.
+        :return: None
+        """
+        if value is None:
+            value = point
+        entry = (point.X, point.Y, self._count, value)
+        self._cells.setdefault(self._cellOf(point.X, point.Y), []).append(entry)
+        self._count += 1
+
+    def find(self, point):
+        """
+        :return: value of the nearest inserted point equal to point (the
+                earliest inserted one on a tie), or None if there is none.
+        """
+        matches = self._matches(point.X, point.Y)
+        if not matches:
+            return None
+        return min(matches)[2]
+
+    def findAll(self, point):
+        """
+        :return: values of all inserted points equal to point, in the order
+                they were inserted
+        """
+        return [value for _, _, value in
+                sorted(self._matches(point.X, point.Y), key=lambda m: m[1])]
+
+    def unique(self, points):
+        """
+        Snap points to representatives: each point that is not equal to an
+        earlier representative becomes one, and is inserted in this index.
+        :param points: iterable of anything with X and Y
+        :return: list of the indices (into points) of the representatives,
+                and for every point the position of its representative in
+                that list
+        :rtype: (list of int, list of int)
+        """
+        representatives = []
+        inverse = []
+        for index, point in enumerate(points):
+            found = self.find(point)
+            if found is None:
+                found = len(representatives)
+                self.insert(point, found)
+                representatives.append(index)
+            inverse.append(found)
+        return representatives, inverse
+
+
+class SegmentChainer(object):
+    """
+    Joins segments which share end points into alignments. Each alignment
+    grows from its first segment, keeping that segment's direction: first
+    from its end point, then from its begin point. Where several segments
+    meet at a point, the first one given is joined. A segment joined in
+    reverse is reversed in place, and the shared point is taken from the
+    segment joined to, not duplicated.
+    Members:
+        used - for each segment, whether it is part of an alignment yet
+    """
+    def __init__(self, segments, tolerance=None):
+        """
+        :param segments: list of segments, each a deque or list of points
+                (with X and Y) in order
+        :param tolerance: Optional. See PointSnapIndex.
+        """
+        self.segments = segments
+        self.used = [False] * len(segments)
+        self._firstUnused = 0
+        self._ends = PointSnapIndex(tolerance)
+        for number, segment in enumerate(segments):
+            self._ends.insert(segment[0], (number, 0))
+            self._ends.insert(segment[-1], (number, 1))
+
+    def _nextSegment(self, point):
+        for number, end in self._ends.findAll(point):
+            if not self.used[number]:
+                self.used[number] = True
+                return number, end
+        return None, None
+
+    def chainFrom(self, first):
+        """
+        :param first: index of the segment to grow the alignment from
+        :return: the alignment, a list of points
+        """
+        self.used[first] = True
+        chain = collections.deque([list(self.segments[first])])
+        while True:
+            number, end = self._nextSegment(chain[-1][-1])
+            if number is None:
+                break
+            segment = self.segments[number]
+            if end == 1:
+                segment.reverse()
+            piece = list(segment)[1:]
+            if piece:
+                chain.append(piece)
+        while True:
+            number, end = self._nextSegment(chain[0][0])
+            if number is None:
+                break
+            segment = self.segments[number]
+            if end == 0:
+                segment.reverse()
+            piece = list(segment)[:-1]
+            if piece:
+                chain.appendleft(piece)
+        return [point for piece in chain for point in piece]
+
+    def chainNext(self):
+        """
+        Chain the alignment of the first segment not yet used.
+        :return: the alignment, a list of points, or None if every segment
+                is used
+        """
+        while self._firstUnused < len(self.segments) and self.used[self._firstUnused]:
+            self._firstUnused += 1
+        if self._firstUnused == len(self.segments):
+            return None
+        return self.chainFrom(self._firstUnused)
+
+    def unusedSegments(self):
+        """
+        :return: the segments not yet part of an alignment, in order
+        """
+        return [segment for segment, used in zip(self.segments, self.used) if not used]
+
+
+def chainSegments(segments, tolerance=None):
+    """
+    Join all of the segments into alignments with a SegmentChainer,
+    starting each alignment from the first segment not yet used.
+    :param segments: iterable of segments
+    :param tolerance: Optional. See PointSnapIndex.
+    :return: generator of alignments, each a list of points
+    """
+    chainer = SegmentChainer(list(segments), tolerance)
+    alignment = chainer.chainNext()
+    while alignment is not None:
+        yield alignment
+        alignment = chainer.chainNext()
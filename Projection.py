@@ -0,0 +1,441 @@
+"""
+Vectorized map projections, for reprojecting coordinates without arcpy.
+
+A SearchCursor with a spatial_reference reprojects point by point inside
+ArcGIS, and runs without ArcGIS cannot reproject at all.  The coordinate
+systems here convert whole numpy arrays at once:
+
+    GeographicSystem - longitude, latitude in degrees
+    LambertConformalConic - two standard parallels (Snyder 15-1 to 15-11,
+        inverse latitude by iteration), e.g. NC State Plane
+    TransverseMercator - Krueger series in n to the third order, good to a
+        millimeter within 3000 km of the central meridian, e.g. UTM (the
+        inverse latitude is solved exactly from the conformal latitude)
+
+Each has toGeographic and fromGeographic, and a linear unit (metres, US
+survey feet or international feet) applied to the projected coordinates,
+false easting and false northing included.  coordinateSystemFromEpsg
+builds the systems we use from their EPSG codes.  Transformer goes from
+one system to another through geographic coordinates.
+
+There are no datum shifts: NAD83 and WGS84 are taken to be the same,
+which is good to a meter or two.  Z values are left as they are.
+
+The coordinate systems also have the factoryCode, name and
+exportToString (ESRI WKT) that the analysis uses of an arcpy
+SpatialReference, so one can be given as spatialRef to analyzePolylines.
+The features are then read in their own coordinate system and each
+feature's vertices are reprojected as arrays.  The entry points that run
+without arcpy (BatchRunner.analyzeCsvFile, the coordinates and csvFiles
+jobs of AnalysisService) take a source and a target system instead, as
+CoordinateSystems or EPSG codes (see optionalTransformer).
+"""
+
+import abc
+import collections
+import math
+import numpy as np
+
+Ellipsoid = collections.namedtuple('Ellipsoid', 'name a inverseFlattening')
+Unit = collections.namedtuple('Unit', 'name metersPerUnit')
+
+GRS80 = Ellipsoid('GRS_1980', 6378137.0, 298.257222101)
+WGS84_ELLIPSOID = Ellipsoid('WGS_1984', 6378137.0, 298.257223563)
+CLARKE1866 = Ellipsoid('Clarke_1866', 6378206.4, 294.9786982)
+AIRY1830 = Ellipsoid('Airy_1830', 6377563.396, 299.3249646)
+
+METER = Unit('Meter', 1.0)
+US_SURVEY_FOOT = Unit('Foot_US', 1200.0 / 3937.0)
+INTERNATIONAL_FOOT = Unit('Foot', 0.3048)
+
+
+def convertLength(values, fromUnit, toUnit):
+    """
+    :param values: number or array-like of lengths in fromUnit
+    :return: the lengths in toUnit
+    """
+    return np.asarray(values, dtype=float) * (fromUnit.metersPerUnit / toUnit.metersPerUnit)
+
+
+def _eccentricity(ellipsoid):
+    flattening = 1.0 / ellipsoid.inverseFlattening
+    return math.sqrt(flattening * (2.0 - flattening))
+
+
+def _wktNumber(value):
+    return repr(float(value))
+
+
+class CoordinateSystem(object):
+    """
+    Base of the coordinate systems.
+    Members:
+        name - ESRI style name
+        factoryCode - EPSG code (0 if it has none)
+        geographic - the GeographicSystem the system is based on
+        unit - Unit of the (projected) coordinates
+    """
+    __metaclass__ = abc.ABCMeta
+
+    isGeographic = False
+
+    @abc.abstractmethod
+    def toGeographic(self, xs, ys):
+        """
+        :return: arrays of longitude and latitude in degrees
+        """
+
+    @abc.abstractmethod
+    def fromGeographic(self, longitudes, latitudes):
+        """
+        :return: arrays of X and Y in this system
+        """
+
+    @abc.abstractmethod
+    def exportToString(self):
+        """
+        :return: ESRI WKT of this system
+        """
+
+    def __repr__(self):
+        return '{0}({1}, {2})'.format(type(self).__name__, self.name, self.factoryCode)
+
+
+class GeographicSystem(CoordinateSystem):
+    isGeographic = True
+
+    def __init__(self, name, datumName, ellipsoid, factoryCode=0):
+        self.name = name
+        self.datumName = datumName
+        self.ellipsoid = ellipsoid
+        self.factoryCode = factoryCode
+        self.geographic = self
+        self.unit = Unit('Degree', None)
+
+    def toGeographic(self, xs, ys):
+        return np.array(xs, dtype=float), np.array(ys, dtype=float)
+
+    def fromGeographic(self, longitudes, latitudes):
+        return np.array(longitudes, dtype=float), np.array(latitudes, dtype=float)
+
+    def exportToString(self):
+        return ('GEOGCS["{0}",DATUM["{1}",SPHEROID["{2}",{3},{4}]],'
+                'PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]]').format(
+            self.name, self.datumName, self.ellipsoid.name,
+            _wktNumber(self.ellipsoid.a), _wktNumber(self.ellipsoid.inverseFlattening))
+
+
+class _ProjectedSystem(CoordinateSystem):
+    def __init__(self, name, geographic, falseEasting, falseNorthing, unit, factoryCode):
+        self.name = name
+        self.geographic = geographic
+        self.ellipsoid = geographic.ellipsoid
+        self.unit = unit
+        self.factoryCode = factoryCode
+        # False easting and northing are given in unit and kept in metres.
+        self.falseEasting = falseEasting * unit.metersPerUnit
+        self.falseNorthing = falseNorthing * unit.metersPerUnit
+        self.e = _eccentricity(self.ellipsoid)
+
+    def _wkt(self, projectionName, parameters):
+        fields = ['PROJCS["{0}"'.format(self.name), self.geographic.exportToString(),
+                  'PROJECTION["{0}"]'.format(projectionName)]
+        parameters = [('False_Easting', self.falseEasting / self.unit.metersPerUnit),
+                      ('False_Northing', self.falseNorthing / self.unit.metersPerUnit)] + \
+            parameters
+        for parameterName, value in parameters:
+            fields.append('PARAMETER["{0}",{1}]'.format(parameterName, _wktNumber(value)))
+        fields.append('UNIT["{0}",{1}]]'.format(self.unit.name,
+                                                _wktNumber(self.unit.metersPerUnit)))
+        return ','.join(fields)
+
+
+class LambertConformalConic(_ProjectedSystem):
+    def __init__(self, name, geographic, standardParallel1, standardParallel2,
+                 latitudeOfOrigin, centralMeridian, falseEasting=0.0, falseNorthing=0.0,
+                 unit=METER, factoryCode=0):
+        """
+        ctor for a LambertConformalConic (two standard parallels)
+        :param geographic: GeographicSystem of the datum
+        :param standardParallel1: degrees
+        :param standardParallel2: degrees (may equal standardParallel1)
+        :param latitudeOfOrigin: degrees
+        :param centralMeridian: degrees
+        :param falseEasting: in unit
+        :param falseNorthing: in unit
+        :param unit: Unit of the projected coordinates
+        :param factoryCode: EPSG code
+        :return: None
+        """
+        _ProjectedSystem.__init__(self, name, geographic, falseEasting, falseNorthing,
+                                  unit, factoryCode)
+        self.standardParallel1 = standardParallel1
+        self.standardParallel2 = standardParallel2
+        self.latitudeOfOrigin = latitudeOfOrigin
+        self.centralMeridian = centralMeridian
+        phi1 = math.radians(standardParallel1)
+        phi2 = math.radians(standardParallel2)
+        m1 = self._m(phi1)
+        t1 = self._t(phi1)
+        if standardParallel1 == standardParallel2:
+            self.n = math.sin(phi1)
+        else:
+            self.n = (math.log(m1) - math.log(self._m(phi2))) / \
+                     (math.log(t1) - math.log(self._t(phi2)))
+        self.aF = self.ellipsoid.a * m1 / (self.n * t1 ** self.n)
+        self.rho0 = self.aF * self._t(math.radians(latitudeOfOrigin)) ** self.n
+
+    def _m(self, phi):
+        sinPhi = np.sin(phi)
+        return np.cos(phi) / np.sqrt(1.0 - self.e * self.e * sinPhi * sinPhi)
+
+    def _t(self, phi):
+        eSinPhi = self.e * np.sin(phi)
+        return np.tan(math.pi / 4.0 - phi / 2.0) / \
+            ((1.0 - eSinPhi) / (1.0 + eSinPhi)) ** (self.e / 2.0)
+
+    def fromGeographic(self, longitudes, latitudes):
+        phi = np.radians(np.asarray(latitudes, dtype=float))
+        theta = self.n * np.radians(np.asarray(longitudes, dtype=float) - self.centralMeridian)
+        rho = self.aF * self._t(phi) ** self.n
+        x = self.falseEasting + rho * np.sin(theta)
+        y = self.falseNorthing + self.rho0 - rho * np.cos(theta)
+        return x / self.unit.metersPerUnit, y / self.unit.metersPerUnit
+
+    def toGeographic(self, xs, ys):
+        dx = np.asarray(xs, dtype=float) * self.unit.metersPerUnit - self.falseEasting
+        dy = self.rho0 - (np.asarray(ys, dtype=float) * self.unit.metersPerUnit -
+                          self.falseNorthing)
+        sign = math.copysign(1.0, self.n)
+        rho = sign * np.hypot(dx, dy)
+        theta = np.arctan2(sign * dx, sign * dy)
+        t = (rho / self.aF) ** (1.0 / self.n)
+        phi = math.pi / 2.0 - 2.0 * np.arctan(t)
+        halfE = self.e / 2.0
+        for _ in range(15):
+            eSinPhi = self.e * np.sin(phi)
+            nextPhi = math.pi / 2.0 - 2.0 * np.arctan(
+                t * ((1.0 - eSinPhi) / (1.0 + eSinPhi)) ** halfE)
+            converged = np.all(np.abs(nextPhi - phi) < 1.0e-14)
+            phi = nextPhi
+            if converged:
+                break
+        return np.degrees(theta / self.n) + self.centralMeridian, np.degrees(phi)
+
+    def exportToString(self):
+        return self._wkt('Lambert_Conformal_Conic',
+                         [('Central_Meridian', self.centralMeridian),
+                          ('Standard_Parallel_1', self.standardParallel1),
+                          ('Standard_Parallel_2', self.standardParallel2),
+                          ('Latitude_Of_Origin', self.latitudeOfOrigin)])
+
+
+class TransverseMercator(_ProjectedSystem):
+    def __init__(self, name, geographic, centralMeridian, scaleFactor,
+                 latitudeOfOrigin=0.0, falseEasting=0.0, falseNorthing=0.0,
+                 unit=METER, factoryCode=0):
+        """
+        ctor for a TransverseMercator
+        :param geographic: GeographicSystem of the datum
+        :param centralMeridian: degrees
+        :param scaleFactor: scale on the central meridian
+        :param latitudeOfOrigin: degrees
+        :param falseEasting: in unit
+        :param falseNorthing: in unit
+        :param unit: Unit of the projected coordinates
+        :param factoryCode: EPSG code
+        :return: None
+        """
+        _ProjectedSystem.__init__(self, name, geographic, falseEasting, falseNorthing,
+                                  unit, factoryCode)
+        self.centralMeridian = centralMeridian
+        self.scaleFactor = scaleFactor
+        self.latitudeOfOrigin = latitudeOfOrigin
+        flattening = 1.0 / self.ellipsoid.inverseFlattening
+        n = flattening / (2.0 - flattening)
+        n2 = n * n
+        n3 = n2 * n
+        self.kA = scaleFactor * self.ellipsoid.a / (1.0 + n) * (1.0 + n2 / 4.0 + n2 * n2 / 64.0)
+        self.alpha = (n / 2.0 - 2.0 * n2 / 3.0 + 5.0 * n3 / 16.0,
+                      13.0 * n2 / 48.0 - 3.0 * n3 / 5.0,
+                      61.0 * n3 / 240.0)
+        self.beta = (n / 2.0 - 2.0 * n2 / 3.0 + 37.0 * n3 / 96.0,
+                     n2 / 48.0 + n3 / 15.0,
+                     17.0 * n3 / 480.0)
+        self.northingOfOrigin = self._projectRadians(
+            np.array([math.radians(latitudeOfOrigin)]), np.zeros(1))[1][0]
+
+    def _projectRadians(self, phi, dLambda):
+        """
+        :return: easting and northing (metres) from the central meridian
+                and the equator
+        """
+        sinPhi = np.sin(phi)
+        t = np.sinh(np.arctanh(sinPhi) - self.e * np.arctanh(self.e * sinPhi))
+        xiPrime = np.arctan2(t, np.cos(dLambda))
+        etaPrime = np.arctanh(np.sin(dLambda) / np.sqrt(1.0 + t * t))
+        easting = etaPrime.copy()
+        northing = xiPrime.copy()
+        for j, alpha in enumerate(self.alpha, 1):
+            easting += alpha * np.cos(2 * j * xiPrime) * np.sinh(2 * j * etaPrime)
+            northing += alpha * np.sin(2 * j * xiPrime) * np.cosh(2 * j * etaPrime)
+        return self.kA * easting, self.kA * northing
+
+    def _latitudeOfConformal(self, chi):
+        """
+        Solve asinh(tan(phi)) - e * atanh(e * sin(phi)) = asinh(tan(chi))
+        for the latitude phi by Newton's method.
+        """
+        e2 = self.e * self.e
+        target = np.arcsinh(np.tan(chi))
+        phi = chi.copy()
+        for _ in range(10):
+            sinPhi = np.sin(phi)
+            psi = np.arcsinh(np.tan(phi)) - self.e * np.arctanh(self.e * sinPhi)
+            step = (target - psi) * (1.0 - e2 * sinPhi * sinPhi) * np.cos(phi) / (1.0 - e2)
+            phi = phi + step
+            if np.all(np.abs(step) < 1.0e-15):
+                break
+        return phi
+
+    def fromGeographic(self, longitudes, latitudes):
+        phi = np.radians(np.asarray(latitudes, dtype=float))
+        dLambda = np.radians(np.asarray(longitudes, dtype=float) - self.centralMeridian)
+        easting, northing = self._projectRadians(phi, dLambda)
+        x = self.falseEasting + easting
+        y = self.falseNorthing + northing - self.northingOfOrigin
+        return x / self.unit.metersPerUnit, y / self.unit.metersPerUnit
+
+    def toGeographic(self, xs, ys):
+        xi = (np.asarray(ys, dtype=float) * self.unit.metersPerUnit - self.falseNorthing +
+              self.northingOfOrigin) / self.kA
+        eta = (np.asarray(xs, dtype=float) * self.unit.metersPerUnit -
+               self.falseEasting) / self.kA
+        xiPrime = xi.copy()
+        etaPrime = eta.copy()
+        for j, beta in enumerate(self.beta, 1):
+            xiPrime -= beta * np.sin(2 * j * xi) * np.cosh(2 * j * eta)
+            etaPrime -= beta * np.cos(2 * j * xi) * np.sinh(2 * j * eta)
+        chi = np.arcsin(np.sin(xiPrime) / np.cosh(etaPrime))
+        phi = self._latitudeOfConformal(chi)
+        dLambda = np.arctan2(np.sinh(etaPrime), np.cos(xiPrime))
+        return np.degrees(dLambda) + self.centralMeridian, np.degrees(phi)
+
+    def exportToString(self):
+        return self._wkt('Transverse_Mercator',
+                         [('Central_Meridian', self.centralMeridian),
+                          ('Scale_Factor', self.scaleFactor),
+                          ('Latitude_Of_Origin', self.latitudeOfOrigin)])
+
+
+NAD83 = GeographicSystem('GCS_North_American_1983', 'D_North_American_1983', GRS80, 4269)
+WGS84 = GeographicSystem('GCS_WGS_1984', 'D_WGS_1984', WGS84_ELLIPSOID, 4326)
+
+
+def _northCarolina(unit, factoryCode, suffix):
+    # NAD83 / North Carolina: false easting 609601.22 m (2,000,000 ftUS)
+    falseEasting = 609601.22 / unit.metersPerUnit
+    return LambertConformalConic('NAD_1983_StatePlane_North_Carolina_FIPS_3200' + suffix,
+                                 NAD83, 34.0 + 20.0 / 60.0, 36.0 + 10.0 / 60.0,
+                                 33.75, -79.0, falseEasting, 0.0, unit, factoryCode)
+
+
+def utmZone(zone, north=True, geographic=WGS84, factoryCode=0):
+    """
+    :param zone: UTM zone number, 1 to 60
+    :return: TransverseMercator of the zone
+    """
+    if not 1 <= zone <= 60:
+        raise ValueError('UTM zones are 1 to 60.')
+    datumName = 'NAD_1983' if geographic is NAD83 else 'WGS_1984'
+    return TransverseMercator('{0}_UTM_Zone_{1}{2}'.format(datumName, zone,
+                                                          'N' if north else 'S'),
+                              geographic, -183.0 + 6.0 * zone, 0.9996, 0.0, 500000.0,
+                              0.0 if north else 10000000.0, METER, factoryCode)
+
+
+def coordinateSystemFromEpsg(code):
+    """
+    :param code: EPSG code of one of: 4326, 4269 (geographic); 2264,
+            32119 (NAD83 / North Carolina, ftUS and m); 32601-32660,
+            32701-32760 (WGS84 / UTM); 26901-26923 (NAD83 / UTM)
+    :rtype: CoordinateSystem
+    :raises: ValueError for other codes
+    """
+    code = int(code)
+    if code == 4326:
+        return WGS84
+    if code == 4269:
+        return NAD83
+    if code == 2264:
+        return _northCarolina(US_SURVEY_FOOT, 2264, '_Feet')
+    if code == 32119:
+        return _northCarolina(METER, 32119, '')
+    if 32601 <= code <= 32660:
+        return utmZone(code - 32600, True, WGS84, code)
+    if 32701 <= code <= 32760:
+        return utmZone(code - 32700, False, WGS84, code)
+    if 26901 <= code <= 26923:
+        return utmZone(code - 26900, True, NAD83, code)
+    raise ValueError('EPSG:{0} is not one of the built-in coordinate systems.'.format(code))
+
+
+def _asCoordinateSystem(system):
+    if isinstance(system, CoordinateSystem):
+        return system
+    return coordinateSystemFromEpsg(system)
+
+
+def optionalTransformer(sourceSystem, targetSystem):
+    """
+    The Transformer for the source and target options of the entry points
+    that read coordinates without arcpy (csv files, raw coordinates).
+    :param sourceSystem: CoordinateSystem, EPSG code or None
+    :param targetSystem: CoordinateSystem, EPSG code or None
+    :return: Transformer, or None if neither is given
+    :raises: ValueError if only one of them is given
+    """
+    if sourceSystem is None and targetSystem is None:
+        return None
+    if sourceSystem is None or targetSystem is None:
+        raise ValueError('Give both the source and the target coordinate system.')
+    return Transformer(sourceSystem, targetSystem)
+
+
+class Transformer(object):
+    """
+    Converts coordinates from one coordinate system to another.
+    Methods:
+        transform - arrays of X and Y
+        transformPoints - points with X and Y, in place
+    """
+    def __init__(self, source, target):
+        """
+        :param source: CoordinateSystem or EPSG code
+        :param target: CoordinateSystem or EPSG code
+        """
+        self.source = _asCoordinateSystem(source)
+        self.target = _asCoordinateSystem(target)
+
+    def transform(self, xs, ys):
+        """
+        :return: arrays of X and Y in the target system
+        """
+        if self.source is self.target:
+            return np.array(xs, dtype=float), np.array(ys, dtype=float)
+        longitudes, latitudes = self.source.toGeographic(xs, ys)
+        return self.target.fromGeographic(longitudes, latitudes)
+
+    def transformPoints(self, points):
+        """
+        Reproject points (anything with settable X and Y) in place, all
+        in one call to transform.
+        :return: None
+        """
+        if not points:
+            return
+        xs, ys = self.transform([point.X for point in points],
+                                [point.Y for point in points])
+        for point, x, y in zip(points, xs.tolist(), ys.tolist()):
+            point.X = x
+            point.Y = y
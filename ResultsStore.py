@@ -0,0 +1,332 @@
+"""
+A single-file results store for the per-vertex analysis results: a
+SQLite database laid out as an OGC GeoPackage.
+
+Every analyzed vertex of every alignment becomes a row of the vertices
+point feature table, carrying the same attributes as the csv files.
+Rows are bulk-inserted in batched transactions.  The vertex coordinates
+are indexed by an R*Tree (rtree_vertices_geom) and the radius and degree
+columns by ordinary indexes, so cross-alignment questions such as
+"all curves with radius < 150 in this bounding box" are answered
+without reading any csv file:
+
+    with ResultsStore('results.gpkg') as store:
+        rows = store.queryVertices(bbox=(xMin, yMin, xMax, yMax),
+                                   maxRadius=150.0)
+
+The vertices table is a regular GeoPackage point layer, and the
+alignments table a line layer with one polyline (and a summary of the
+analysis) per alignment, so the file can be added to a map as a check
+layer.  The R*Tree is filled as rows are
+inserted rather than by the GeoPackage triggers (those need spatial SQL
+functions plain SQLite does not have), so edits made to the table by
+other tools will not update it.
+"""
+
+import math
+import sqlite3
+import struct
+from ExtendedPoint import cvt_radians_to_degrees
+from CheckLayerWriter import alignmentSummary
+
+_gpkgApplicationId = 0x47504B47  # 'GPKG'
+_gpkgUserVersion = 10200
+
+# EPSG codes stay below this; ArcGIS numbers its own (ESRI authority)
+# coordinate systems above it, e.g. 102719 or 103000.
+_lastEpsgCode = 32767
+
+VERTEX_COLUMNS = ('x', 'y', 'degree', 'radius', 'arc_deflection',
+                  'chord_direction', 'points_defl', 'distance_back',
+                  'distance_ahead', 'arc_length_back', 'arc_length_ahead')
+
+_schema = """
+CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (
+    srs_name TEXT NOT NULL, srs_id INTEGER NOT NULL PRIMARY KEY,
+    organization TEXT NOT NULL, organization_coordsys_id INTEGER NOT NULL,
+    definition TEXT NOT NULL, description TEXT);
+CREATE TABLE IF NOT EXISTS gpkg_contents (
+    table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL,
+    identifier TEXT UNIQUE, description TEXT DEFAULT '',
+    last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+    min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+    srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id));
+CREATE TABLE IF NOT EXISTS gpkg_geometry_columns (
+    table_name TEXT NOT NULL, column_name TEXT NOT NULL,
+    geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL,
+    z TINYINT NOT NULL, m TINYINT NOT NULL,
+    CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name));
+CREATE TABLE IF NOT EXISTS gpkg_extensions (
+    table_name TEXT, column_name TEXT, extension_name TEXT NOT NULL,
+    definition TEXT NOT NULL, scope TEXT NOT NULL,
+    CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name));
+CREATE TABLE IF NOT EXISTS alignments (
+    id INTEGER PRIMARY KEY, geom LINESTRING, source TEXT,
+    alignment_number INTEGER, csv_file TEXT, vertex_count INTEGER,
+    length DOUBLE, min_radius DOUBLE, max_degree DOUBLE);
+CREATE TABLE IF NOT EXISTS vertices (
+    fid INTEGER PRIMARY KEY, geom POINT, alignment_id INTEGER,
+    vertex_index INTEGER, x DOUBLE, y DOUBLE, degree DOUBLE, radius DOUBLE,
+    arc_deflection DOUBLE, chord_direction DOUBLE, points_defl DOUBLE,
+    distance_back DOUBLE, distance_ahead DOUBLE, arc_length_back DOUBLE,
+    arc_length_ahead DOUBLE);
+CREATE VIRTUAL TABLE IF NOT EXISTS rtree_vertices_geom
+    USING rtree(id, minx, maxx, miny, maxy);
+"""
+
+_indexes = """
+CREATE INDEX IF NOT EXISTS idx_vertices_radius ON vertices (radius);
+CREATE INDEX IF NOT EXISTS idx_vertices_degree ON vertices (degree);
+CREATE INDEX IF NOT EXISTS idx_vertices_alignment ON vertices (alignment_id, vertex_index);
+"""
+
+
+def _gpkgPoint(x, y, srsId):
+    """GeoPackage binary geometry (no envelope, little endian) of a point."""
+    return sqlite3.Binary(struct.pack('<2sBBi', b'GP', 0, 1, srsId) +
+                          struct.pack('<BIdd', 1, 1, x, y))
+
+
+def _gpkgLineString(pointList, srsId):
+    """GeoPackage binary geometry (no envelope, little endian) of a line."""
+    coordinates = [value for pt in pointList for value in (pt.X, pt.Y)]
+    return sqlite3.Binary(struct.pack('<2sBBi', b'GP', 0, 1, srsId) +
+                          struct.pack('<BII', 1, 2, len(pointList)) +
+                          struct.pack('<{0}d'.format(len(coordinates)), *coordinates))
+
+
+def _finite(value):
+    if value is False or value is None:
+        return None
+    if math.isinf(value) or math.isnan(value):
+        return None
+    return value
+
+
+def vertexValues(point):
+    """
+    The values of the vertex attributes (VERTEX_COLUMNS) of an analyzed
+    ExtendedPoint, in the units of the csv files. Missing, infinite and
+    undefined values are None.
+    :rtype: tuple
+    """
+    values = [point.X, point.Y]
+    if point.arc:
+        values.extend((point.arc.degreeCurve100, point.arc.radius,
+                       cvt_radians_to_degrees(point.arc.deflection),
+                       cvt_radians_to_degrees(point.arc.chordVector.azimuth)))
+    else:
+        values.extend((None, None, None, None))
+    if point.pt2pt:
+        values.extend((cvt_radians_to_degrees(point.pt2pt.deflection),
+                       point.pt2pt.distanceBack, point.pt2pt.distanceAhead))
+    else:
+        values.extend((None, None, None))
+    if point.arc:
+        values.extend((point.arc.lengthBack, point.arc.lengthAhead))
+    else:
+        values.extend((None, None))
+    return tuple(_finite(v) for v in values)
+
+
+def srsOrganization(srsId):
+    """
+    The authority of a spatial reference id, as written to the organization
+    column of gpkg_spatial_ref_sys.
+    :param srsId: EPSG or ESRI code (an arcpy factoryCode), or -1 / 0
+    :return: 'EPSG', 'ESRI', or 'NONE' for the undefined systems
+    """
+    if srsId in (-1, 0):
+        return 'NONE'
+    if srsId <= _lastEpsgCode:
+        return 'EPSG'
+    return 'ESRI'
+
+
+class ResultsStore(object):
+    """
+    Methods:
+        addAlignment - queue all vertices of an analyzed alignment for insert
+        flush - insert all queued rows in one transaction
+        queryVertices - bounding box / radius / degree queries
+        close - flush, finish the GeoPackage metadata, and close the file
+    """
+    def __init__(self, fileName, srsId=-1, srsName=None, srsDefinition=None,
+                 batchSize=50000, organization=None):
+        """
+        ctor for a ResultsStore. Opens (or creates) the file.
+        :param fileName: path of the .gpkg (or .sqlite) file
+        :param srsId: spatial reference id of the coordinates (EPSG or ESRI
+                code, or -1 for undefined Cartesian)
+        :param srsName: name of the spatial reference
+        :param srsDefinition: WKT of the spatial reference
+        :param batchSize: number of vertices queued before an automatic flush
+        :param organization: Optional. authority of srsId, 'EPSG' or 'ESRI';
+                by default srsOrganization(srsId)
+        :return: None
+        """
+        self.fileName = fileName
+        self.srsId = int(srsId)
+        self.batchSize = batchSize
+        self._connection = sqlite3.connect(fileName)
+        self._connection.execute('PRAGMA application_id = {0}'.format(_gpkgApplicationId))
+        self._connection.execute('PRAGMA user_version = {0}'.format(_gpkgUserVersion))
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        self._connection.executescript(_schema)
+        if organization is None:
+            organization = srsOrganization(self.srsId)
+        self._registerSpatialReference(srsName, srsDefinition, organization)
+        self._registerVertexTable()
+        self._connection.commit()
+
+        cursor = self._connection.execute('SELECT MAX(fid) FROM vertices')
+        self._nextFid = (cursor.fetchone()[0] or 0) + 1
+        cursor = self._connection.execute('SELECT MAX(id) FROM alignments')
+        self._nextAlignmentId = (cursor.fetchone()[0] or 0) + 1
+        self._pendingAlignments = []
+        self._pendingVertices = []
+        self._pendingBoxes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def _registerSpatialReference(self, srsName, srsDefinition, organization):
+        rows = [('Undefined cartesian SRS', -1, 'NONE', -1, 'undefined'),
+                ('Undefined geographic SRS', 0, 'NONE', 0, 'undefined'),
+                ('WGS 84 geodetic', 4326, 'EPSG', 4326,
+                 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,'
+                 '298.257223563]],PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433]]')]
+        if self.srsId not in (-1, 0, 4326):
+            rows.append((srsName or '{0}:{1}'.format(organization, self.srsId), self.srsId,
+                         organization, self.srsId, srsDefinition or 'undefined'))
+        self._connection.executemany(
+            'INSERT OR IGNORE INTO gpkg_spatial_ref_sys (srs_name, srs_id, '
+            'organization, organization_coordsys_id, definition) VALUES (?,?,?,?,?)',
+            rows)
+
+    def _registerVertexTable(self):
+        for tableName, geometryType in (('vertices', 'POINT'),
+                                        ('alignments', 'LINESTRING')):
+            self._connection.execute(
+                "INSERT OR IGNORE INTO gpkg_contents (table_name, data_type, "
+                "identifier, srs_id) VALUES (?, 'features', ?, ?)",
+                (tableName, tableName, self.srsId))
+            self._connection.execute(
+                "INSERT OR IGNORE INTO gpkg_geometry_columns VALUES "
+                "(?, 'geom', ?, ?, 0, 0)", (tableName, geometryType, self.srsId))
+        self._connection.execute(
+            "INSERT OR IGNORE INTO gpkg_extensions VALUES ('vertices', 'geom', "
+            "'gpkg_rtree_index', 'http://www.geopackage.org/spec120/#extension_rtree', "
+            "'write-only')")
+
+    def addAlignment(self, pointList, source=None, alignmentNumber=0, csvFile=None):
+        """
+        Queue every vertex of an analyzed alignment for insertion.
+        :param pointList: spatially ordered, analyzed ExtendedPoints
+        :param source: name of the feature class (or file) of the alignment
+        :param alignmentNumber: number of the alignment within its source
+        :param csvFile: csv file the alignment was also written to, if any
+        :return: the id of the alignment in the store
+        :rtype: int
+        """
+        alignmentId = self._nextAlignmentId
+        self._nextAlignmentId += 1
+        summary = alignmentSummary(pointList)
+        self._pendingAlignments.append((alignmentId, _gpkgLineString(pointList, self.srsId),
+                                        source, alignmentNumber, csvFile,
+                                        len(pointList), summary.length,
+                                        summary.minRadius, summary.maxDegree))
+        srsId = self.srsId
+        for index, point in enumerate(pointList):
+            fid = self._nextFid
+            self._nextFid += 1
+            values = vertexValues(point)
+            self._pendingVertices.append((fid, _gpkgPoint(point.X, point.Y, srsId),
+                                          alignmentId, index) + values)
+            self._pendingBoxes.append((fid, point.X, point.X, point.Y, point.Y))
+        if len(self._pendingVertices) >= self.batchSize:
+            self.flush()
+        return alignmentId
+
+    def flush(self):
+        """
+        Insert all queued alignments and vertices in one transaction.
+        :return: None
+        """
+        if not self._pendingAlignments:
+            return
+        placeholders = ','.join('?' * (4 + len(VERTEX_COLUMNS)))
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO alignments VALUES (?,?,?,?,?,?,?,?,?)', self._pendingAlignments)
+            self._connection.executemany(
+                'INSERT INTO vertices VALUES ({0})'.format(placeholders),
+                self._pendingVertices)
+            self._connection.executemany(
+                'INSERT INTO rtree_vertices_geom VALUES (?,?,?,?,?)',
+                self._pendingBoxes)
+        self._pendingAlignments = []
+        self._pendingVertices = []
+        self._pendingBoxes = []
+
+    def queryVertices(self, bbox=None, minRadius=None, maxRadius=None,
+                      minAbsDegree=None, alignmentId=None):
+        """
+        Select vertices. All given criteria must hold.
+        :param bbox: (xMin, yMin, xMax, yMax)
+        :param minRadius: smallest radius (tangent vertices have no radius)
+        :param maxRadius: largest radius
+        :param minAbsDegree: smallest absolute degree of curve
+        :param alignmentId: only vertices of this alignment
+        :return: list of tuples (alignment_id, vertex_index) + VERTEX_COLUMNS
+        """
+        self.flush()
+        sql = 'SELECT v.alignment_id, v.vertex_index, ' + \
+              ', '.join('v.' + c for c in VERTEX_COLUMNS) + ' FROM vertices v'
+        clauses = []
+        params = []
+        if bbox is not None:
+            sql += ' JOIN rtree_vertices_geom r ON r.id = v.fid'
+            clauses.append('r.minx >= ? AND r.maxx <= ? AND r.miny >= ? AND r.maxy <= ?')
+            params.extend((bbox[0], bbox[2], bbox[1], bbox[3]))
+        if minRadius is not None:
+            clauses.append('v.radius >= ?')
+            params.append(minRadius)
+        if maxRadius is not None:
+            clauses.append('v.radius <= ?')
+            params.append(maxRadius)
+        if minAbsDegree is not None:
+            clauses.append('(v.degree >= ? OR v.degree <= ?)')
+            params.extend((minAbsDegree, -minAbsDegree))
+        if alignmentId is not None:
+            clauses.append('v.alignment_id = ?')
+            params.append(alignmentId)
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY v.alignment_id, v.vertex_index'
+        return self._connection.execute(sql, params).fetchall()
+
+    def close(self):
+        """
+        Flush, build the attribute indexes, record the extent of the
+        layers, and close the file.
+        :return: None
+        """
+        if self._connection is None:
+            return
+        self.flush()
+        with self._connection:
+            self._connection.executescript(_indexes)
+            self._connection.execute(
+                "UPDATE gpkg_contents SET "
+                "min_x = (SELECT MIN(minx) FROM rtree_vertices_geom), "
+                "max_x = (SELECT MAX(maxx) FROM rtree_vertices_geom), "
+                "min_y = (SELECT MIN(miny) FROM rtree_vertices_geom), "
+                "max_y = (SELECT MAX(maxy) FROM rtree_vertices_geom), "
+                "last_change = strftime('%Y-%m-%dT%H:%M:%fZ','now') "
+                "WHERE table_name IN ('vertices', 'alignments')")
+        self._connection.close()
+        self._connection = None
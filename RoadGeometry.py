@@ -27,11 +27,13 @@ Open the tool from my toolbox. (Road Geometry Analysis)
         product of the tool.
 
 > Select Create New Shapefile From Analysis Results
-    only if you want the tool to back-load another shape file
-    from the resulting CSV file(s) as a confidence check.  If
-    turned on, the tool automatically appends "_check" to the
-    name of the new shapefile, loads it to the default gdb file,
-    and adds it to the active Layer for display in the map.
+    only if you want the tool to write another shape file
+    from the analyzed points as a confidence check.  If
+    turned on, the tool writes one polyline shapefile per
+    feature class (one line per alignment, with a summary of
+    the analysis) to the Output CSV Path, appending "_check"
+    to its name, and adds it to the active Layer for display
+    in the map.
 
 > Select the OK button and the tool runs.
 
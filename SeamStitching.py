@@ -0,0 +1,203 @@
+"""
+The arcpy-free part of tiled analysis (see TiledAnalysis): partitioning
+features into tiles, telling the alignments of a tile that cross a seam
+from those that do not, and stitching the pieces that cross seams.
+
+Features are given here by their extent centers and end points (numpy
+arrays) and by their vertices (segments of ExtendedPoints), so all of it
+runs, and is tested, without a feature class.
+
+A piece of an alignment that crosses a seam is analyzed in its tile, and
+the rows of its interior vertices are written to a file there (with its
+vertices, in case the piece has to be reversed).  Only its end vertices,
+the first and last END_POINTS, go back to the parent as a SeamPiece.
+Those are enough to chain the pieces and to recompute the triplets
+around each join; the interior rows are copied from the file, so the
+parent never holds more than one piece's vertices.
+"""
+
+import collections
+import os
+import numpy as np
+from ExtendedPoint import ExtendedPoint, compute_arc_parameters, getEqualityTolerance
+from ExtendedPoint import any_point_has_z
+from PointSnapIndex import chainSegments
+from CompressedIO import openForWrite
+
+# Vertices kept at each end of a seam piece: the end vertex, its neighbor,
+# and the neighbor of that, whose triplet includes the end vertex.
+END_POINTS = 3
+
+SeamPiece = collections.namedtuple('SeamPiece', 'ends count vertical fileStem')
+
+
+def partitionIntoTiles(centers, tileSize):
+    """
+    :param centers: n x 2 array of the extent centers of the features
+    :param tileSize: Width and height of a tile in coordinate units.
+    :return: the (column, row) key of each tile, sorted, and for each
+            feature the index of its tile in those keys
+    :rtype: (numpy array (m x 2), numpy array (n))
+    """
+    tileKeys = np.floor(np.asarray(centers, dtype=float) / float(tileSize)).astype(np.int64)
+    if len(tileKeys) == 0:
+        return tileKeys.reshape(0, 2), np.zeros(0, dtype=np.int64)
+    uniqueKeys, tileOfFeature = np.unique(tileKeys, axis=0, return_inverse=True)
+    return uniqueKeys, tileOfFeature.reshape(-1)
+
+
+def foreignEndsNear(ends, inTile):
+    """
+    The end points of features outside the tile which lie within the
+    bounding box of the end points of the features inside the tile.
+    Only these can join an alignment of the tile to another tile.
+    :param ends: n x 4 array of beginX, beginY, endX, endY per feature
+    :param inTile: boolean array, True for the features of the tile
+    :rtype: numpy array (m x 2)
+    """
+    tilePoints = ends[inTile].reshape(-1, 2)
+    otherPoints = ends[~inTile].reshape(-1, 2)
+    tolerance = getEqualityTolerance()
+    lo = tilePoints.min(axis=0) - tolerance
+    hi = tilePoints.max(axis=0) + tolerance
+    near = np.all((otherPoints >= lo) & (otherPoints <= hi), axis=1)
+    return otherPoints[near]
+
+
+def touchesAny(point, candidates):
+    """
+    :param candidates: m x 2 array of points
+    :return: True if point is spatially equal to one of candidates
+    """
+    if len(candidates) == 0:
+        return False
+    tolerance = getEqualityTolerance()
+    return bool(np.any((np.abs(candidates[:, 0] - point.X) <= tolerance) &
+                       (np.abs(candidates[:, 1] - point.Y) <= tolerance)))
+
+
+def analyzeTileSegments(segments, foreignEnds, writeAlignment, seamFileStem):
+    """
+    Assemble and analyze the alignments of a single tile, one at a time.
+    :param segments: iterable of the segments of the tile's features
+    :param foreignEnds: see foreignEndsNear
+    :param writeAlignment: called with each analyzed alignment that lies
+            wholly in the tile
+    :param seamFileStem: path and start of the file names of the seam
+            pieces, see writeSeamPiece
+    :return: the pieces of alignments that touch a feature of another
+            tile, to be stitched
+    :rtype: list of SeamPiece
+    """
+    seamPieces = []
+    for alignment in chainSegments(segments):
+        _analyze(alignment)
+        if touchesAny(alignment[0], foreignEnds) or \
+                touchesAny(alignment[-1], foreignEnds):
+            fileStem = '{0}_{1}'.format(seamFileStem, len(seamPieces))
+            seamPieces.append(writeSeamPiece(alignment, fileStem))
+        else:
+            writeAlignment(alignment)
+    return seamPieces
+
+
+def writeSeamPiece(alignment, fileStem):
+    """
+    Write the rows of the interior vertices of an analyzed piece to
+    <fileStem>.csv, and all of its vertices to <fileStem>.npy. A piece
+    short enough to be all end points writes no files.
+    :param alignment: analyzed list of ExtendedPoints
+    :param fileStem: path of the files without extension
+    :rtype: SeamPiece
+    """
+    count = len(alignment)
+    vertical = any_point_has_z(alignment)
+    if count <= 2 * END_POINTS:
+        ends = alignment
+        fileStem = None
+    else:
+        ends = alignment[:END_POINTS] + alignment[-END_POINTS:]
+        with open(fileStem + '.csv', 'w') as f:
+            for point in alignment[END_POINTS - 1:1 - END_POINTS]:
+                f.write(point.csvRow(vertical) + '\n')
+        np.save(fileStem + '.npy',
+                np.array([(point.X, point.Y, np.nan if point.Z is None else point.Z)
+                          for point in alignment]))
+    ends = [ExtendedPoint(point.X, point.Y, newZ=point.Z) for point in ends]
+    return SeamPiece(ends, count, vertical, fileStem)
+
+
+def stitchSeamPieces(pieces, outputFileName):
+    """
+    Join seam pieces which share end points and write each stitched
+    alignment to a csv file, as writeToCSV would. The triplets around each
+    join, and all of the triplets of a piece that was reversed to fit the
+    chain, are recomputed; the other rows are copied from the piece files.
+    The piece files are removed afterward.
+    :param pieces: list of SeamPiece
+    :param outputFileName: called with the number of a stitched alignment
+            (from 0), returns the name of its csv file
+    :return: list of the csv files written
+    """
+    stubs = [list(piece.ends) for piece in pieces]
+    firstPoints = [stub[0] for stub in stubs]
+    owners = {}
+    for number, stub in enumerate(stubs):
+        for position, point in enumerate(stub):
+            owners[id(point)] = (number, position)
+    written = []
+    try:
+        for chain in chainSegments(stubs):
+            # Only the triplets of end points which are neighbors in their
+            # piece come out right; the rest are taken from the piece files.
+            _analyze(chain)
+            vertical = any(pieces[owners[id(point)][0]].vertical for point in chain)
+            fileName = outputFileName(len(written))
+            with openForWrite(fileName) as f:
+                f.write(ExtendedPoint.header_list(vertical) + '\n')
+                for point in chain:
+                    number, position = owners[id(point)]
+                    piece = pieces[number]
+                    if piece.fileStem is None or position not in (END_POINTS - 1, END_POINTS):
+                        f.write(point.csvRow(vertical) + '\n')
+                        continue
+                    reverse = stubs[number][0] is not firstPoints[number]
+                    # The interior goes between the last of the end points
+                    # at the start and the first of those at the end.
+                    if position == (END_POINTS if reverse else END_POINTS - 1):
+                        for row in _interiorRows(piece, reverse, vertical):
+                            f.write(row + '\n')
+            written.append(fileName)
+    finally:
+        for piece in pieces:
+            if piece.fileStem is not None:
+                for extension in ('.csv', '.npy'):
+                    if os.path.exists(piece.fileStem + extension):
+                        os.remove(piece.fileStem + extension)
+    return written
+
+
+def _interiorRows(piece, reverse, vertical):
+    """
+    The csv rows of the interior vertices of a seam piece, in the direction
+    of the stitched alignment. They are read from its file, or recomputed
+    from its vertices when the piece is reversed (or the file was written
+    without the vertical columns the alignment needs).
+    """
+    if not reverse and piece.vertical == vertical:
+        with open(piece.fileStem + '.csv', 'r') as f:
+            for line in f:
+                yield line.rstrip('\r\n')
+        return
+    vertices = np.load(piece.fileStem + '.npy').tolist()
+    if reverse:
+        vertices.reverse()
+    points = [ExtendedPoint(x, y, newZ=z) for x, y, z in vertices]
+    for i in range(END_POINTS - 1, len(points) - END_POINTS + 1):
+        compute_arc_parameters(points[i - 1], points[i], points[i + 1])
+        yield points[i].csvRow(vertical)
+
+
+def _analyze(alignment):
+    for pt1, pt2, pt3 in zip(alignment[:-2], alignment[1:-1], alignment[2:]):
+        compute_arc_parameters(pt1, pt2, pt3)
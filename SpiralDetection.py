@@ -0,0 +1,256 @@
+"""
+Detection and fitting of clothoid (spiral) transitions.
+
+compute_arc_parameters fits a circular arc to every triplet of points, so
+a spiral, whose curvature changes linearly with length, shows up as a
+ramp in the degree of curve.  This module finds those ramps.
+
+The signed curvature of each vertex (degreeCurve, 1 / radius) is taken
+against its station (cumulative length along the alignment), and the
+alignment is split greedily into runs over which curvature is linear in
+station: a run grows from its first vertex for as long as the RMS residual
+of the least-squares line stays within tolerance.  The residual of every
+candidate end of a run is computed at once from cumulative sums, growing
+the window of candidates by doubling, so the whole pass is O(n).  Runs
+share their boundary vertex with the run after them.
+
+Each run is then one of
+    'tangent' - curvature about zero
+    'arc' - constant curvature
+    'spiral' - curvature changing by at least minCurvatureChange
+and each spiral is fitted with its length, start and end radius and its
+clothoid parameter A, where A * A = length / |change of curvature| (for a
+spiral from a tangent, the familiar A * A = R * L).
+
+Since a run only ends once a vertex spoils the fit, a greedy run takes
+in a few vertices past the change of element.  So the boundary between
+two runs is then moved to where the lines fitted to them cross, and the
+runs are fitted again.
+"""
+
+import collections
+import math
+import numpy as np
+from CompressedIO import openForWrite
+
+CurvatureRun = collections.namedtuple(
+    'CurvatureRun', 'kind startIndex endIndex startStation endStation '
+                    'startCurvature endCurvature rmsResidual')
+
+SpiralFit = collections.namedtuple(
+    'SpiralFit', 'startIndex endIndex startStation endStation length '
+                 'startRadius endRadius A startCurvature endCurvature rmsResidual')
+
+TANGENT = 'tangent'
+ARC = 'arc'
+SPIRAL = 'spiral'
+
+DEFAULT_TOLERANCE = 1.0e-4
+
+
+def stationsFromXY(xs, ys):
+    """
+    :return: cumulative chord length at each point, starting at 0.0
+    :rtype: numpy array
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    stations = np.zeros(len(xs))
+    if len(xs) > 1:
+        stations[1:] = np.cumsum(np.hypot(np.diff(xs), np.diff(ys)))
+    return stations
+
+
+def _runEnd(stations, curvatures, start, tolerance, minPoints):
+    """
+    :return: index of the last point of the run beginning at start
+    """
+    count = len(stations)
+    window = max(4 * minPoints, 16)
+    while True:
+        stop = min(count, start + window)
+        x = stations[start:stop] - stations[start]
+        y = curvatures[start:stop]
+        m = np.arange(1, stop - start + 1, dtype=float)
+        sumX = np.cumsum(x)
+        sumY = np.cumsum(y)
+        varX = np.cumsum(x * x) - sumX * sumX / m
+        covXY = np.cumsum(x * y) - sumX * sumY / m
+        varY = np.cumsum(y * y) - sumY * sumY / m
+        safeVarX = np.where(varX > 0.0, varX, 1.0)
+        sse = np.where(varX > 0.0, varY - covXY * covXY / safeVarX, varY)
+        rms = np.sqrt(np.maximum(sse, 0.0) / m)
+        spoiled = rms > tolerance
+        spoiled[:minPoints] = False
+        if spoiled.any():
+            return start + int(np.argmax(spoiled)) - 1
+        if stop == count:
+            return count - 1
+        window *= 2
+
+
+def _lineFit(x, y):
+    """
+    :return: slope and intercept (at x = 0) of the least-squares line, and
+            the RMS residual
+    """
+    meanX = x.mean()
+    meanY = y.mean()
+    varX = ((x - meanX) ** 2).sum()
+    slope = ((x - meanX) * (y - meanY)).sum() / varX if varX > 0.0 else 0.0
+    residual = y - (meanY + slope * (x - meanX))
+    return slope, meanY - slope * meanX, math.sqrt((residual * residual).mean())
+
+
+def _refineBoundaries(s, k, boundaries, refinements):
+    """
+    Move each boundary between two runs to where the lines fitted to the
+    runs cross, as long as that is between the boundaries around it, then
+    fit the runs again. This takes back the vertices a greedy run takes in
+    past the true change of element.
+    :return: the boundary stations and the (slope, intercept, rms) of each run
+    """
+    boundaries = list(boundaries)
+    for refinement in range(refinements + 1):
+        lines = []
+        for low, high in zip(boundaries[:-1], boundaries[1:]):
+            first = np.searchsorted(s, low, 'left')
+            last = np.searchsorted(s, high, 'right')
+            if last - first < 2:
+                first, last = max(0, first - 1), min(len(s), last + 1)
+            lines.append(_lineFit(s[first:last], k[first:last]))
+        if refinement == refinements:
+            return boundaries, lines
+        for number in range(1, len(boundaries) - 1):
+            slopeBefore, interceptBefore = lines[number - 1][:2]
+            slopeAfter, interceptAfter = lines[number][:2]
+            if slopeBefore == slopeAfter:
+                continue
+            crossing = (interceptAfter - interceptBefore) / (slopeBefore - slopeAfter)
+            if boundaries[number - 1] < crossing < boundaries[number + 1]:
+                boundaries[number] = crossing
+
+
+def _nearestIndices(s, stations):
+    """
+    :return: index of the value of the sorted array s nearest to each station
+    """
+    after = np.clip(np.searchsorted(s, stations), 1, len(s) - 1)
+    before = after - 1
+    return np.where(np.abs(s[after] - stations) < np.abs(stations - s[before]),
+                    after, before)
+
+
+def fitCurvatureRuns(stations, curvatures, tolerance=DEFAULT_TOLERANCE,
+                     minPoints=3, minCurvatureChange=None, refinements=2):
+    """
+    Split an alignment into runs of linear curvature and classify them.
+    :param stations: array-like of the station of each vertex
+    :param curvatures: array-like of the signed curvature (degreeCurve) of
+            each vertex. Vertices where it is nan (the end points) are
+            skipped.
+    :param tolerance: Most RMS residual of curvature (1 / length units)
+            about the line fitted to a run.
+    :param minPoints: Fewest points of a run before the tolerance applies.
+    :param minCurvatureChange: Least change of curvature over a run for it
+            to be a spiral. Defaults to 3 * tolerance.
+    :param refinements: Number of times to move the boundaries between runs
+            to where their fitted lines cross.
+    :return: list of CurvatureRun. The stations and curvatures are those
+            of the fitted lines at the (refined) boundaries; the indices are
+            of the vertices nearest to the boundaries.
+    """
+    if minCurvatureChange is None:
+        minCurvatureChange = 3.0 * tolerance
+    stations = np.asarray(stations, dtype=float)
+    curvatures = np.asarray(curvatures, dtype=float)
+    valid = np.flatnonzero(np.isfinite(curvatures))
+    s = stations[valid]
+    k = curvatures[valid]
+    if len(s) < 2:
+        return []
+
+    ends = [0]
+    while ends[-1] < len(s) - 1:
+        ends.append(_runEnd(s, k, ends[-1], tolerance, max(minPoints, 2)))
+    boundaries, lines = _refineBoundaries(s, k, s[ends], refinements)
+
+    nearest = _nearestIndices(s, boundaries)
+    runs = []
+    for number, (slope, intercept, rms) in enumerate(lines):
+        startStation = boundaries[number]
+        endStation = boundaries[number + 1]
+        startCurvature = intercept + slope * startStation
+        endCurvature = intercept + slope * endStation
+        if math.fabs(endCurvature - startCurvature) >= minCurvatureChange:
+            kind = SPIRAL
+        elif math.fabs(startCurvature + endCurvature) / 2.0 <= tolerance:
+            kind = TANGENT
+        else:
+            kind = ARC
+        runs.append(CurvatureRun(kind, int(valid[nearest[number]]),
+                                 int(valid[nearest[number + 1]]),
+                                 startStation, endStation,
+                                 startCurvature, endCurvature, rms))
+    return runs
+
+
+def _radius(curvature, tolerance):
+    if math.fabs(curvature) <= tolerance:
+        return float('inf')
+    return 1.0 / math.fabs(curvature)
+
+
+def spiralFromRun(run, tolerance=DEFAULT_TOLERANCE):
+    """
+    Fit the spiral parameters of a run.
+    :param tolerance: Curvatures this close to zero have an infinite radius.
+    :rtype: SpiralFit
+    """
+    length = run.endStation - run.startStation
+    change = math.fabs(run.endCurvature - run.startCurvature)
+    A = math.sqrt(length / change) if change > 0.0 else float('inf')
+    return SpiralFit(run.startIndex, run.endIndex, run.startStation, run.endStation,
+                     length, _radius(run.startCurvature, tolerance),
+                     _radius(run.endCurvature, tolerance), A,
+                     run.startCurvature, run.endCurvature, run.rmsResidual)
+
+
+def detectSpirals(stations, curvatures, tolerance=DEFAULT_TOLERANCE, minPoints=3,
+                  minCurvatureChange=None, minLength=0.0):
+    """
+    Find and fit the spirals of an alignment. See fitCurvatureRuns.
+    :param minLength: Shortest spiral reported.
+    :return: list of SpiralFit
+    """
+    runs = fitCurvatureRuns(stations, curvatures, tolerance=tolerance,
+                            minPoints=minPoints, minCurvatureChange=minCurvatureChange)
+    return [spiralFromRun(run, tolerance) for run in runs
+            if run.kind == SPIRAL and run.endStation - run.startStation >= minLength]
+
+
+def detectSpiralsInPointList(pointList, **options):
+    """
+    detectSpirals for a list of ExtendedPoints already analyzed by
+    compute_arc_parameters.
+    :param options: keyword arguments of detectSpirals
+    :return: list of SpiralFit, indices being those of pointList
+    """
+    xs = [point.X for point in pointList]
+    ys = [point.Y for point in pointList]
+    curvatures = [point.arc.degreeCurve if point.arc else float('nan')
+                  for point in pointList]
+    return detectSpirals(stationsFromXY(xs, ys), curvatures, **options)
+
+
+def writeSpiralsCSV(fileName, spirals):
+    """
+    Write one row per SpiralFit.
+    :param fileName: A .gz or .bz2 extension compresses the file.
+    :return: None
+    """
+    with openForWrite(fileName) as f:
+        f.write('StartIndex,EndIndex,StartStation,EndStation,Length,'
+                'StartRadius,EndRadius,A,StartCurvature,EndCurvature,RMSResidual\n')
+        for spiral in spirals:
+            f.write(','.join(str(value) for value in spiral) + '\n')
@@ -0,0 +1,164 @@
+"""
+Tiled (out-of-core) processing of large Polyline feature classes, such
+as a statewide road network, in bounded memory.
+
+The features of the feature class are partitioned into square tiles by
+the center of their extent.  Only the OID, extent center and the two end
+points of each feature are held for the whole feature class.  Each tile
+is then read, assembled into alignments, analyzed and written on its own,
+optionally in a pool of worker processes.
+
+An alignment which ends where a feature of another tile begins or ends
+crosses a tile seam.  The rows of the interior of such a piece are written
+to a file by its tile as well, and only its end vertices are returned to
+the parent process, which stitches the pieces together.  Only the
+triplets around each join (or the triplets of pieces that had to be
+reversed) are recomputed, so the results match a single-pass run for
+non-branching alignments, and memory is bounded by the tile size however
+many tiles an alignment crosses.  That part needs no arcpy and is in
+SeamStitching.
+
+processFCforCogoAnalysis (and analyzePolylines) run this when given a
+tileSize.
+"""
+
+import collections
+import multiprocessing
+import os
+import arcpy
+import numpy as np
+from CogoPointAnalyst import confirmFCisPolyline
+from CogoPointAnalyst import _breakPolylinesIntoSegments
+from CogoPointAnalyst import _generateOutputFileName
+from CogoPointAnalyst import _cursorProjection
+from CogoPointAnalyst import writeToCSV
+from SeamStitching import partitionIntoTiles, foreignEndsNear
+from SeamStitching import analyzeTileSegments, stitchSeamPieces
+
+_oidsPerQuery = 1000
+
+TileJob = collections.namedtuple('TileJob',
+                                 'fc outputDir tileKey oids foreignEnds spatialRef')
+TileResult = collections.namedtuple('TileResult', 'outputFiles seamPieces')
+
+
+def analyzeFCTiled(fc, outputDir, tileSize, spatialRef=None, processes=1):
+    """
+    Tiled equivalent of processFCforCogoAnalysis. Analyzes a Polyline feature
+    class one spatial tile at a time and stitches alignments which cross
+    tile seams.
+    :param fc: Feature Class to be processed.
+    :param outputDir: Output directory to put the resulting csv files in.
+    :param tileSize: Width and height of a tile in coordinate units.
+    :param spatialRef: Coordinate System to which to project point coordinates
+            (arcpy SpatialReference or Projection.CoordinateSystem)
+    :param processes: Number of worker processes. 1 processes tiles in this process.
+    :return: list of filenames of the csv files that were saved (str)
+    """
+    confirmFCisPolyline(fc)
+    oids, centers, ends = _readFeatureSummary(fc, spatialRef)
+    uniqueKeys, tileOfFeature = partitionIntoTiles(centers, tileSize)
+    jobs = []
+    for tileIndex, tileKey in enumerate(uniqueKeys):
+        inTile = tileOfFeature == tileIndex
+        jobs.append(TileJob(fc, outputDir, tuple(tileKey), oids[inTile].tolist(),
+                            foreignEndsNear(ends, inTile), spatialRef))
+
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            # In tile order, so the stitched alignments do not depend on
+            # which worker finishes first.
+            results = list(pool.imap(_processTile, jobs))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_processTile(job) for job in jobs]
+
+    returnList = []
+    seamPieces = []
+    for result in results:
+        returnList.extend(result.outputFiles)
+        seamPieces.extend(result.seamPieces)
+
+    seedName = _tileSeedName(fc, 'seam')
+
+    def outputFileName(num):
+        return _generateOutputFileName(seedName, num, outputDir)
+
+    returnList.extend(stitchSeamPieces(seamPieces, outputFileName))
+    return returnList
+
+
+def _readFeatureSummary(fc, spatialRef):
+    """
+    Read only the OID, extent center and end points of every feature.
+    :return: tuple of arrays: oids (n), centers (n x 2), ends (n x 4 as
+            beginX, beginY, endX, endY)
+    """
+    oids = []
+    centers = []
+    ends = []
+    cursorSpatialRef, transformer = _cursorProjection(fc, spatialRef)
+    cursor = arcpy.da.SearchCursor(fc, ["OID@", "SHAPE@"],
+                                   spatial_reference=cursorSpatialRef)
+    try:
+        for oid, geom in cursor:
+            if geom is None:
+                continue
+            extent = geom.extent
+            oids.append(oid)
+            centers.append(((extent.XMin + extent.XMax) / 2.0,
+                            (extent.YMin + extent.YMax) / 2.0))
+            ends.append((geom.firstPoint.X, geom.firstPoint.Y,
+                         geom.lastPoint.X, geom.lastPoint.Y))
+    finally:
+        del cursor
+    centers = np.array(centers, dtype=float).reshape(-1, 2)
+    ends = np.array(ends, dtype=float).reshape(-1, 4)
+    if transformer is not None and len(oids):
+        # The reprojected center of the extent, near enough for tiling.
+        centers = np.column_stack(transformer.transform(centers[:, 0], centers[:, 1]))
+        ends = np.column_stack(transformer.transform(ends[:, 0], ends[:, 1]) +
+                               transformer.transform(ends[:, 2], ends[:, 3]))
+    return np.array(oids, dtype=np.int64), centers, ends
+
+
+def _processTile(job):
+    """
+    Read, assemble, analyze and write the alignments of a single tile.
+    Of the alignments which touch a feature of another tile, only the
+    interior is written, to a seam piece file; their end vertices are
+    returned so the parent can stitch them.
+    :param job: TileJob
+    :rtype: TileResult
+    """
+    segmentDeque = collections.deque()
+    oidField = arcpy.AddFieldDelimiters(job.fc, arcpy.Describe(job.fc).OIDFieldName)
+    for start in xrange(0, len(job.oids), _oidsPerQuery):
+        chunk = job.oids[start:start + _oidsPerQuery]
+        whereClause = '{0} IN ({1})'.format(oidField, ','.join(str(o) for o in chunk))
+        segmentDeque.extend(_breakPolylinesIntoSegments(job.fc,
+                                                        spatialRef=job.spatialRef,
+                                                        whereClause=whereClause))
+
+    seedName = _tileSeedName(job.fc, 't{0}_{1}'.format(*job.tileKey))
+    outputFiles = []
+
+    def writeAlignment(alignment):
+        outputFile = _generateOutputFileName(seedName, len(outputFiles), job.outputDir)
+        writeToCSV(alignment, outputFile)
+        outputFiles.append(outputFile)
+
+    seamFileStem = os.path.join(job.outputDir, '.seam_' + seedName)
+    seamPieces = analyzeTileSegments(segmentDeque, job.foreignEnds, writeAlignment,
+                                     seamFileStem)
+    return TileResult(outputFiles, seamPieces)
+
+
+def _tileSeedName(fc, suffix):
+    baseName = os.path.basename(fc)
+    if baseName.endswith('.shp'):
+        baseName = baseName[:-4]
+    return '{0}_{1}'.format(baseName, suffix)
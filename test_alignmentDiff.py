@@ -0,0 +1,113 @@
+from unittest import TestCase
+import math
+import os
+import shutil
+import tempfile
+
+from AlignmentDiff import matchVertices, spliceAnalysis, reusableVertices
+from CheckLayerWriter import alignmentSummary, csvAlignmentSummary
+from ExtendedPoint import ExtendedPoint
+from ExtendedPointList import ExtendedPointList
+
+
+def _coordinates(count=200):
+    return [(1000.0 + 300.0 * math.sin(i / 40.0), 2000.0 + 7.0 * i + 0.01 * i * i)
+            for i in range(count)]
+
+
+def _pointList(coordinates):
+    pointList = ExtendedPointList()
+    pointList.extend(ExtendedPoint(*xyz[:2], newZ=xyz[2] if len(xyz) > 2 else None)
+                     for xyz in coordinates)
+    return pointList
+
+
+class TestAlignmentDiff(TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def _checkSplice(self, oldCoordinates, newCoordinates):
+        previousCsv = os.path.join(self.tempDir, 'previous.csv')
+        oldList = _pointList(oldCoordinates)
+        oldList.computeAllPointInformation()
+        oldList.writeToCSV(previousCsv)
+
+        expectedCsv = os.path.join(self.tempDir, 'expected.csv')
+        newList = _pointList(newCoordinates)
+        newList.computeAllPointInformation()
+        newList.writeToCSV(expectedCsv)
+
+        outputCsv = os.path.join(self.tempDir, 'output.csv')
+        result = spliceAnalysis(_pointList(newCoordinates), previousCsv, outputCsv)
+        with open(expectedCsv) as f:
+            expected = f.read()
+        with open(outputCsv) as f:
+            self.assertEqual(expected, f.read())
+        return result
+
+    def test_editsInsertionsAndDeletions(self):
+        old = _coordinates()
+        new = list(old)
+        new[50] = (new[50][0] + 0.5, new[50][1])
+        new.insert(120, (new[119][0] + 1.0, new[119][1] + 3.5))
+        del new[170:173]
+        new[-2] = (new[-2][0], new[-2][1] + 0.25)
+        result = self._checkSplice(old, new)
+        self.assertEqual(len(new), result.vertexCount)
+        self.assertEqual([(49, 51), (119, 121), (169, 170), (195, 197)],
+                         result.changedRanges)
+        self.assertEqual(len(new) - 11, result.reusedCount)
+
+    def test_unchangedAndWithZ(self):
+        old = [(x, y, 0.01 * y) for x, y in _coordinates()]
+        result = self._checkSplice(old, old)
+        self.assertEqual([], result.changedRanges)
+        new = list(old)
+        new[10] = (new[10][0], new[10][1], new[10][2] + 1.0)
+        result = self._checkSplice(old, new)
+        self.assertEqual([(9, 11)], result.changedRanges)
+
+    def test_previousWithoutMatchingHeader(self):
+        old = _coordinates()
+        new = [(x, y, 1.0) for x, y in old]
+        result = self._checkSplice(old, new)
+        self.assertEqual(0, result.reusedCount)
+
+    def test_editNearTheStart(self):
+        old = _coordinates()
+        new = list(old)
+        new[3] = (new[3][0] + 0.5, new[3][1])
+        result = self._checkSplice(old, new)
+        self.assertEqual([(2, 4)], result.changedRanges)
+        self.assertEqual(len(new) - 3, result.reusedCount)
+
+    def test_checkLayerSummaryOfSplicedCsv(self):
+        old = _coordinates()
+        new = list(old)
+        new[100] = (new[100][0] + 40.0, new[100][1])
+        self._checkSplice(old, new)
+        spliced = _pointList(new)
+        spliceAnalysis(spliced, os.path.join(self.tempDir, 'previous.csv'),
+                       os.path.join(self.tempDir, 'output.csv'))
+        analyzed = _pointList(new)
+        analyzed.computeAllPointInformation()
+        expected = alignmentSummary(analyzed)
+        # The spliced points lack the arcs of the reused vertices.
+        self.assertLess(alignmentSummary(spliced).curvePointCount, expected.curvePointCount)
+        summary = csvAlignmentSummary(os.path.join(self.tempDir, 'output.csv'))
+        self.assertEqual(expected.pointCount, summary.pointCount)
+        self.assertEqual(expected.curvePointCount, summary.curvePointCount)
+        self.assertAlmostEqual(expected.length, summary.length, places=6)
+        self.assertAlmostEqual(expected.minRadius, summary.minRadius, places=6)
+        self.assertAlmostEqual(expected.maxDegree, summary.maxDegree, places=6)
+
+    def test_matchVertices(self):
+        old = ['v{0}'.format(i) for i in range(30)]
+        new = old[:10] + ['x'] + old[12:]
+        match = matchVertices(new, old, window=4)
+        self.assertEqual(list(range(10)) + [-1] + list(range(12, 30)), match)
+        self.assertEqual([False] * 3, reusableVertices([0, -1, 2], 3))
+        self.assertEqual([-1, -1], matchVertices(['a', 'b'], []))
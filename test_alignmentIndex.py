@@ -0,0 +1,59 @@
+from unittest import TestCase
+import math
+import numpy as np
+
+from ExtendedPoint import ExtendedPoint
+from ExtendedPointList import ExtendedPointList
+from AlignmentIndex import SegmentGridIndex, projectPoints
+
+
+def _makeAlignment(coordinates):
+    alignment = ExtendedPointList()
+    for x, y in coordinates:
+        alignment.append(ExtendedPoint(x, y))
+    alignment.computeAllPointInformation()
+    return alignment
+
+tangent = _makeAlignment([(0.0, 0.0), (100.0, 0.0), (200.0, 0.0), (300.0, 0.0)])
+curve = _makeAlignment([(500.0 + 200.0 * math.sin(a), 200.0 * math.cos(a))
+                        for a in np.linspace(-0.5, 0.5, 30)])
+
+
+class TestSegmentGridIndex(TestCase):
+    def test_project_stationAndOffsetOnTangent(self):
+        result = projectPoints([tangent], [150.0, 150.0], [10.0, -4.0])
+        self.assertEqual([0, 0], list(result.alignmentId))
+        self.assertAlmostEqual(150.0, result.station[0])
+        self.assertAlmostEqual(-10.0, result.offset[0])
+        self.assertAlmostEqual(4.0, result.offset[1])
+
+    def test_project_radiusOnCurve(self):
+        result = projectPoints([tangent, curve], [500.0], [190.0])
+        self.assertEqual(1, result.alignmentId[0])
+        self.assertAlmostEqual(200.0, result.radius[0], places=6)
+        self.assertAlmostEqual(10.0, result.offset[0], places=1)
+
+    def test_project_maxDistance(self):
+        result = projectPoints([tangent], [150.0], [50.0], maxDistance=20.0)
+        self.assertEqual(-1, result.alignmentId[0])
+        self.assertTrue(np.isnan(result.station[0]))
+
+    def test_project_matchesBruteForce(self):
+        rng = np.random.RandomState(7)
+        qx = rng.uniform(-200.0, 900.0, 500)
+        qy = rng.uniform(-300.0, 400.0, 500)
+        index = SegmentGridIndex([tangent, curve], cellSize=15.0)
+        result = index.project(qx, qy)
+
+        bruteForce = np.empty(len(qx))
+        for i in range(len(qx)):
+            best = np.inf
+            for alignment in (tangent, curve):
+                for a, b in zip(alignment[:-1], alignment[1:]):
+                    dx, dy = b.X - a.X, b.Y - a.Y
+                    t = ((qx[i] - a.X) * dx + (qy[i] - a.Y) * dy) / (dx * dx + dy * dy)
+                    t = min(max(t, 0.0), 1.0)
+                    best = min(best, math.hypot(qx[i] - a.X - t * dx,
+                                                qy[i] - a.Y - t * dy))
+            bruteForce[i] = best
+        np.testing.assert_allclose(result.distance, bruteForce, atol=1e-9)
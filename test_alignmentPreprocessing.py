@@ -0,0 +1,102 @@
+from unittest import TestCase
+import numpy as np
+
+from ExtendedPoint import ExtendedPoint
+from ExtendedPointList import ExtendedPointList
+from AlignmentPreprocessing import removeDuplicateVertices, simplifyVertices
+from AlignmentPreprocessing import resampleVertices, chainSourceIndices
+
+
+def _simplifyOneSpanAtATime(xs, ys, tolerance):
+    # Douglas-Peucker with an explicit stack, one span at a time.
+    keep = np.zeros(len(xs), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(xs) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = xs[end] - xs[start], ys[end] - ys[start]
+        vx, vy = xs[start + 1:end] - xs[start], ys[start + 1:end] - ys[start]
+        lengthSq = dx * dx + dy * dy
+        t = np.clip((vx * dx + vy * dy) / lengthSq, 0.0, 1.0) if lengthSq > 0.0 \
+            else np.zeros(len(vx))
+        distSq = (vx - t * dx) ** 2 + (vy - t * dy) ** 2
+        farthest = int(np.argmax(distSq))
+        if distSq[farthest] > tolerance * tolerance:
+            keep[start + 1 + farthest] = True
+            stack.extend([(start, start + 1 + farthest), (start + 1 + farthest, end)])
+    return np.nonzero(keep)[0]
+
+
+class TestAlignmentPreprocessing(TestCase):
+    def test_removeDuplicateVertices(self):
+        xs = np.array([0.0, 10.0, 10.001, 20.0, 20.0, 30.0])
+        ys = np.array([0.0, 0.0, 0.002, 0.0, 0.0, 0.0])
+        kept = removeDuplicateVertices(xs, ys)
+        self.assertEqual([0, 1, 3, 5], list(kept))
+
+    def test_simplifyVertices_thinsNoisyTangent(self):
+        xs = np.linspace(0.0, 100.0, 101)
+        ys = np.where(np.arange(101) % 2 == 0, 0.002, -0.002)
+        kept = simplifyVertices(xs, ys, 0.01)
+        self.assertEqual([0, 100], list(kept))
+
+    def test_simplifyVertices_keepsCurve(self):
+        angles = np.linspace(0.0, 1.0, 201)
+        xs = 100.0 * np.sin(angles)
+        ys = 100.0 * np.cos(angles)
+        kept = simplifyVertices(xs, ys, 0.01)
+        chords = np.hypot(np.diff(xs[kept]), np.diff(ys[kept]))
+        # Middle ordinate c^2 / 8R must stay within the tolerance
+        self.assertTrue(np.all(chords ** 2 / 800.0 <= 0.01 + 1e-9))
+        self.assertTrue(len(kept) < len(xs))
+
+    def test_simplifyVertices_matchesOneSpanAtATime(self):
+        rng = np.random.RandomState(3)
+        # Long enough for spans measured on their own and batched ones.
+        for count in (3, 50, 1000, 12000):
+            xs = np.cumsum(rng.rand(count) * 3.0)
+            ys = np.cumsum(rng.randn(count))
+            xs[count // 2] = xs[0]
+            ys[count // 2] = ys[0]
+            for tolerance in (0.1, 2.0):
+                self.assertEqual(_simplifyOneSpanAtATime(xs, ys, tolerance).tolist(),
+                                 simplifyVertices(xs, ys, tolerance).tolist())
+
+    def test_chainSourceIndices(self):
+        self.assertEqual([0, -1, 3, -1, 5],
+                         chainSourceIndices([0, 3, 5], [0, -1, 1, -1, 2]).tolist())
+        self.assertEqual([-1], chainSourceIndices([], [-1]).tolist())
+
+    def test_simplifyVertices_preserveDeflection(self):
+        xs = np.array([0.0, 50.0, 100.0, 150.0])
+        ys = np.array([0.0, 0.0, 0.005, 0.005])
+        self.assertEqual([0, 3], list(simplifyVertices(xs, ys, 0.01)))
+        kept = simplifyVertices(xs, ys, 0.01, preserveDeflection=1e-5)
+        self.assertEqual([0, 1, 2, 3], list(kept))
+
+    def test_extendedPointList_preprocess(self):
+        aList = ExtendedPointList()
+        for x, y in [(0, 0), (10, 0), (10, 0), (20, 0), (30, 5), (40, 20)]:
+            aList.append(ExtendedPoint(x, y))
+        indices = aList.preprocess(simplifyTolerance=0.01)
+        self.assertEqual([0, 3, 4, 5], list(indices))
+        self.assertEqual(4, len(aList))
+        self.assertEqual(20.0, aList[1].X)
+
+    def test_resampleVertices_uniformSpacing(self):
+        xs = np.array([0.0, 0.1, 0.2, 50.0, 250.0])
+        ys = np.zeros(5)
+        rx, ry, source = resampleVertices(xs, ys, 20.0)
+        self.assertEqual(0.0, rx[0])
+        self.assertEqual(250.0, rx[-1])
+        np.testing.assert_allclose(np.diff(rx[:-1]), 20.0)
+        self.assertEqual([0, 4], list(source[source >= 0]))
+
+    def test_resampleVertices_keepOriginalVertices(self):
+        xs = np.array([0.0, 45.0, 100.0])
+        ys = np.array([0.0, 0.0, 0.0])
+        rx, ry, source = resampleVertices(xs, ys, 20.0, keepOriginalVertices=True)
+        self.assertEqual([0.0, 20.0, 45.0, 60.0, 80.0, 100.0], list(rx))
+        self.assertEqual([0, -1, 1, -1, -1, 2], list(source))
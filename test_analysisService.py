@@ -0,0 +1,142 @@
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+import threading
+try:
+    from urllib2 import Request, urlopen, HTTPError
+except ImportError:
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+
+import AnalysisService
+from AnalysisService import AnalysisService as Service, AnalysisClient, \
+    AnalysisServiceError, QueueFullError
+from ArcKernel import compute_arc_arrays
+from ExtendedPointList import CreateExtendedPointList
+from Projection import Transformer, coordinateSystemFromEpsg
+
+
+class TestAnalysisService(TestCase):
+    def setUp(self):
+        self.service = Service(port=0, workers=2, maxQueued=4, token='secret').start()
+        self.client = AnalysisClient(port=self.service.port, token='secret')
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.service.stop()
+        shutil.rmtree(self.tempDir)
+
+    def test_coordinatesJob(self):
+        alignment = [(0.0, 0.0), (30.0, 4.0), (60.0, 16.0), (90.0, 40.0)]
+        result = self.client.analyzeCoordinates([alignment])
+        self.assertEqual(1, len(result))
+        expected = compute_arc_arrays([x for x, _ in alignment],
+                                      [y for _, y in alignment])
+        self.assertIsNone(result[0]['radius'][0])
+        for got, want in zip(result[0]['radius'][1:-1], expected.radius[1:-1]):
+            self.assertAlmostEqual(want, got)
+
+    def test_reprojectedJobs(self):
+        # Longitude and latitude, analyzed in NC State Plane feet.
+        alignment = [(-79.0, 35.0), (-78.999, 35.0002), (-78.998, 35.0006),
+                     (-78.997, 35.0012)]
+        stateFeet = coordinateSystemFromEpsg(2264)
+        xs, ys = Transformer(4269, stateFeet).transform([x for x, _ in alignment],
+                                                        [y for _, y in alignment])
+        expected = compute_arc_arrays(xs, ys)
+        result = self.client.analyzeCoordinates([alignment], sourceSystem=4269,
+                                                targetSystem=stateFeet)
+        for got, want in zip(result[0]['radius'][1:-1], expected.radius[1:-1]):
+            self.assertAlmostEqual(want, got, places=6)
+        self.assertRaises(AnalysisServiceError, self.client.analyzeCoordinates,
+                          [alignment], sourceSystem=4269)
+
+        inputPath = os.path.join(self.tempDir, 'road.csv')
+        with open(inputPath, 'w') as f:
+            f.write('X,Y\n')
+            for x, y in alignment:
+                f.write('{0!r},{1!r}\n'.format(x, y))
+        outDir = os.path.join(self.tempDir, 'out')
+        os.makedirs(outDir)
+        outputs = self.client.analyzeCsvFiles([inputPath], outDir, sourceSystem=4269,
+                                              targetSystem=2264)
+        points = CreateExtendedPointList(outputs[0])
+        # The csv keeps twelve significant digits.
+        self.assertAlmostEqual(xs[0], points[0].X, delta=1.0e-4)
+        self.assertAlmostEqual(ys[-1], points[-1].Y, delta=1.0e-4)
+
+    def test_featureClassSpatialRefKeepsBuiltInSystems(self):
+        # No arcpy is needed for a code of a built-in system, so the
+        # worker reprojects with a Transformer.
+        self.assertEqual(2264, AnalysisService._spatialReference(2264).factoryCode)
+        self.assertIsNone(AnalysisService._spatialReference(None))
+        self.assertEqual(2264, AnalysisService._epsgCode(coordinateSystemFromEpsg(2264)))
+        self.assertEqual(32119, AnalysisService._epsgCode(32119))
+
+    def test_csvFilesJobAndMetrics(self):
+        inputPath = os.path.join(self.tempDir, 'road.csv')
+        with open(inputPath, 'w') as f:
+            f.write('X,Y\n0,0\n30,4\n60,16\n90,40\n')
+        outDir = os.path.join(self.tempDir, 'out')
+        os.makedirs(outDir)
+        outputs = self.client.analyzeCsvFiles([inputPath], outDir)
+        self.assertEqual([os.path.join(outDir, 'road.csv')], outputs)
+        self.assertTrue(os.path.exists(outputs[0]))
+
+        self.assertRaises(AnalysisServiceError, self.client.analyzeCsvFiles,
+                          [os.path.join(self.tempDir, 'missing.csv')], outDir)
+        metrics = self.client.metrics()
+        self.assertEqual(2, metrics['submitted'])
+        self.assertEqual(1, metrics['completed'])
+        self.assertEqual(1, metrics['failed'])
+        self.assertEqual(2, metrics['byType']['csvFiles']['completed'] +
+                         metrics['byType']['csvFiles']['failed'])
+
+    def test_fullQueueRejects(self):
+        started = threading.Semaphore(0)
+        release = threading.Event()
+
+        def blockingJob(params):
+            started.release()
+            release.wait(10)
+        saved = AnalysisService.JOB_TYPES['coordinates']
+        AnalysisService.JOB_TYPES['coordinates'] = blockingJob
+        try:
+            # Both workers busy, then the queue holds maxQueued jobs.
+            for _ in range(2):
+                self.client.submit('coordinates', alignments=[])
+            for _ in range(2):
+                started.acquire()
+            for _ in range(4):
+                self.client.submit('coordinates', alignments=[])
+            self.assertRaises(QueueFullError, self.client.submit, 'coordinates',
+                              alignments=[])
+            self.assertEqual(1, self.client.metrics()['rejected'])
+            self.assertEqual(4, self.client.metrics()['queued'])
+        finally:
+            release.set()
+            AnalysisService.JOB_TYPES['coordinates'] = saved
+        self.assertRaises(AnalysisServiceError, self.client.submit, 'unknown')
+
+    def _post(self, headers, body=b'{"type": "coordinates", "alignments": []}'):
+        request = Request('http://127.0.0.1:{0}/jobs'.format(self.service.port),
+                          data=body, headers=headers)
+        try:
+            return urlopen(request).getcode()
+        except HTTPError as e:
+            return e.code
+
+    def test_refusesUnauthorizedRequests(self):
+        jsonHeaders = {'Content-Type': 'application/json'}
+        self.assertEqual(403, self._post(jsonHeaders))
+        self.assertEqual(403, self._post(dict(jsonHeaders, **{'X-Analysis-Token': 'wrong'})))
+        authorized = dict(jsonHeaders, **{'X-Analysis-Token': 'secret'})
+        self.assertEqual(403, self._post(dict(authorized, Origin='http://example.com')))
+        self.assertEqual(403, self._post(dict(authorized, Host='evil.example.com')))
+        self.assertEqual(415, self._post({'Content-Type': 'text/plain',
+                                          'X-Analysis-Token': 'secret'}))
+        self.assertEqual(202, self._post(authorized))
+        self.assertRaises(AnalysisServiceError,
+                          AnalysisClient(port=self.service.port, token='wrong').metrics)
+        self.assertEqual(1, self.client.metrics()['submitted'])
@@ -0,0 +1,110 @@
+from unittest import TestCase
+import math
+import os
+import numpy as np
+
+import ArcKernel
+from ArcKernel import arc_values, python_arc_values, compute_arc_arrays
+from ExtendedPoint import ExtendedPoint, compute_arc_parameters
+
+
+def _triplets():
+    randomState = np.random.RandomState(11)
+    for _ in range(300):
+        yield tuple(randomState.uniform(-1000.0, 1000.0, 6))
+    yield (0.0, 0.0, 10.0, 10.0, 20.0, 20.0)          # tangent
+    yield (-50.0, 10.0, 0.0, -100.0, 50.0, 10.0)      # radii cross due south
+    yield (2.0e6, 7.0e5, 2.0e6 + 30.0, 7.0e5 + 0.5, 2.0e6 + 60.0, 7.0e5 + 2.0)
+
+
+class TestArcKernel(TestCase):
+    def test_matchesComputeArcParameters(self):
+        for kernel in (python_arc_values, arc_values):
+            for x1, y1, x2, y2, x3, y3 in _triplets():
+                pt1 = ExtendedPoint(x1, y1)
+                pt2 = ExtendedPoint(x2, y2)
+                pt3 = ExtendedPoint(x3, y3)
+                compute_arc_parameters(pt1, pt2, pt3)
+                values = dict(zip(ArcKernel.ArcArrays._fields,
+                                  kernel(x1, y1, x2, y2, x3, y3)))
+                self.assertAlmostEqual(pt2.pt2pt.distanceBack, values['distanceBack'], places=9)
+                self.assertAlmostEqual(pt2.pt2pt.distanceAhead, values['distanceAhead'], places=9)
+                self.assertAlmostEqual(pt2.pt2pt.deflection, values['pointsDeflection'], places=12)
+                self.assertAlmostEqual((pt1 - pt3).azimuth, values['chordAzimuth'], places=12)
+                if math.isinf(pt2.arc.radius):
+                    self.assertTrue(math.isinf(values['radius']))
+                    self.assertEqual(0.0, values['degreeCurve'])
+                    continue
+                tolerance = 1e-7 * pt2.arc.radius
+                self.assertAlmostEqual(pt2.arc.radius, values['radius'], delta=tolerance)
+                self.assertAlmostEqual(pt2.arc.degreeCurve, values['degreeCurve'], places=12)
+                self.assertAlmostEqual(pt2.arc.deflection, values['arcDeflection'], places=9)
+                self.assertAlmostEqual(pt2.arc.lengthBack, values['lengthBack'], delta=tolerance)
+                self.assertAlmostEqual(pt2.arc.lengthAhead, values['lengthAhead'], delta=tolerance)
+                self.assertAlmostEqual(pt2.arc.curveCenter.X, values['centerX'], delta=tolerance)
+                self.assertAlmostEqual(pt2.arc.curveCenter.Y, values['centerY'], delta=tolerance)
+
+    def test_computeArcArraysMatchesScalarKernel(self):
+        xs = np.linspace(0.0, 3000.0, 200)
+        ys = 400.0 * np.sin(xs / 300.0)
+        arrays = compute_arc_arrays(xs, ys)
+        for i in range(1, len(xs) - 1):
+            expected = python_arc_values(xs[i - 1], ys[i - 1], xs[i], ys[i],
+                                         xs[i + 1], ys[i + 1])
+            np.testing.assert_allclose(expected, [column[i] for column in arrays],
+                                       rtol=1e-9, atol=1e-9)
+        self.assertTrue(all(np.isnan(column[0]) and np.isnan(column[-1])
+                            for column in arrays))
+
+
+class TestNumbaKernel(TestCase):
+    def setUp(self):
+        try:
+            import numba
+        except ImportError:
+            self.skipTest('numba is not installed')
+        if ArcKernel.ARC_KERNEL != 'numba':
+            self.skipTest('{0} selects the Python kernel'.format(ArcKernel.KERNEL_VARIABLE))
+
+    def test_compiledKernelsMatchPython(self):
+        for triplet in _triplets():
+            np.testing.assert_allclose(python_arc_values(*triplet), arc_values(*triplet),
+                                       rtol=1e-12, atol=1e-9)
+
+        # compute_arc_arrays runs the compiled _fill_arc_rows.
+        xs = np.linspace(0.0, 3000.0, 200)
+        ys = 400.0 * np.sin(xs / 300.0)
+        arrays = compute_arc_arrays(xs, ys)
+        for i in range(1, len(xs) - 1):
+            expected = python_arc_values(xs[i - 1], ys[i - 1], xs[i], ys[i],
+                                         xs[i + 1], ys[i + 1])
+            np.testing.assert_allclose(expected, [column[i] for column in arrays],
+                                       rtol=1e-12, atol=1e-9)
+
+
+class TestKernelSelection(TestCase):
+    def setUp(self):
+        self.saved = os.environ.get(ArcKernel.KERNEL_VARIABLE)
+
+    def tearDown(self):
+        if self.saved is None:
+            os.environ.pop(ArcKernel.KERNEL_VARIABLE, None)
+        else:
+            os.environ[ArcKernel.KERNEL_VARIABLE] = self.saved
+
+    def test_forcePython(self):
+        os.environ[ArcKernel.KERNEL_VARIABLE] = 'python'
+        self.assertEqual(('python', python_arc_values, None), ArcKernel._selectKernel())
+
+    def test_forceNumba(self):
+        os.environ[ArcKernel.KERNEL_VARIABLE] = 'numba'
+        try:
+            import numba
+        except ImportError:
+            self.assertRaises(ImportError, ArcKernel._selectKernel)
+        else:
+            self.assertEqual('numba', ArcKernel._selectKernel()[0])
+
+    def test_unknownKernel(self):
+        os.environ[ArcKernel.KERNEL_VARIABLE] = 'fortran'
+        self.assertRaises(ValueError, ArcKernel._selectKernel)
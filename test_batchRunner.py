@@ -0,0 +1,124 @@
+from unittest import TestCase
+import json
+import os
+import shutil
+import tempfile
+
+import BatchRunner
+from BatchRunner import runBatch, analyzeCsvFile, atomicOutput, Manifest, MANIFEST_NAME
+from BatchRunner import JOURNAL_SUFFIX, STATUS_DONE
+
+
+def _writePoints(fileName, coordinates):
+    with open(fileName, 'w') as f:
+        f.write('X,Y\n')
+        for x, y in coordinates:
+            f.write('{0},{1}\n'.format(x, y))
+
+
+class TestRunBatch(TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.inDir = os.path.join(self.tempDir, 'in')
+        self.outDir = os.path.join(self.tempDir, 'out')
+        os.makedirs(self.inDir)
+        self.inputs = []
+        for name, offset in (('a.csv', 0.0), ('b.csv', 50.0)):
+            fileName = os.path.join(self.inDir, name)
+            _writePoints(fileName, [(0, offset), (30, offset + 4),
+                                    (60, offset + 16), (90, offset + 40)])
+            self.inputs.append(fileName)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_resumesAfterFailure(self):
+        calls = []
+
+        def failOnB(inputPath, outDir):
+            calls.append(inputPath)
+            if inputPath.endswith('b.csv'):
+                raise RuntimeError('killed')
+            return analyzeCsvFile(inputPath, outDir)
+
+        counts = runBatch(self.inputs, self.outDir, failOnB)
+        self.assertEqual({'done': 1, 'skipped': 0, 'failed': 1}, counts)
+        self.assertEqual(self.inputs, calls)
+        self.assertFalse(os.path.exists(os.path.join(self.outDir, 'b.csv')))
+        with open(os.path.join(self.outDir, MANIFEST_NAME)) as f:
+            entries = json.load(f)['inputs']
+        self.assertEqual('done', entries[self.inputs[0]]['status'])
+        self.assertEqual('failed', entries[self.inputs[1]]['status'])
+        self.assertIn('killed', entries[self.inputs[1]]['error'])
+
+        del calls[:]
+
+        def recordCalls(inputPath, outDir):
+            calls.append(inputPath)
+            return analyzeCsvFile(inputPath, outDir)
+
+        counts = runBatch(self.inputs, self.outDir, recordCalls)
+        self.assertEqual({'done': 1, 'skipped': 1, 'failed': 0}, counts)
+        self.assertEqual(self.inputs[1:], calls)
+        self.assertTrue(os.path.exists(os.path.join(self.outDir, 'b.csv')))
+
+    def test_redoesChangedOutput(self):
+        runBatch(self.inputs, self.outDir, analyzeCsvFile)
+        with open(os.path.join(self.outDir, 'a.csv'), 'a') as f:
+            f.write('truncated,row\n')
+        counts = runBatch(self.inputs, self.outDir, analyzeCsvFile)
+        self.assertEqual({'done': 1, 'skipped': 1, 'failed': 0}, counts)
+
+    def test_unchangedOutputsAreNotChecksummed(self):
+        runBatch(self.inputs, self.outDir, analyzeCsvFile)
+        checksummed = []
+        fileChecksum = BatchRunner.fileChecksum
+
+        def countingChecksum(fileName, *args):
+            checksummed.append(fileName)
+            return fileChecksum(fileName, *args)
+
+        BatchRunner.fileChecksum = countingChecksum
+        try:
+            counts = runBatch(self.inputs, self.outDir, analyzeCsvFile)
+            self.assertEqual({'done': 0, 'skipped': 2, 'failed': 0}, counts)
+            self.assertEqual([], checksummed)
+
+            # Same size, other time: checksummed, and found unchanged.
+            outputFile = os.path.join(self.outDir, 'a.csv')
+            os.utime(outputFile, (0, 0))
+            counts = runBatch(self.inputs, self.outDir, analyzeCsvFile)
+            self.assertEqual({'done': 0, 'skipped': 2, 'failed': 0}, counts)
+            self.assertEqual([outputFile], checksummed)
+        finally:
+            BatchRunner.fileChecksum = fileChecksum
+
+    def test_journalIsReplayed(self):
+        manifestFile = os.path.join(self.tempDir, MANIFEST_NAME)
+        manifest = Manifest(manifestFile)
+        manifest.record(self.inputs[0], STATUS_DONE)
+        manifest.record(self.inputs[1], STATUS_DONE)
+        self.assertFalse(os.path.exists(manifestFile))
+        # A crash while appending leaves a partial last line.
+        with open(manifestFile + JOURNAL_SUFFIX, 'a') as f:
+            f.write('["{0}", {{"status"'.format(self.inputs[0]))
+        self.assertTrue(Manifest(manifestFile).isComplete(self.inputs[1]))
+
+        manifest.save()
+        self.assertFalse(os.path.exists(manifestFile + JOURNAL_SUFFIX))
+        self.assertEqual(sorted(self.inputs), sorted(Manifest(manifestFile).entries))
+
+    def test_atomicOutputLeavesTargetOnFailure(self):
+        target = os.path.join(self.tempDir, 'target.txt')
+        with open(target, 'w') as f:
+            f.write('old')
+        try:
+            with atomicOutput(target) as tempName:
+                with open(tempName, 'w') as f:
+                    f.write('partial')
+                raise RuntimeError('interrupted')
+        except RuntimeError:
+            pass
+        with open(target) as f:
+            self.assertEqual('old', f.read())
+        self.assertEqual(['in', 'target.txt'], sorted(os.listdir(self.tempDir)))
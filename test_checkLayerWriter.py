@@ -0,0 +1,83 @@
+from unittest import TestCase
+import os
+import shutil
+import struct
+import tempfile
+
+from ExtendedPoint import ExtendedPoint
+from ExtendedPointList import ExtendedPointList
+from CheckLayerWriter import writePolylineShapefile, PolylineShapefileWriter
+
+
+def _makeAlignment(coordinates):
+    alignment = ExtendedPointList()
+    for x, y in coordinates:
+        alignment.append(ExtendedPoint(x, y))
+    alignment.computeAllPointInformation()
+    return alignment
+
+
+class TestWritePolylineShapefile(TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_writePolylineShapefile(self):
+        alignments = [_makeAlignment([(0, 0), (10, 0), (20, 0)]),
+                      _makeAlignment([(0, 100), (30, 96), (60, 84), (90, 60)])]
+        fileName = os.path.join(self.tempDir, 'roads_check.shp')
+        writePolylineShapefile(fileName, alignments, names=['roads', 'roads1'],
+                               projectionWkt='PROJCS["x"]')
+
+        with open(fileName, 'rb') as shp:
+            data = shp.read()
+        fileCode, = struct.unpack('>i', data[0:4])
+        fileLength, = struct.unpack('>i', data[24:28])
+        shapeType, = struct.unpack('<i', data[32:36])
+        box = struct.unpack('<4d', data[36:68])
+        self.assertEqual(9994, fileCode)
+        self.assertEqual(len(data), 2 * fileLength)
+        self.assertEqual(3, shapeType)
+        self.assertEqual((0.0, 0.0, 90.0, 100.0), box)
+
+        # Second record: 4 points, the last one is (90, 60)
+        contentLength, = struct.unpack('>i', data[100 + 4:100 + 8])
+        second = 100 + 8 + 2 * contentLength
+        numParts, numPoints = struct.unpack('<2i', data[second + 8 + 36:second + 8 + 44])
+        self.assertEqual((1, 4), (numParts, numPoints))
+        self.assertEqual((90.0, 60.0), struct.unpack('<2d', data[-16:]))
+
+        with open(fileName[:-4] + '.shx', 'rb') as shx:
+            self.assertEqual(100 + 16, len(shx.read()))
+        with open(fileName[:-4] + '.dbf', 'rb') as dbf:
+            table = dbf.read()
+        recordCount, headerLength, recordLength = struct.unpack('<IHH', table[4:12])
+        self.assertEqual(2, recordCount)
+        self.assertEqual(headerLength + 2 * recordLength + 1, len(table))
+        firstRecord = table[headerLength:headerLength + recordLength]
+        self.assertTrue(firstRecord[1:6] == b'roads')
+        self.assertTrue(os.path.exists(fileName[:-4] + '.prj'))
+
+    def test_writerWritesAsAlignmentsAreAdded(self):
+        alignments = [_makeAlignment([(0, 0), (10, 0), (20, 0)]),
+                      _makeAlignment([(0, 100), (30, 96), (60, 84), (90, 60)])]
+        whole = os.path.join(self.tempDir, 'whole.shp')
+        writePolylineShapefile(whole, alignments, names=['a', 'b'])
+
+        streamed = os.path.join(self.tempDir, 'streamed.shp')
+        writer = PolylineShapefileWriter(streamed)
+        for alignment, name in zip(alignments, ['a', 'b']):
+            writer.add(alignment, name=name)
+        writer.close()
+        for extension in ('.shp', '.shx', '.dbf'):
+            with open(whole[:-4] + extension, 'rb') as f:
+                expected = f.read()
+            with open(streamed[:-4] + extension, 'rb') as f:
+                self.assertEqual(expected, f.read())
+
+        empty = os.path.join(self.tempDir, 'empty.shp')
+        with PolylineShapefileWriter(empty):
+            pass
+        self.assertEqual(100, os.path.getsize(empty))
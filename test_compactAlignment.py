@@ -0,0 +1,57 @@
+from unittest import TestCase
+import os
+import numpy as np
+
+import CsvCache
+from ArcKernel import compute_arc_arrays
+from CompactAlignment import CompactAlignment, tileOrigin
+
+_testCsv = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'TestFiles', 'CSV', 'Y15A_GIS.csv')
+
+
+class TestCompactAlignment(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        header, values = CsvCache.parseCsvColumns(_testCsv)
+        cls.xs = values[:, header.index('X')]
+        cls.ys = values[:, header.index('Y')]
+
+    def test_errorWithinBound(self):
+        compact = CompactAlignment(self.xs, self.ys)
+        self.assertEqual(np.float32, compact.offsets.dtype)
+        self.assertEqual(len(self.xs) * 8, compact.nbytes)
+        restoredX, restoredY = compact.absoluteCoordinates()
+        error = max(np.abs(restoredX - self.xs).max(), np.abs(restoredY - self.ys).max())
+        self.assertLessEqual(error, compact.errorBound)
+        self.assertLess(compact.errorBound, 1.0e-3)
+        # Absolute float32 coordinates would be off by up to 0.125 ft.
+        self.assertGreater(np.abs(self.xs.astype(np.float32) - self.xs).max(), 0.01)
+
+    def test_analysisMatchesFloat64(self):
+        compact = CompactAlignment(self.xs, self.ys)
+        arcs, vertical = compact.analyze()
+        self.assertIsNone(vertical)
+        expected = compute_arc_arrays(self.xs, self.ys)
+        curved = np.nan_to_num(expected.radius) < 5000.0
+        curved[[0, -1]] = False
+        self.assertTrue(curved.any())
+        np.testing.assert_allclose(arcs.radius[curved], expected.radius[curved], rtol=1.0e-3)
+        np.testing.assert_allclose(arcs.centerX[curved], expected.centerX[curved], atol=0.5)
+
+        pointList = compact.toAnalyzedPointList()
+        restoredX = compact.absoluteCoordinates()[0]
+        self.assertEqual(restoredX.tolist(), [point.X for point in pointList])
+        for i in np.flatnonzero(curved)[:5]:
+            self.assertAlmostEqual(arcs.radius[i], pointList[i].arc.radius, delta=1.0e-6)
+            self.assertAlmostEqual(arcs.centerX[i], pointList[i].arc.curveCenter.X, delta=1.0e-6)
+
+    def test_tileOriginAndMaxError(self):
+        origin = tileOrigin(self.xs[0], self.ys[0], 10000.0)
+        self.assertEqual((2150000.0, 730000.0), origin)
+        compact = CompactAlignment(self.xs, self.ys, zs=np.full(len(self.xs), 250.0),
+                                   origin=origin, maxError=0.01)
+        self.assertTrue(compact.hasZ)
+        self.assertEqual(250.0, compact.origin[2])
+        self.assertRaises(ValueError, CompactAlignment, self.xs, self.ys,
+                          origin=(0.0, 0.0), maxError=0.01)
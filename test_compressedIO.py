@@ -0,0 +1,48 @@
+from unittest import TestCase
+import gzip
+import os
+import shutil
+import tempfile
+
+from ExtendedPoint import ExtendedPoint
+from ExtendedPointList import ExtendedPointList, CreateExtendedPointList
+from CompressedIO import compressionFor, openForRead, openForWrite
+
+
+class TestCompressedIO(TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_compressionFor(self):
+        self.assertEqual('gzip', compressionFor('Y15A.csv.gz'))
+        self.assertEqual('bz2', compressionFor(r'D:\out\Y15A.CSV.BZ2'))
+        self.assertIsNone(compressionFor('Y15A.csv'))
+
+    def test_roundTrip(self):
+        lines = ['{0},{1}\n'.format(i, i * 0.5) for i in range(5000)]
+        for name in ('plain.csv', 'a.csv.gz', 'b.csv.bz2'):
+            for background in (False, True):
+                fileName = os.path.join(self.tempDir, name)
+                with openForWrite(fileName, bufferSize=1000,
+                                  background=background) as f:
+                    f.writelines(lines)
+                with openForRead(fileName) as f:
+                    self.assertEqual(lines, list(f))
+        with open(os.path.join(self.tempDir, 'a.csv.gz'), 'rb') as f:
+            self.assertEqual(b'\x1f\x8b', f.read(2))
+
+    def test_pointListRoundTrip(self):
+        aPointList = ExtendedPointList()
+        for x, y in [(0, 0), (30, 4), (60, 16), (90, 40)]:
+            aPointList.append(ExtendedPoint(x, y))
+        aPointList.computeAllPointInformation()
+        fileName = os.path.join(self.tempDir, 'points.csv.gz')
+        aPointList.writeToCSV(fileName, compressLevel=1, background=True)
+        with gzip.open(fileName) as f:
+            self.assertEqual(5, len(f.read().splitlines()))
+        readBack = CreateExtendedPointList(fileName)
+        self.assertEqual([(p.X, p.Y) for p in aPointList],
+                         [(p.X, p.Y) for p in readBack])
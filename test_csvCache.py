@@ -0,0 +1,105 @@
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+import CsvCache
+from CsvCache import loadCsvColumns, parseCsvColumns, trimCache
+from ExtendedPointList import CreateExtendedPointList
+
+
+class TestCsvCache(TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.cacheDir = os.path.join(self.tempDir, 'cache')
+        self.savedVariable = os.environ.get(CsvCache.CACHE_DIR_VARIABLE)
+        os.environ[CsvCache.CACHE_DIR_VARIABLE] = self.cacheDir
+        self.csvFile = os.path.join(self.tempDir, 'points.csv')
+        self._writeCsv(['X,Y,Degree,ArcLengthBack',
+                        '1.5,2.5,,',
+                        '3.0,4.0,-1.25,False',
+                        '5.0,6.0'])
+
+    def tearDown(self):
+        if self.savedVariable is None:
+            os.environ.pop(CsvCache.CACHE_DIR_VARIABLE, None)
+        else:
+            os.environ[CsvCache.CACHE_DIR_VARIABLE] = self.savedVariable
+        shutil.rmtree(self.tempDir)
+
+    def _writeCsv(self, lines):
+        with open(self.csvFile, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def test_parseCsvColumns(self):
+        header, values = parseCsvColumns(self.csvFile)
+        self.assertEqual(['X', 'Y', 'Degree', 'ArcLengthBack'], header)
+        expected = [[1.5, 2.5, np.nan, np.nan],
+                    [3.0, 4.0, -1.25, 0.0],
+                    [5.0, 6.0, np.nan, np.nan]]
+        np.testing.assert_array_equal(expected, values)
+
+    def test_quotedFields(self):
+        self._writeCsv(['Name,X,"Y"', '"Main St, North",1.0,2.0',
+                        '"Elm\nSt",3.0,"4.0"', '5.0,6.0'])
+        header, values = parseCsvColumns(self.csvFile, chunkRows=1)
+        self.assertEqual(['Name', 'X', 'Y'], header)
+        expected = [[np.nan, 1.0, 2.0],
+                    [np.nan, 3.0, 4.0],
+                    [5.0, 6.0, np.nan]]
+        np.testing.assert_array_equal(expected, values)
+
+        self._writeCsv(['Name,X,Y', '"Main St, North",1.0,2.0'])
+        self.assertEqual([(1.0, 2.0)],
+                         [(p.X, p.Y) for p in CreateExtendedPointList(self.csvFile)])
+
+    def test_cachedAndInvalidated(self):
+        header, values = loadCsvColumns(self.csvFile)
+        self.assertNotIsInstance(values, np.memmap)
+        header, cached = loadCsvColumns(self.csvFile)
+        self.assertIsInstance(cached, np.memmap)
+        np.testing.assert_array_equal(values, cached)
+        del cached
+
+        self._writeCsv(['X,Y', '7.0,8.0', '9.0,10.0'])
+        os.utime(self.csvFile, (time.time() + 10, time.time() + 10))
+        header, values = loadCsvColumns(self.csvFile)
+        self.assertEqual(['X', 'Y'], header)
+        self.assertEqual([(7.0, 8.0), (9.0, 10.0)],
+                         [(p.X, p.Y) for p in CreateExtendedPointList(self.csvFile)])
+
+    def test_trimCache(self):
+        csvFiles = []
+        for index in range(3):
+            csvFile = os.path.join(self.tempDir, 'file{0}.csv'.format(index))
+            with open(csvFile, 'w') as f:
+                f.write('X,Y\n' + '1.0,2.0\n' * 100)
+            loadCsvColumns(csvFile)
+            csvFiles.append(csvFile)
+        entries = sorted(os.listdir(self.cacheDir))
+        self.assertEqual(6, len(entries))
+        oldest = os.path.join(self.cacheDir, CsvCache._entryPaths('', csvFiles[0])[0])
+        os.utime(oldest, (1, 1))
+        entrySize = sum(os.path.getsize(os.path.join(self.cacheDir, e))
+                        for e in entries) // 3
+        trimCache(self.cacheDir, 2 * entrySize + 10)
+        self.assertEqual(4, len(os.listdir(self.cacheDir)))
+        self.assertFalse(os.path.exists(oldest))
+
+    def test_offByDefaultAndChunked(self):
+        del os.environ[CsvCache.CACHE_DIR_VARIABLE]
+        self.assertIsNone(CsvCache.cacheDirectory())
+        loadCsvColumns(self.csvFile)
+        header, values = loadCsvColumns(self.csvFile)
+        self.assertNotIsInstance(values, np.memmap)
+        self.assertFalse(os.path.exists(self.cacheDir))
+
+        wholeHeader, whole = parseCsvColumns(self.csvFile)
+        header, chunked = parseCsvColumns(self.csvFile, chunkRows=2)
+        self.assertEqual(wholeHeader, header)
+        np.testing.assert_array_equal(whole, chunked)
+        self._writeCsv(['X,Y', '1,2', '3,4', '5,6,7'])
+        self.assertRaisesRegexp(ValueError, 'row 4', parseCsvColumns, self.csvFile,
+                                chunkRows=2)
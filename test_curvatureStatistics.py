@@ -0,0 +1,96 @@
+from unittest import TestCase
+import math
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from ArcKernel import compute_arc_arrays
+from ExtendedPoint import ExtendedPoint
+from ExtendedPointList import ExtendedPointList
+from CurvatureStatistics import LogHistogram, QuantileSketch, CurvatureSummary
+from CurvatureStatistics import writeStatistics, mergeStatisticsFiles
+
+
+class TestQuantileSketch(TestCase):
+    def test_relativeAccuracy(self):
+        values = np.random.RandomState(7).lognormal(6.0, 1.5, 20000)
+        values[::3] *= -1.0
+        sketch = QuantileSketch(relativeAccuracy=0.01)
+        sketch.addArray(values)
+        for q in (0.01, 0.25, 0.5, 0.9, 0.99):
+            expected = np.percentile(values, q * 100.0, interpolation='lower')
+            self.assertLessEqual(math.fabs(sketch.quantile(q) - expected),
+                                 0.0101 * math.fabs(expected))
+
+    def test_mergeEqualsCombined(self):
+        values = np.random.RandomState(3).uniform(-500.0, 500.0, 5000)
+        combined = QuantileSketch()
+        combined.addArray(values)
+        first = QuantileSketch()
+        first.addArray(values[:1234])
+        second = QuantileSketch()
+        second.addArray(values[1234:])
+        first.merge(second)
+        self.assertEqual(combined.toDict(), first.toDict())
+        restored = QuantileSketch.fromDict(first.toDict())
+        self.assertEqual(combined.quantile(0.5), restored.quantile(0.5))
+
+    def test_maxBins(self):
+        sketch = QuantileSketch(maxBins=50)
+        sketch.addArray(10.0 ** np.linspace(-3, 7, 1000))
+        self.assertEqual(50, len(sketch.positive))
+        self.assertEqual(1000, sketch.count)
+
+
+class TestLogHistogram(TestCase):
+    def test_bins(self):
+        histogram = LogHistogram(lowExponent=0, highExponent=2, binsPerDecade=1)
+        histogram.addArray([0.0, 0.5, 1.0, 9.9, -10.0, 99.0, 100.0, np.inf])
+        self.assertEqual([2, 2], histogram.counts.tolist())
+        self.assertEqual((1, 1, 1), (histogram.zeroCount, histogram.underflowCount,
+                                     histogram.overflowCount))
+
+
+class TestCurvatureSummary(TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        angles = [i * 0.02 for i in range(50)]
+        self.coordinates = [(300.0 * math.sin(a), 300.0 * math.cos(a)) for a in angles] + \
+            [(300.0 * math.sin(0.98) + 20.0 * i, 300.0 * math.cos(0.98)) for i in range(1, 10)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_pointListMatchesArcArrays(self):
+        aPointList = ExtendedPointList()
+        for x, y in self.coordinates:
+            aPointList.append(ExtendedPoint(x, y))
+        aPointList.computeAllPointInformation()
+        fromPoints = CurvatureSummary()
+        fromPoints.addPointList(aPointList)
+        xs, ys = zip(*self.coordinates)
+        fromArrays = CurvatureSummary()
+        fromArrays.addArcArrays(compute_arc_arrays(xs, ys))
+        self.assertEqual(len(self.coordinates) - 2, fromPoints.vertexCount)
+        self.assertEqual(fromPoints.vertexCount, fromArrays.vertexCount)
+        self.assertEqual(fromPoints.curveCount, fromArrays.curveCount)
+        for quantity in ('radius', 'degree', 'deflection', 'arcLength'):
+            self.assertAlmostEqual(fromPoints.percentile(quantity, 50),
+                                   fromArrays.percentile(quantity, 50))
+        self.assertLessEqual(math.fabs(fromPoints.percentile('radius', 10) - 300.0), 3.0)
+
+    def test_mergeFiles(self):
+        xs, ys = zip(*self.coordinates)
+        summaries = []
+        for index in range(2):
+            summary = CurvatureSummary()
+            summary.addArcArrays(compute_arc_arrays(xs, ys))
+            summaries.append(summary)
+            writeStatistics(os.path.join(self.tempDir, 'part{0}.json'.format(index)),
+                            summary, {'road': summary})
+        total, parts = mergeStatisticsFiles(
+            [os.path.join(self.tempDir, 'part{0}.json'.format(index)) for index in range(2)])
+        self.assertEqual(2 * summaries[0].vertexCount, total.vertexCount)
+        self.assertEqual(['road'], list(parts))
+        self.assertEqual(total.toDict(), parts['road'].toDict())
@@ -0,0 +1,64 @@
+from unittest import TestCase
+import math
+
+from ExtendedPoint import ExtendedPoint, compute_arc_parameters, getAzimuth
+from ExtendedPoint import normalizeDeflection
+
+
+def _unwrappedNormalizeDeflection(defl):
+    # normalizeDeflection before it wrapped into -pi..pi: values up to
+    # +/-2pi were returned unchanged.
+    if defl < -2.0 * math.pi:
+        return defl + 2.0 * math.pi
+    if defl > 2.0 * math.pi:
+        return defl - 2.0 * math.pi
+    return defl
+
+
+def _onCircle(radius, azimuthDegrees):
+    azimuth = math.radians(azimuthDegrees)
+    return ExtendedPoint(radius * math.sin(azimuth), radius * math.cos(azimuth))
+
+
+class TestDeflectionNormalization(TestCase):
+    """
+    normalizeDeflection wraps into -pi..pi, which changed csv values of the
+    cases below; the old values are computed alongside for comparison.
+    """
+    def test_normalizeDeflection(self):
+        self.assertAlmostEqual(math.radians(2.0), normalizeDeflection(math.radians(-358.0)))
+        self.assertAlmostEqual(math.radians(-10.0), normalizeDeflection(math.radians(350.0)))
+        self.assertAlmostEqual(math.radians(30.0), normalizeDeflection(math.radians(30.0)))
+        self.assertAlmostEqual(math.radians(-358.0),
+                               _unwrappedNormalizeDeflection(math.radians(-358.0)))
+
+    def test_southboundChordsTurningRight(self):
+        # Heading just east of due south, then just west of it: a right turn
+        # of 2 degrees across the -pi/pi seam of atan2.
+        p1 = ExtendedPoint(0.0, 0.0)
+        p2 = _onCircle(10.0, 179.0)
+        p3 = p2 + _onCircle(10.0, -179.0)
+        compute_arc_parameters(p1, p2, p3)
+        oldDeflection = _unwrappedNormalizeDeflection(getAzimuth(p2, p3) - getAzimuth(p1, p2))
+
+        # PointsDefl column: was -358 degrees, is 2 degrees.
+        self.assertAlmostEqual(-358.0, math.degrees(oldDeflection), places=9)
+        self.assertAlmostEqual(2.0, math.degrees(p2.pt2pt.deflection), places=9)
+        # Degree column: the sign follows the deflection, so the curve was
+        # reported as turning left.
+        self.assertGreater(p2.arc.degreeCurve100, 0.0)
+        self.assertLess(math.copysign(1.0, oldDeflection), 0.0)
+
+    def test_radiusVectorsCrossingDueSouth(self):
+        p1 = _onCircle(100.0, 170.0)
+        p2 = _onCircle(100.0, 181.0)
+        p3 = _onCircle(100.0, 190.0)
+        compute_arc_parameters(p1, p2, p3)
+        p2Vector = p2.arc.curveCenter - p2
+        oldDefl12 = p2Vector.azimuth - p2.arc.radiusStartVector.azimuth
+        oldLengthBack = oldDefl12 * p2.arc.radiusStartVector.magnitude
+
+        # ArcLengthBack column: was -609.12, is 19.20 (11 degrees of arc).
+        self.assertAlmostEqual(-609.119908946, oldLengthBack, places=6)
+        self.assertAlmostEqual(100.0 * math.radians(11.0), p2.arc.lengthBack, places=6)
+        self.assertAlmostEqual(100.0 * math.radians(9.0), p2.arc.lengthAhead, places=6)
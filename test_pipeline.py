@@ -0,0 +1,63 @@
+from unittest import TestCase
+import threading
+
+from Pipeline import Pipeline, PipelineCancelled
+
+
+def double(items):
+    for item in items:
+        yield item * 2
+
+
+def total(items):
+    yield sum(items)
+
+
+class TestPipeline(TestCase):
+    def test_stagesInOrder(self):
+        self.assertEqual([2 * i for i in range(100)],
+                         list(Pipeline(range(100), [double], maxPending=2)))
+        self.assertEqual([9900], list(Pipeline(range(100), [double, total])))
+
+    def test_backpressure(self):
+        produced = []
+
+        def source():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        pipeline = iter(Pipeline(source(), [double], maxPending=2))
+        next(pipeline)
+        consumed = 1
+        for _ in range(20):
+            # Source is at most two queues of maxPending plus one item in
+            # hand per thread ahead of the consumer.
+            self.assertLessEqual(len(produced), consumed + 2 * 2 + 3)
+            next(pipeline)
+            consumed += 1
+        pipeline.close()
+
+    def test_errorPropagates(self):
+        def failing(items):
+            for item in items:
+                if item == 50:
+                    raise ValueError('bad item')
+                yield item
+
+        before = threading.active_count()
+        pipeline = Pipeline(range(10000), [failing, double])
+        with self.assertRaises(ValueError):
+            list(pipeline)
+        self.assertEqual('failing', pipeline.failedStage)
+        self.assertEqual(before, threading.active_count())
+
+    def test_cancel(self):
+        pipeline = Pipeline(iter(int, 1), [double], pollInterval=0.01)
+        received = []
+        with self.assertRaises(PipelineCancelled):
+            for item in pipeline:
+                received.append(item)
+                if len(received) == 10:
+                    pipeline.cancel()
+        self.assertEqual(10, len(received))
@@ -0,0 +1,92 @@
+from unittest import TestCase
+import csv
+import math
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from ExtendedPoint import ExtendedPoint
+from ExtendedPointList import ExtendedPointList
+from PlotDcFromCsv import plotCSVfile, loadDcProfile, downsampleLTTB
+from PlotDcFromCsv import renderDcProfiles, computeHalfArcLength, _imageFileNames
+
+
+def _referenceProfile(filename):
+    # The row by row csv.reader loop plotCSVfile was written as.
+    x = []
+    y = []
+    with open(filename) as csvfile:
+        plots = list(csv.reader(csvfile, delimiter=','))
+    headerRow = plots[0]
+    degreeIndex = headerRow.index("Degree")
+    distBackIndex = headerRow.index("ArcLengthBack")
+    distAheadIndex = headerRow.index("ArcLengthAhead")
+    cumulative_dist = 0.0
+    for idx, row in enumerate(plots[2:-2]):
+        distBack, distAhead = computeHalfArcLength(plots, idx + 2, distBackIndex, distAheadIndex)
+        cumulative_dist += distBack
+        x.append(cumulative_dist)
+        cumulative_dist += distAhead
+        y.append(float(row[degreeIndex]))
+    y.append(float(plots[-2][degreeIndex]))
+    cumulative_dist += float(row[distBackIndex])
+    x.append(cumulative_dist)
+    return x, y
+
+
+class TestPlotDcFromCsv(TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.csvFile = os.path.join(self.tempDir, 'profile.csv')
+        aPointList = ExtendedPointList()
+        for i in range(80):
+            angle = 0.01 * i + 0.0002 * i * i
+            aPointList.append(ExtendedPoint(500.0 * math.sin(angle) + 3.0 * i,
+                                            500.0 * math.cos(angle)))
+        aPointList.computeAllPointInformation()
+        aPointList.writeToCSV(self.csvFile)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_loadDcProfileMatchesPlotCSVfile(self):
+        expectedX, expectedY = _referenceProfile(self.csvFile)
+        x, y = loadDcProfile(self.csvFile)
+        self.assertEqual(len(expectedX), len(x))
+        np.testing.assert_allclose(expectedX, x, rtol=1e-12)
+        np.testing.assert_allclose(expectedY, y, rtol=1e-12)
+        plotX, plotY = plotCSVfile(self.csvFile)
+        self.assertEqual(x.tolist(), plotX)
+        self.assertEqual(y.tolist(), plotY)
+
+    def test_downsampleLTTB(self):
+        x = np.arange(10000, dtype=float)
+        y = np.sin(x / 300.0)
+        y[4321] = 25.0
+        sampledX, sampledY = downsampleLTTB(x, y, 500)
+        self.assertEqual(500, len(sampledX))
+        self.assertEqual((0.0, 9999.0), (sampledX[0], sampledX[-1]))
+        self.assertTrue(np.all(np.diff(sampledX) > 0))
+        self.assertIn(25.0, sampledY)
+
+    def test_renderDcProfiles(self):
+        outputDir = os.path.join(self.tempDir, 'images')
+        images = renderDcProfiles([self.csvFile], outputDir, processes=1,
+                                  width=400, height=200)
+        self.assertEqual([os.path.join(outputDir, 'profile.png')], images)
+        with open(images[0], 'rb') as f:
+            self.assertEqual(b'\x89PNG', f.read(4))
+
+    def test_imageNamesAreDistinct(self):
+        outputDir = os.path.join(self.tempDir, 'images')
+        self.assertEqual([os.path.join(outputDir, 'a.b.png'),
+                          os.path.join(outputDir, 'a.c.png'),
+                          os.path.join(outputDir, 'road.png')],
+                         _imageFileNames(['a.b.csv', 'a.c.csv.gz',
+                                          os.path.join('x', 'road.csv.bz2')],
+                                         outputDir, 'png'))
+        self.assertRaises(ValueError, renderDcProfiles,
+                          [os.path.join('x', 'road.csv'), os.path.join('y', 'road.csv')],
+                          outputDir, processes=1)
+        self.assertFalse(os.path.exists(outputDir))
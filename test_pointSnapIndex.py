@@ -0,0 +1,98 @@
+from unittest import TestCase
+import collections
+import random
+import numpy as np
+
+import ExtendedPoint as ExtendedPointModule
+from ExtendedPoint import ExtendedPoint, getEqualityTolerance, setEqualityTolerance
+from PointSnapIndex import PointSnapIndex, SegmentChainer, chainSegments
+from AlignmentPreprocessing import removeDuplicateVertices
+
+
+class TestPointSnapIndex(TestCase):
+    def test_findAcrossCellBoundary(self):
+        index = PointSnapIndex(tolerance=0.01)
+        index.insert(ExtendedPoint(0.0099, 5.0), 'a')
+        self.assertEqual('a', index.find(ExtendedPoint(0.0101, 4.995)))
+        self.assertIsNone(index.find(ExtendedPoint(0.0201, 5.0)))
+        index.insert(ExtendedPoint(0.0150, 5.0), 'b')
+        self.assertEqual('b', index.find(ExtendedPoint(0.0140, 5.0)))
+        self.assertEqual(['a', 'b'], index.findAll(ExtendedPoint(0.0120, 5.0)))
+
+    def test_uniqueMatchesLinearScan(self):
+        randomGenerator = random.Random(5)
+        points = []
+        for _ in range(400):
+            x = randomGenerator.uniform(0.0, 2.0)
+            y = randomGenerator.uniform(0.0, 2.0)
+            for _ in range(randomGenerator.randint(1, 3)):
+                points.append(ExtendedPoint(x + randomGenerator.uniform(-0.004, 0.004),
+                                            y + randomGenerator.uniform(-0.004, 0.004)))
+        randomGenerator.shuffle(points)
+
+        representatives, inverse = PointSnapIndex().unique(points)
+        for point, position in zip(points, inverse):
+            self.assertTrue(point.spatiallyEquals(points[representatives[position]]))
+        expected = []
+        for index, point in enumerate(points):
+            if not any(point == points[r] for r in expected):
+                expected.append(index)
+        self.assertEqual(len(expected), len(representatives))
+
+
+class TestEqualityTolerance(TestCase):
+    def setUp(self):
+        self.saved = getEqualityTolerance()
+
+    def tearDown(self):
+        setEqualityTolerance(self.saved)
+
+    def test_sharedTolerance(self):
+        point = ExtendedPoint(100.0, 200.0)
+        nearby = ExtendedPoint(100.01, 200.0)
+        self.assertNotEqual(point, nearby)
+        setEqualityTolerance(0.02)
+        self.assertEqual(point, nearby)
+        self.assertTrue(point.spatiallyEquals(nearby))
+        self.assertEqual(0.02, PointSnapIndex().tolerance)
+        # No hash is consistent with equality within a tolerance.
+        self.assertRaises(TypeError, hash, point)
+        self.assertEqual([0], removeDuplicateVertices(np.array([100.0, 100.01]),
+                                                      np.array([200.0, 200.0])).tolist())
+        self.assertEqual(0.02, ExtendedPointModule.EQUALITY_TOLERANCE)
+        self.assertRaises(ValueError, setEqualityTolerance, 0.0)
+
+
+class TestChainSegments(TestCase):
+    def test_chainsShuffledSegments(self):
+        coordinates = [(float(i), float(i * i % 13)) for i in range(61)]
+        segments = []
+        for start in range(0, 60, 5):
+            segment = collections.deque(ExtendedPoint(x, y) for x, y in
+                                        coordinates[start:start + 6])
+            if start % 10 == 0:
+                segment.reverse()
+            segments.append(segment)
+        other = collections.deque([ExtendedPoint(500.0, 0.0), ExtendedPoint(510.0, 5.0)])
+        random.Random(2).shuffle(segments)
+        segments.insert(3, other)
+
+        alignments = list(chainSegments(segments))
+        self.assertEqual(2, len(alignments))
+        chained = [a for a in alignments if len(a) > 2][0]
+        xy = [(p.X, p.Y) for p in chained]
+        if xy[0] != coordinates[0]:
+            xy.reverse()
+        self.assertEqual(coordinates, xy)
+
+    def test_chainNextUsesOneIndex(self):
+        segments = [[ExtendedPoint(10.0, 0.0), ExtendedPoint(20.0, 0.0)],
+                     [ExtendedPoint(50.0, 50.0), ExtendedPoint(60.0, 50.0)],
+                     [ExtendedPoint(0.0, 0.0), ExtendedPoint(10.0, 0.0)]]
+        chainer = SegmentChainer(list(segments))
+        first = chainer.chainNext()
+        self.assertEqual([0.0, 10.0, 20.0], [p.X for p in first])
+        self.assertEqual([segments[1]], chainer.unusedSegments())
+        self.assertEqual([50.0, 60.0], [p.X for p in chainer.chainNext()])
+        self.assertEqual([], chainer.unusedSegments())
+        self.assertIsNone(chainer.chainNext())
@@ -0,0 +1,97 @@
+from unittest import TestCase
+import numpy as np
+
+from ExtendedPoint import ExtendedPoint
+from Projection import CLARKE1866, AIRY1830, METER, US_SURVEY_FOOT
+from Projection import GeographicSystem, LambertConformalConic, TransverseMercator
+from Projection import Transformer, convertLength, coordinateSystemFromEpsg
+from Projection import CoordinateSystem, optionalTransformer
+
+_nad27 = GeographicSystem('GCS_North_American_1927', 'D_North_American_1927', CLARKE1866)
+
+
+def _dms(degrees, minutes=0.0):
+    return degrees + minutes / 60.0
+
+
+class TestProjection(TestCase):
+    def test_lambertConformalConic(self):
+        # Snyder, Map Projections - A Working Manual, p. 296.
+        snyder = LambertConformalConic('snyder', _nad27, 33.0, 45.0, 23.0, -96.0)
+        x, y = snyder.fromGeographic([-75.0], [35.0])
+        self.assertAlmostEqual(1894410.9, x[0], delta=0.05)
+        self.assertAlmostEqual(1564649.5, y[0], delta=0.05)
+        longitude, latitude = snyder.toGeographic(x, y)
+        self.assertAlmostEqual(-75.0, longitude[0], places=10)
+        self.assertAlmostEqual(35.0, latitude[0], places=10)
+
+        # EPSG Guidance Note 7-2, NAD27 / Texas South Central.
+        texas = LambertConformalConic('texas', _nad27, _dms(28, 23), _dms(30, 17),
+                                      _dms(27, 50), -99.0, 2000000.0, 0.0,
+                                      US_SURVEY_FOOT)
+        x, y = texas.fromGeographic(-96.0, 28.5)
+        self.assertAlmostEqual(2963503.91, x, delta=0.01)
+        self.assertAlmostEqual(254759.80, y, delta=0.01)
+
+    def test_transverseMercator(self):
+        # Snyder p. 269.
+        snyder = TransverseMercator('snyder', _nad27, -75.0, 0.9996)
+        x, y = snyder.fromGeographic([-73.5], [40.5])
+        self.assertAlmostEqual(127106.5, x[0], delta=0.05)
+        self.assertAlmostEqual(4484124.4, y[0], delta=0.05)
+
+        # British National Grid at 50.5N, 0.5E. The USGS formulas of the
+        # EPSG Guidance Note 7-2 example differ by about a centimeter.
+        osgb = GeographicSystem('GCS_OSGB_1936', 'D_OSGB_1936', AIRY1830)
+        grid = TransverseMercator('bng', osgb, -2.0, 0.9996012717, 49.0,
+                                  400000.0, -100000.0)
+        x, y = grid.fromGeographic(0.5, 50.5)
+        self.assertAlmostEqual(577274.99, x, delta=0.02)
+        self.assertAlmostEqual(69740.50, y, delta=0.02)
+
+    def test_roundTrips(self):
+        longitudes = np.linspace(-84.3, -75.5, 25)
+        latitudes = np.linspace(33.8, 36.6, 25)
+        stateFeet = coordinateSystemFromEpsg(2264)
+        xs, ys = Transformer(4269, 2264).transform(longitudes, latitudes)
+        back = Transformer(stateFeet, 4269).transform(xs, ys)
+        np.testing.assert_allclose(back[0], longitudes, atol=1.0e-11)
+        np.testing.assert_allclose(back[1], latitudes, atol=1.0e-11)
+
+        utmXs, utmYs = Transformer(2264, 32617).transform(xs, ys)
+        self.assertTrue(np.all((utmXs > 166000.0) & (utmXs < 1000000.0)))
+        againXs, againYs = Transformer(32617, stateFeet).transform(utmXs, utmYs)
+        np.testing.assert_allclose(againXs, xs, atol=1.0e-3)
+        np.testing.assert_allclose(againYs, ys, atol=1.0e-3)
+
+        metres = Transformer(2264, 32119).transform(xs, ys)
+        np.testing.assert_allclose(metres[0], convertLength(xs, US_SURVEY_FOOT, METER),
+                                   atol=1.0e-6)
+
+        south = coordinateSystemFromEpsg(32733)
+        x, y = south.fromGeographic(15.0, -10.0)
+        self.assertAlmostEqual(500000.0, x, delta=1.0e-6)
+        self.assertGreater(y, 8000000.0)
+        longitude, latitude = south.toGeographic(x, y)
+        self.assertAlmostEqual(-10.0, latitude, places=8)
+
+    def test_registryAndPoints(self):
+        self.assertRaises(TypeError, CoordinateSystem)
+        self.assertIsNone(optionalTransformer(None, None))
+        self.assertRaises(ValueError, optionalTransformer, 4269, None)
+        self.assertEqual(2264, optionalTransformer(4269, 2264).target.factoryCode)
+        self.assertRaises(ValueError, coordinateSystemFromEpsg, 3857)
+        self.assertAlmostEqual(0.3048006096, convertLength(1.0, US_SURVEY_FOOT, METER))
+        stateFeet = coordinateSystemFromEpsg(2264)
+        self.assertEqual(2264, stateFeet.factoryCode)
+        wkt = stateFeet.exportToString()
+        self.assertTrue(wkt.startswith('PROJCS["'))
+        self.assertIn('Lambert_Conformal_Conic', wkt)
+        self.assertIn('UNIT["Foot_US",0.3048006096', wkt)
+
+        points = [ExtendedPoint(-79.0, 33.75), ExtendedPoint(-78.0, 35.0)]
+        Transformer(4269, stateFeet).transformPoints(points)
+        # The false easting is defined as 609601.22 m.
+        self.assertAlmostEqual(2000000.0026, points[0].X, delta=1.0e-4)
+        self.assertAlmostEqual(0.0, points[0].Y, delta=1.0e-6)
+        self.assertGreater(points[1].X, 2000000.0)
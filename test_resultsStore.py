@@ -0,0 +1,70 @@
+from unittest import TestCase
+import math
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from ExtendedPoint import ExtendedPoint
+from ExtendedPointList import ExtendedPointList
+from ResultsStore import ResultsStore, srsOrganization
+
+
+def _makeAlignment(coordinates):
+    alignment = ExtendedPointList()
+    for x, y in coordinates:
+        alignment.append(ExtendedPoint(x, y))
+    alignment.computeAllPointInformation()
+    return alignment
+
+
+class TestResultsStore(TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.fileName = os.path.join(self.tempDir, 'results.gpkg')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_queryVertices_bboxAndRadius(self):
+        with ResultsStore(self.fileName, batchSize=3) as store:
+            store.addAlignment(_makeAlignment([(0, 0), (100, 0), (200, 0)]), 'tangent')
+            curveId = store.addAlignment(
+                _makeAlignment([(100.0 * math.sin(a), 100.0 * math.cos(a))
+                                for a in (0.0, 0.3, 0.6, 0.9)]), 'curve')
+            rows = store.queryVertices(maxRadius=150.0)
+            self.assertEqual([curveId, curveId], [r[0] for r in rows])
+            self.assertAlmostEqual(100.0, rows[0][5], places=5)
+
+            rows = store.queryVertices(bbox=(20, 80, 60, 100), maxRadius=150.0)
+            self.assertEqual([1, 2], [r[1] for r in rows])
+            self.assertEqual([], store.queryVertices(bbox=(-10, -10, 10, 10),
+                                                     maxRadius=150.0))
+
+    def test_close_writesGeoPackageMetadata(self):
+        store = ResultsStore(self.fileName, srsId=2264, srsName='NAD83 / North Carolina (ftUS)')
+        store.addAlignment(_makeAlignment([(10, 20), (30, 40), (50, 70)]), 'fc')
+        store.close()
+        connection = sqlite3.connect(self.fileName)
+        try:
+            self.assertEqual(0x47504B47, connection.execute('PRAGMA application_id').fetchone()[0])
+            extent = connection.execute("SELECT min_x, min_y, max_x, max_y, srs_id "
+                                        "FROM gpkg_contents WHERE table_name='vertices'").fetchone()
+            self.assertEqual((10.0, 20.0, 50.0, 70.0, 2264), extent)
+            self.assertEqual(3, connection.execute('SELECT COUNT(*) FROM vertices').fetchone()[0])
+        finally:
+            connection.close()
+
+    def test_spatialReferenceOrganization(self):
+        self.assertEqual('EPSG', srsOrganization(2264))
+        self.assertEqual('ESRI', srsOrganization(102719))
+        self.assertEqual('NONE', srsOrganization(-1))
+        ResultsStore(self.fileName, srsId=102719,
+                     srsName='NAD_1983_StatePlane_North_Carolina_FIPS_3200_Feet').close()
+        connection = sqlite3.connect(self.fileName)
+        try:
+            row = connection.execute("SELECT organization, organization_coordsys_id "
+                                     "FROM gpkg_spatial_ref_sys WHERE srs_id=102719").fetchone()
+            self.assertEqual(('ESRI', 102719), row)
+        finally:
+            connection.close()
@@ -0,0 +1,101 @@
+from unittest import TestCase
+import math
+import os
+import shutil
+import tempfile
+
+from ArcKernel import compute_arc_arrays
+from ExtendedPoint import ExtendedPoint
+from ExtendedPointList import ExtendedPointList
+from SpiralDetection import fitCurvatureRuns, detectSpirals, \
+    detectSpiralsInPointList, stationsFromXY, writeSpiralsCSV, TANGENT, ARC, SPIRAL
+
+RADIUS = 300.0
+SPIRAL_LENGTH = 100.0
+
+
+def _curvature(station):
+    """tangent 200, spiral 100, arc 150, spiral 100, tangent"""
+    ends = [200.0, 300.0, 450.0, 550.0]
+    if station < ends[0] or station >= ends[3]:
+        return 0.0
+    if station < ends[1]:
+        return (station - ends[0]) / (RADIUS * SPIRAL_LENGTH)
+    if station < ends[2]:
+        return 1.0 / RADIUS
+    return (ends[3] - station) / (RADIUS * SPIRAL_LENGTH)
+
+
+def _alignment(spacing=5.0, length=900.0, step=0.05):
+    x = y = heading = 0.0
+    points = [(x, y)]
+    stepsPerVertex = int(round(spacing / step))
+    for number in range(int(round(length / step))):
+        curvature = _curvature((number + 0.5) * step)
+        heading += curvature * step / 2.0
+        x += math.sin(heading) * step
+        y += math.cos(heading) * step
+        heading += curvature * step / 2.0
+        if (number + 1) % stepsPerVertex == 0:
+            points.append((x, y))
+    return points
+
+
+class TestSpiralDetection(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.points = _alignment()
+        xs = [x for x, _ in cls.points]
+        ys = [y for _, y in cls.points]
+        cls.stations = stationsFromXY(xs, ys)
+        cls.curvatures = compute_arc_arrays(xs, ys).degreeCurve
+
+    def test_runsOfSyntheticAlignment(self):
+        runs = fitCurvatureRuns(self.stations, self.curvatures)
+        self.assertEqual([TANGENT, SPIRAL, ARC, SPIRAL, TANGENT],
+                         [run.kind for run in runs])
+        for run, station in zip(runs[1:], [200.0, 300.0, 450.0, 550.0]):
+            self.assertAlmostEqual(station, run.startStation, delta=1.0)
+        self.assertAlmostEqual(1.0 / RADIUS, runs[2].startCurvature, delta=1.0e-5)
+
+    def test_spiralParameters(self):
+        spirals = detectSpirals(self.stations, self.curvatures)
+        self.assertEqual(2, len(spirals))
+        entry, exit_ = spirals
+        for spiral in spirals:
+            self.assertAlmostEqual(SPIRAL_LENGTH, spiral.length, delta=1.0)
+            self.assertAlmostEqual(math.sqrt(RADIUS * SPIRAL_LENGTH), spiral.A, delta=1.0)
+        self.assertEqual(float('inf'), entry.startRadius)
+        self.assertAlmostEqual(RADIUS, entry.endRadius, delta=3.0)
+        self.assertAlmostEqual(RADIUS, exit_.startRadius, delta=3.0)
+        self.assertEqual(float('inf'), exit_.endRadius)
+        self.assertEqual(40, entry.startIndex)
+        self.assertEqual(60, entry.endIndex)
+
+    def test_pointListAndCsv(self):
+        pointList = ExtendedPointList()
+        pointList.extend(ExtendedPoint(x, y) for x, y in self.points)
+        pointList.computeAllPointInformation()
+        spirals = detectSpiralsInPointList(pointList)
+        expected = detectSpirals(self.stations, self.curvatures)
+        self.assertEqual([s.startIndex for s in expected], [s.startIndex for s in spirals])
+        for got, want in zip(spirals, expected):
+            self.assertAlmostEqual(want.A, got.A, places=6)
+
+        tempDir = tempfile.mkdtemp()
+        try:
+            fileName = os.path.join(tempDir, 'road_spirals.csv')
+            writeSpiralsCSV(fileName, spirals)
+            with open(fileName) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(3, len(lines))
+            self.assertTrue(lines[0].startswith('StartIndex,EndIndex,'))
+            self.assertTrue(lines[1].startswith('40,60,'))
+        finally:
+            shutil.rmtree(tempDir)
+
+    def test_noCurvature(self):
+        self.assertEqual([], detectSpirals([0.0, 1.0], [float('nan')] * 2))
+        stations = [float(i) for i in range(20)]
+        runs = fitCurvatureRuns(stations, [0.0] * 20)
+        self.assertEqual([TANGENT], [run.kind for run in runs])
@@ -0,0 +1,89 @@
+from unittest import TestCase
+import math
+import numpy as np
+
+from ExtendedPoint import ExtendedPoint, compute_arc_parameters
+from StreamingCurvature import StreamingCurvatureEstimator
+
+xs = np.linspace(0.0, 2000.0, 120)
+ys = 150.0 * np.sin(xs / 250.0) - 0.5 * xs
+
+
+class TestStreamingCurvatureEstimator(TestCase):
+    def test_push_matchesComputeArcParameters(self):
+        points = [ExtendedPoint(x, y) for x, y in zip(xs, ys)]
+        for pt1, pt2, pt3 in zip(points[:-2], points[1:-1], points[2:]):
+            compute_arc_parameters(pt1, pt2, pt3)
+        estimator = StreamingCurvatureEstimator()
+        self.assertIsNone(estimator.push(xs[0], ys[0]))
+        self.assertIsNone(estimator.push(xs[1], ys[1]))
+        for i in range(2, len(xs)):
+            record = estimator.push(xs[i], ys[i])
+            expected = points[i - 1]
+            self.assertEqual(i - 1, record.index)
+            self.assertAlmostEqual(expected.arc.radius, record.radius, delta=1e-6 * record.radius)
+            self.assertAlmostEqual(expected.arc.degreeCurve, record.degreeCurve, places=12)
+            self.assertAlmostEqual(expected.arc.deflection, record.arcDeflection, places=9)
+            self.assertAlmostEqual(expected.arc.lengthBack, record.lengthBack, places=6)
+            self.assertAlmostEqual(expected.arc.lengthAhead, record.lengthAhead, places=6)
+            self.assertAlmostEqual(expected.pt2pt.deflection, record.pointsDeflection, places=12)
+
+    def test_pushArrays_isSeamlessAcrossCalls(self):
+        single = StreamingCurvatureEstimator().pushArrays(xs, ys)
+        estimator = StreamingCurvatureEstimator()
+        first = estimator.pushArrays(xs[:41], ys[:41])
+        second = estimator.pushArrays(xs[41:], ys[41:])
+        np.testing.assert_allclose(np.concatenate((first.radius, second.radius)),
+                                   single.radius)
+        self.assertEqual(len(xs) - 2, len(single.radius))
+
+    def test_pushBuffered_matchesPushArrays(self):
+        single = StreamingCurvatureEstimator().pushArrays(xs, ys)
+        estimator = StreamingCurvatureEstimator(bufferSize=16)
+        batches = [estimator.pushBuffered(x, y) for x, y in zip(xs, ys)]
+        batches = [batch for batch in batches if batch is not None]
+        self.assertEqual(len(xs) // 16, len(batches))
+        batches.append(estimator.flush())
+        np.testing.assert_allclose(np.concatenate([b.radius for b in batches]),
+                                   single.radius)
+
+    def test_push_windowSmoothing(self):
+        estimator = StreamingCurvatureEstimator(smoothing='window', window=3)
+        raw = []
+        for x, y in zip(xs, ys):
+            record = estimator.push(x, y)
+            if record is not None:
+                raw.append(record.degreeCurve)
+                expected = sum(raw[-3:]) / len(raw[-3:])
+                self.assertAlmostEqual(expected, record.smoothedDegreeCurve, places=12)
+
+    def test_push_minSpacingIgnoresRepeatedFixes(self):
+        estimator = StreamingCurvatureEstimator(minSpacing=0.5)
+        estimator.push(0.0, 0.0)
+        estimator.push(10.0, 0.0)
+        self.assertIsNone(estimator.push(10.1, 0.0))
+        record = estimator.push(20.0, 1.0)
+        self.assertEqual(10.0, record.X)
+        self.assertEqual(1, record.index)
+
+    def test_push_exponentialSmoothing(self):
+        estimator = StreamingCurvatureEstimator(smoothing='exponential', alpha=0.3)
+        smoothed = None
+        for x, y in zip(xs, ys):
+            record = estimator.push(x, y)
+            if record is None:
+                continue
+            if smoothed is None:
+                smoothed = record.degreeCurve
+            else:
+                smoothed += 0.3 * (record.degreeCurve - smoothed)
+            self.assertAlmostEqual(smoothed, record.smoothedDegreeCurve, places=12)
+        self.assertNotAlmostEqual(record.degreeCurve, record.smoothedDegreeCurve, places=6)
+
+        # After reset, the first arc seeds the average again.
+        estimator.reset()
+        estimator.push(0.0, 0.0)
+        estimator.push(10.0, 0.0)
+        record = estimator.push(20.0, 1.0)
+        self.assertEqual(record.degreeCurve, record.smoothedDegreeCurve)
+        self.assertAlmostEqual(1.0 / record.radius, math.fabs(record.smoothedDegreeCurve))
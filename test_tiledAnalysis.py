@@ -0,0 +1,114 @@
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from ExtendedPoint import ExtendedPoint, compute_arc_parameters, any_point_has_z
+from PointSnapIndex import chainSegments
+from SeamStitching import partitionIntoTiles, foreignEndsNear, END_POINTS
+from SeamStitching import analyzeTileSegments, stitchSeamPieces
+
+
+def _features():
+    """
+    Vertices of each feature: a curving road of eight features from x = 0
+    to 2000 (two of them digitized backwards), and a short road by itself.
+    """
+    features = []
+    for k in range(8):
+        xs = [250.0 * k + 25.0 * i for i in range(11)]
+        vertices = [(x, 0.0002 * x * x + 40.0 * np.sin(x / 300.0)) for x in xs]
+        if k in (4, 6):
+            vertices.reverse()
+        features.append(vertices)
+    features.append([(100.0 + 20.0 * i, 600.0 + 0.01 * i * i) for i in range(12)])
+    return features
+
+
+def _segments(features):
+    return [[ExtendedPoint(*vertex) for vertex in vertices] for vertices in features]
+
+
+def _rows(alignment):
+    vertical = any_point_has_z(alignment)
+    return [ExtendedPoint.header_list(vertical)] + \
+        [point.csvRow(vertical) for point in alignment]
+
+
+def _readRows(fileName):
+    with open(fileName, 'r') as f:
+        return [line.rstrip('\n') for line in f]
+
+
+def _analyze(alignment):
+    # processPointsForCogo, which lives in the arcpy-importing module.
+    for pt1, pt2, pt3 in zip(alignment[:-2], alignment[1:-1], alignment[2:]):
+        compute_arc_parameters(pt1, pt2, pt3)
+
+
+class TestTiledAnalysis(TestCase):
+    def setUp(self):
+        self.outputDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.outputDir)
+
+    def _tiled(self, features):
+        """Analyze the features in tiles of 1000 as analyzeFCTiled does."""
+        centers = np.array([np.mean([v[:2] for v in vertices], axis=0)
+                            for vertices in features])
+        ends = np.array([vertices[0][:2] + vertices[-1][:2] for vertices in features])
+        tileKeys, tileOfFeature = partitionIntoTiles(centers, 1000.0)
+        self.assertEqual([[0, 0], [1, 0]], tileKeys.tolist())
+
+        segments = _segments(features)
+        wholeAlignments = []
+        seamPieces = []
+        for tileIndex in range(len(tileKeys)):
+            inTile = tileOfFeature == tileIndex
+            tileSegments = [segment for segment, inside in zip(segments, inTile) if inside]
+            seamFileStem = os.path.join(self.outputDir, '.seam_t{0}'.format(tileIndex))
+            seamPieces.extend(analyzeTileSegments(tileSegments, foreignEndsNear(ends, inTile),
+                                                  wholeAlignments.append, seamFileStem))
+        self.assertEqual(1, len(wholeAlignments))
+        self.assertEqual(2, len(seamPieces))
+        for piece in seamPieces:
+            self.assertEqual(2 * END_POINTS, len(piece.ends))
+            self.assertTrue(os.path.exists(piece.fileStem + '.csv'))
+
+        def outputFileName(num):
+            return os.path.join(self.outputDir, 'seam{0}.csv'.format(num))
+
+        stitched = stitchSeamPieces(seamPieces, outputFileName)
+        self.assertEqual([outputFileName(0)], stitched)
+        self.assertEqual(['seam0.csv'], os.listdir(self.outputDir))
+        return [_rows(alignment) for alignment in wholeAlignments] + \
+            [_readRows(fileName) for fileName in stitched]
+
+    def _untiled(self, features):
+        # assembleAlignments is chainSegments.
+        untiled = list(chainSegments(_segments(features)))
+        for alignment in untiled:
+            _analyze(alignment)
+        return [_rows(alignment) for alignment in untiled]
+
+    def test_stitchedMatchesUntiled(self):
+        features = _features()
+        tiled = self._tiled(features)
+        self.assertEqual(82, len(tiled[1]))
+        self.assertEqual(sorted(self._untiled(features)), sorted(tiled))
+
+    def test_stitchedMatchesUntiled_zInOneTile(self):
+        # The pieces of the first tile have no Z, so their rows are
+        # recomputed with the vertical columns of the stitched alignment.
+        features = [[(x, y, 0.01 * x) if x >= 1000.0 else (x, y) for x, y in vertices]
+                    for vertices in _features()]
+        self.assertEqual(sorted(self._untiled(features)), sorted(self._tiled(features)))
+
+    def test_foreignEndsNear(self):
+        ends = np.array([[0.0, 0.0, 10.0, 0.0],
+                         [10.0, 0.0, 20.0, 5.0],
+                         [500.0, 500.0, 510.0, 500.0]])
+        inTile = np.array([True, False, False])
+        self.assertEqual([[10.0, 0.0]], foreignEndsNear(ends, inTile).tolist())
@@ -0,0 +1,93 @@
+from unittest import TestCase
+import math
+import os
+import shutil
+import tempfile
+import numpy as np
+
+import CsvCache
+from AlignmentPreprocessing import resamplePointList
+from ArcKernel import compute_arc_and_vertical_arrays
+from ExtendedPoint import ExtendedPoint, compute_arc_parameters
+from ExtendedPointList import ExtendedPointList, CreateExtendedPointList
+
+# A sag vertical curve: z = 100 + 0.5 * rate * s ** 2 - 0.02 * s
+RATE = 0.0004
+
+
+def _profilePoints(count=12, spacing=20.0):
+    points = ExtendedPointList()
+    for i in range(count):
+        s = i * spacing
+        angle = s / 500.0
+        points.append(ExtendedPoint(500.0 * math.sin(angle), 500.0 * math.cos(angle),
+                                    newZ=100.0 + 0.5 * RATE * s * s - 0.02 * s))
+    return points
+
+
+class TestVerticalGeometry(TestCase):
+    def test_parabolaRateAndK(self):
+        points = _profilePoints(spacing=2.0)
+        points.computeAllPointInformation()
+        vertical = points[5].vertical
+        self.assertAlmostEqual(RATE, vertical.rateOfChange, places=6)
+        self.assertAlmostEqual(1.0 / (100.0 * RATE), vertical.K, delta=0.05)
+        self.assertAlmostEqual(vertical.gradeAhead - vertical.gradeBack,
+                               vertical.gradeChange, places=12)
+        self.assertFalse(points[0].vertical)
+
+    def test_kernelMatchesPoints(self):
+        points = _profilePoints()
+        points[6] = ExtendedPoint(points[6].X, points[6].Y, newZ=points[5].Z)
+        points.computeAllPointInformation()
+        arcs, vertical = compute_arc_and_vertical_arrays(
+            [p.X for p in points], [p.Y for p in points], [p.Z for p in points])
+        self.assertTrue(np.isnan(vertical.K[0]) and np.isnan(vertical.K[-1]))
+        for i, point in enumerate(points[1:-1], 1):
+            for name in ('gradeBack', 'gradeAhead', 'gradeChange', 'rateOfChange', 'K'):
+                self.assertAlmostEqual(getattr(point.vertical, name),
+                                       getattr(vertical, name)[i], places=9)
+
+    def test_withoutZ(self):
+        pt1, pt2, pt3 = ExtendedPoint(0.0, 0.0), ExtendedPoint(10.0, 1.0, newZ=5.0), \
+            ExtendedPoint(20.0, 4.0, newZ=6.0)
+        compute_arc_parameters(pt1, pt2, pt3)
+        self.assertFalse(pt2.vertical)
+        self.assertIsNone(pt1.Z)
+        self.assertEqual(11, len(pt2.csvRow().split(',')))
+        self.assertEqual(16, len(pt2.csvRow(vertical=True).split(',')))
+
+    def test_csvRoundTrip(self):
+        tempDir = tempfile.mkdtemp()
+        savedVariable = os.environ.get(CsvCache.CACHE_DIR_VARIABLE)
+        os.environ[CsvCache.CACHE_DIR_VARIABLE] = 'off'
+        try:
+            pointList = _profilePoints()
+            pointList.computeAllPointInformation()
+            fileName = os.path.join(tempDir, 'profile.csv')
+            pointList.writeToCSV(fileName)
+            with open(fileName) as f:
+                lines = f.read().splitlines()
+            self.assertTrue(lines[0].endswith(',Z,GradeBack,GradeAhead,GradeChange,K'))
+            self.assertEqual(set([16]), set(len(line.split(',')) for line in lines))
+
+            reread = CreateExtendedPointList(fileName)
+            for point, rereadPoint in zip(pointList, reread):
+                self.assertAlmostEqual(point.Z, rereadPoint.Z, places=9)
+            reread.computeAllPointInformation()
+            self.assertAlmostEqual(pointList[3].vertical.K, reread[3].vertical.K, places=3)
+        finally:
+            if savedVariable is None:
+                del os.environ[CsvCache.CACHE_DIR_VARIABLE]
+            else:
+                os.environ[CsvCache.CACHE_DIR_VARIABLE] = savedVariable
+            shutil.rmtree(tempDir)
+
+    def test_resampleInterpolatesZ(self):
+        points = [ExtendedPoint(0.0, 0.0, newZ=10.0), ExtendedPoint(0.0, 10.0, newZ=20.0),
+                  ExtendedPoint(10.0, 10.0, newZ=0.0)]
+        resampled, sourceIndex = resamplePointList(points, 2.5)
+        self.assertEqual([10.0, 12.5, 15.0, 17.5, 20.0, 15.0, 10.0, 5.0, 0.0],
+                         [p.Z for p in resampled])
+        points[1].Z = None
+        self.assertTrue(all(p.Z is None for p in resamplePointList(points, 2.5)[0]))